@@ -0,0 +1,168 @@
+import os
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+import tensorflow as tf
+
+
+class CheckpointResult(NamedTuple):
+    step: int
+    path: str
+    snapshot_seconds: float  # Time the training loop was blocked
+    write_seconds: float  # Time the background thread spent writing
+
+
+class AsyncCheckpointer:
+    """
+    Saves tf.train.Checkpoint snapshots on a background thread.
+
+    `save` copies the current values of the variables of `objects`, e.g. the
+    agent and its optimizer slots, to host memory and returns while the
+    checkpoint is written to `directory` by a tf.train.CheckpointManager,
+    which keeps the last `max_to_keep` checkpoints. Only the variable copy
+    blocks the caller; a request made while the previous checkpoint is still
+    being written is skipped. Finished saves, with their snapshot and write
+    latencies, are collected with `results`.
+    """
+
+    def __init__(self, directory, objects, max_to_keep=5):
+        """
+        Args:
+            directory: Directory holding the checkpoints.
+            objects: Dict of the trackable objects to checkpoint by name,
+                e.g. `{"agent": agent, "optimizer": optimizer}`, as passed to
+                tf.train.Checkpoint. The same objects are restored by
+                `restore`.
+            max_to_keep: Number of most recent checkpoints to keep.
+        """
+        with tf.device("CPU:0"):
+            self._step = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self._checkpoint = tf.train.Checkpoint(step=self._step, **objects)
+        self._manager = tf.train.CheckpointManager(
+            self._checkpoint, directory, max_to_keep=max_to_keep)
+        # Makes `save` copy the variables and write them on a TF thread
+        self._options = tf.train.CheckpointOptions(enable_async=True)
+
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="AsyncCheckpointer", daemon=True)
+        self._thread.start()
+
+    @property
+    def latest_checkpoint(self):
+        """Path prefix of the most recent checkpoint, or None."""
+        return self._manager.latest_checkpoint
+
+    def save(self, step):
+        """
+        Snapshots the variables and writes them in the background.
+
+        Returns:
+            bool: False if the previous checkpoint is still being written, in
+            which case nothing is saved for `step`.
+        """
+        self._raise_error()
+        if not self._idle.is_set():
+            return False
+        self._idle.clear()
+        start = time.perf_counter()
+        self._step.assign(int(step))
+        try:
+            path = self._manager.save(
+                checkpoint_number=step, options=self._options)
+        except Exception:
+            self._idle.set()
+            raise
+        snapshotted = time.perf_counter()
+        self._requests.put(
+            (int(step), path, snapshotted - start, snapshotted))
+        return True
+
+    def wait(self):
+        """Waits for a checkpoint that is still being written."""
+        self._idle.wait()
+        self._raise_error()
+
+    def restore(self, path=None):
+        """
+        Restores the objects from a checkpoint.
+
+        Waits for a checkpoint that is still being written first. Variables
+        that do not exist yet, e.g. optimizer slots created by the first
+        training step, are restored when they are created.
+
+        Args:
+            path: Checkpoint path prefix. Defaults to the latest checkpoint.
+
+        Returns:
+            int: The step of the restored checkpoint, or None if there is no
+            checkpoint to restore.
+        """
+        self.wait()
+        path = path or self._manager.latest_checkpoint
+        if path is None:
+            return None
+        self._checkpoint.restore(path).assert_existing_objects_matched()
+        return int(self._step.numpy())
+
+    def results(self):
+        """
+        Returns:
+            List[CheckpointResult]: Checkpoints written since the last call.
+        """
+        self._raise_error()
+        finished = []
+        while not self._results.empty():
+            finished.append(self._results.get())
+        return finished
+
+    def close(self):
+        """Waits for a checkpoint being written and stops the worker."""
+        self._requests.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Asynchronous checkpoint failed") from (
+                self._error)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            step, path, snapshot_seconds, snapshotted = request
+            try:
+                self._checkpoint.sync()
+            except Exception as error:
+                self._error = error
+                self._idle.set()
+                return
+            self._results.put(CheckpointResult(
+                step, path, snapshot_seconds,
+                time.perf_counter() - snapshotted))
+            self._idle.set()
+
+
+def export_policy(saver, directory):
+    """
+    Writes a full SavedModel of a policy, e.g. at the end of training.
+
+    Args:
+        saver: tf_agents PolicySaver of the policy.
+        directory: Directory of the SavedModel, created if needed.
+
+    Returns:
+        float: Time spent writing the SavedModel in seconds.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    saver.save(directory)
+    return time.perf_counter() - start
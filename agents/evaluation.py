@@ -0,0 +1,164 @@
+import queue
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from tf_agents.trajectories import time_step as ts
+
+
+def evaluate_episodes(environment, policy, num_episodes, max_steps=None):
+    """
+    Plays `num_episodes` evaluation episodes at once on a batched environment.
+
+    Every environment of the batch plays one episode at the same time, so the
+    policy is called once per step for the whole batch instead of once per
+    step of every episode. Environments whose episode has ended are masked out
+    until all episodes of the round are over; when `num_episodes` exceeds the
+    batch size, further rounds are played.
+
+    Args:
+        environment: Batched TF or Python environment, e.g. a TFPyEnvironment
+            wrapping a BatchedPyEnvironment or ParallelBipedalWalker.
+        policy: Policy whose `action` accepts the time steps of `environment`.
+        num_episodes: Number of episodes to play.
+        max_steps: Optional limit on the number of steps of a round.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The return and the length of every
+        episode, each with shape (num_episodes,).
+    """
+    batch_size = environment.batch_size or 1
+    returns, lengths = [], []
+    for first_episode in range(0, num_episodes, batch_size):
+        episode_return = np.zeros(batch_size)
+        episode_length = np.zeros(batch_size, dtype=np.int64)
+        # Rows beyond the requested number of episodes are never counted
+        active = np.arange(batch_size) < num_episodes - first_episode
+
+        time_step = environment.reset()
+        policy_state = policy.get_initial_state(batch_size)
+        steps = 0
+        while active.any() and (max_steps is None or steps < max_steps):
+            action_step = policy.action(time_step, policy_state)
+            policy_state = action_step.state
+            time_step = environment.step(action_step.action)
+            steps += 1
+            reward = np.reshape(np.asarray(time_step.reward), batch_size)
+            episode_return += np.where(active, reward, 0.0)
+            episode_length += active
+            step_type = np.reshape(
+                np.asarray(time_step.step_type), batch_size)
+            active &= step_type != ts.StepType.LAST
+
+        needed = min(batch_size, num_episodes - first_episode)
+        returns.append(episode_return[:needed])
+        lengths.append(episode_length[:needed])
+    return np.concatenate(returns), np.concatenate(lengths)
+
+
+class EvaluationResult(NamedTuple):
+    """Per-episode returns and lengths of the policy at a training step."""
+
+    step: int
+    returns: np.ndarray
+    lengths: np.ndarray
+
+
+class AsyncEvaluator:
+    """
+    Evaluates snapshots of a policy on a background thread.
+
+    `evaluate` copies the current values of `source_variables` (the trained
+    policy's variables) into `policy`, a separate copy of the policy, and
+    returns immediately while a worker thread plays the evaluation episodes
+    with that snapshot. The learner never waits for an evaluation: a request
+    made while the previous evaluation is still running is skipped. Finished
+    evaluations are collected with `results`.
+    """
+
+    def __init__(self, environment, policy, source_variables, num_episodes,
+                 max_steps=None):
+        """
+        Args:
+            environment: Batched environment used only by the worker thread.
+            policy: Policy evaluated by the worker. It must not share
+                variables with the trained policy.
+            source_variables: Variables of the trained policy, in the order
+                of `policy.variables()`.
+            num_episodes: Episodes played by each evaluation.
+            max_steps: Optional limit on the steps of an evaluation round.
+        """
+        self._environment = environment
+        self._policy = policy
+        self._num_episodes = num_episodes
+        self._max_steps = max_steps
+        self._source_variables = list(source_variables)
+        self._target_variables = list(policy.variables())
+        if len(self._source_variables) != len(self._target_variables):
+            raise ValueError(
+                f"Expected {len(self._target_variables)} source variables, "
+                f"got {len(self._source_variables)}")
+
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="AsyncEvaluator", daemon=True)
+        self._thread.start()
+
+    def evaluate(self, step):
+        """
+        Snapshots the trained policy and evaluates it in the background.
+
+        Returns:
+            bool: False if the previous evaluation is still running, in which
+            case nothing is evaluated for `step`.
+        """
+        self._raise_error()
+        if not self._idle.is_set():
+            return False
+        self._idle.clear()
+        for target, source in zip(self._target_variables,
+                                  self._source_variables):
+            target.assign(source)
+        self._requests.put(int(step))
+        return True
+
+    def results(self):
+        """
+        Returns:
+            List[EvaluationResult]: Evaluations finished since the last call.
+        """
+        self._raise_error()
+        finished = []
+        while not self._results.empty():
+            finished.append(self._results.get())
+        return finished
+
+    def close(self):
+        """Waits for a running evaluation to finish and stops the worker."""
+        self._requests.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Asynchronous evaluation failed") from (
+                self._error)
+
+    def _run(self):
+        while True:
+            step = self._requests.get()
+            if step is None:
+                return
+            try:
+                returns, lengths = evaluate_episodes(
+                    self._environment, self._policy, self._num_episodes,
+                    self._max_steps)
+            except Exception as error:
+                self._error = error
+                return
+            self._results.put(EvaluationResult(step, returns, lengths))
+            self._idle.set()
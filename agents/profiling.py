@@ -0,0 +1,225 @@
+import collections
+import contextlib
+import json
+import time
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.environments import wrappers
+
+# Histogram bucket edges in seconds, 4 per decade from 1 us to 100 s
+HISTOGRAM_EDGES = np.logspace(-6, 2, 33)
+
+
+class TimedPyEnvironment(wrappers.PyEnvironmentBaseWrapper):
+    """Records the time of every step of a Python environment."""
+
+    def __init__(self, env, profiler, name="env_step"):
+        super(TimedPyEnvironment, self).__init__(env)
+        self._profiler = profiler
+        self._name = name
+
+    def _step(self, action):
+        start = time.perf_counter()
+        time_step = self._env.step(action)
+        self._profiler.record(self._name, time.perf_counter() - start)
+        return time_step
+
+
+class TrainingProfiler:
+    """
+    Times the hot paths of a training loop and exports rolling histograms.
+
+    Sections are timed with `section` around Python calls, e.g. sampling a
+    batch or `agent.train`, with `timed` around calls made inside a
+    tf.function, e.g. driver observers, with `time_policy` for the policy
+    inference of a driver and with `wrap_environment` for the steps of a
+    Python environment stepped from a TF graph. Each section keeps
+    its last `window` durations. Every `export_interval` calls of `step`,
+    their summary statistics and log-spaced histograms are appended as one
+    JSON line to `path`; the first line of the file holds the histogram
+    bucket edges. With `trace_steps`, a tf.profiler trace of that window of
+    steps is written to `trace_dir` for TensorBoard.
+
+    A profiler without `path` or `trace_steps` is disabled: `timed` and
+    `wrap_environment` return what they are given and nothing is exported,
+    so the training loop can use it unconditionally.
+    """
+
+    def __init__(self, path=None, window=1000, export_interval=1000,
+                 trace_dir=None, trace_steps=None):
+        """
+        Args:
+            path: JSON-lines file the histograms are appended to.
+            window: Number of most recent durations kept per section.
+            export_interval: Number of `step` calls between exports.
+            trace_dir: Directory of the tf.profiler trace.
+            trace_steps: Tuple (first, last) of the training steps traced by
+                tf.profiler, inclusive, as passed to `step`. Requires
+                `trace_dir`.
+        """
+        if trace_steps is not None and trace_dir is None:
+            raise ValueError("trace_steps requires a trace_dir")
+        self.path = path
+        self.window = window
+        self.export_interval = export_interval
+        self.trace_dir = trace_dir
+        self.trace_steps = trace_steps
+        self.enabled = path is not None or trace_steps is not None
+        self._durations = collections.defaultdict(
+            lambda: collections.deque(maxlen=window))
+        self._starts = {}
+        self._num_steps = 0
+        self._tracing = False
+        self._traced = False
+        self._export_start = time.perf_counter()
+        if path is not None:
+            with open(path, "a") as file:
+                file.write(json.dumps(
+                    {"histogram_edges_ms": (HISTOGRAM_EDGES * 1e3).tolist()})
+                    + "\n")
+
+    def record(self, name, seconds):
+        """Records one duration of section `name`."""
+        self._durations[name].append(seconds)
+
+    @contextlib.contextmanager
+    def section(self, name):
+        """Times the body of a `with` statement as section `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name, function):
+        """
+        Wraps `function` to time its calls as section `name`.
+
+        Works inside tf.function, e.g. for driver observers: the clock is read
+        by tf.numpy_function calls that the ops of `function` depend on and
+        that depend on its results.
+        """
+        if not self.enabled:
+            return function
+
+        def start():
+            self._starts[name] = time.perf_counter()
+            return np.int64(0)
+
+        def stop():
+            self.record(name, time.perf_counter() - self._starts.pop(name))
+            return np.int64(0)
+
+        def timed_function(*args, **kwargs):
+            started = tf.numpy_function(start, [], tf.int64, name="timer")
+            with tf.control_dependencies([started]):
+                result = function(*args, **kwargs)
+            dependencies = [tensor for tensor in tf.nest.flatten(result)
+                            if tensor is not None]
+            with tf.control_dependencies(dependencies):
+                tf.numpy_function(stop, [], tf.int64, name="timer")
+            return result
+
+        return timed_function
+
+    def time_policy(self, policy, name="policy"):
+        """
+        Times the `action` calls of `policy`, e.g. the collect policy of a
+        driver, as section `name`. The policy is modified in place.
+
+        Returns:
+            The policy.
+        """
+        if self.enabled:
+            policy.action = self.timed(name, policy.action)
+        return policy
+
+    def wrap_environment(self, env, name="env_step"):
+        """
+        Returns:
+            The Python environment `env`, with its steps timed as section
+            `name` when the profiler is enabled.
+        """
+        if not self.enabled:
+            return env
+        return TimedPyEnvironment(env, self, name)
+
+    def step(self, step):
+        """
+        Marks the end of the training iteration of `step`.
+
+        Starts the tf.profiler trace after the iteration before the first
+        traced step, stops it after the last traced step, and exports the
+        histograms every `export_interval` calls.
+        """
+        if self.trace_steps is not None:
+            first, last = self.trace_steps
+            if self._tracing and step >= last:
+                tf.profiler.experimental.stop()
+                self._tracing = False
+                self._traced = True
+            elif (not self._tracing and not self._traced
+                  and first - 1 <= step < last):
+                tf.profiler.experimental.start(self.trace_dir)
+                self._tracing = True
+        self._num_steps += 1
+        if self.path is not None and (
+                self._num_steps % self.export_interval == 0):
+            self.export(step)
+
+    def summary(self):
+        """
+        Returns:
+            Dict[str, dict]: Count, total, mean, percentiles and maximum in
+            ms and histogram counts of the recent durations of every
+            section.
+        """
+        stats = {}
+        for name, durations in sorted(self._durations.items()):
+            if not durations:
+                continue
+            values = np.array(durations)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1e3
+            stats[name] = {
+                "count": len(values),
+                "total_ms": values.sum() * 1e3,
+                "mean_ms": values.mean() * 1e3,
+                "p50_ms": p50,
+                "p90_ms": p90,
+                "p99_ms": p99,
+                "max_ms": values.max() * 1e3,
+                "histogram": np.histogram(
+                    values, HISTOGRAM_EDGES)[0].tolist(),
+            }
+        return stats
+
+    def format_summary(self):
+        """
+        Returns:
+            str: Mean and 99th percentile time of every section, e.g. for
+            the training log.
+        """
+        return ", ".join(
+            f"{name} {stats['mean_ms']:.2f} ms (p99 {stats['p99_ms']:.2f})"
+            for name, stats in self.summary().items())
+
+    def export(self, step):
+        """Appends the current histograms to `path` as one JSON line."""
+        now = time.perf_counter()
+        record = {
+            "step": int(step),
+            "time": time.time(),
+            "steps_per_second": (
+                self.export_interval / (now - self._export_start)),
+            "sections": self.summary(),
+        }
+        self._export_start = now
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        """Stops a tf.profiler trace that is still running."""
+        if self._tracing:
+            tf.profiler.experimental.stop()
+            self._tracing = False
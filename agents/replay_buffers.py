@@ -0,0 +1,713 @@
+import json
+import mmap
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.replay_buffers.tf_uniform_replay_buffer import BufferInfo
+from tf_agents.utils import common
+from tf_agents.utils import nest_utils
+
+FLOAT16_MAX = float(np.finfo(np.float16).max)
+
+
+class SumTree:
+    """
+    Binary tree whose inner nodes hold the sum of their children.
+
+    The leaves hold non-negative priorities. Updating k leaves and sampling k
+    leaves proportionally to their priority both cost O(k log n) and run
+    level by level on whole index arrays.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity: Number of leaves.
+        """
+        self.capacity = capacity
+        self._depth = max(int(np.ceil(np.log2(capacity))), 0)
+        self._first_leaf = 1 << self._depth
+        # Node i has children 2i and 2i + 1, the root is node 1
+        self._nodes = np.zeros(2 * self._first_leaf)
+
+    @property
+    def total(self):
+        return self._nodes[1]
+
+    def get(self, indices):
+        return self._nodes[self._first_leaf + np.asarray(indices)]
+
+    def update(self, indices, priorities):
+        """Sets the priorities of the leaves `indices`."""
+        nodes = self._first_leaf + np.asarray(indices, dtype=np.int64)
+        self._nodes[nodes] = priorities
+        for _ in range(self._depth):
+            # Repeated parents are assigned the same sum, so no np.unique
+            nodes >>= 1
+            self._nodes[nodes] = (
+                self._nodes[2 * nodes] + self._nodes[2 * nodes + 1])
+
+    def sample(self, batch_size, rng):
+        """
+        Draws leaves with probability proportional to their priority.
+
+        One value is drawn from each of `batch_size` equal segments of the
+        total priority (stratified sampling).
+
+        Returns:
+            np.ndarray: Leaf indices with shape (batch_size,).
+        """
+        values = (np.arange(batch_size) + rng.random(batch_size)) * (
+            self.total / batch_size)
+        nodes = np.ones(batch_size, dtype=np.int64)
+        for _ in range(self._depth):
+            nodes = 2 * nodes
+            left = self._nodes[nodes]
+            # Rounding can leave a value past the last non-empty leaf, which
+            # must never descend into an empty subtree
+            go_right = (values >= left) & (self._nodes[nodes + 1] > 0)
+            values -= left * go_right
+            nodes += go_right
+        return nodes - self._first_leaf
+
+
+class FieldCodec:
+    """
+    Stores one field of a replay buffer's data spec as it is.
+
+    A codec splits a field into one or more stored parts, encodes items
+    into them when they are added and decodes gathered parts back into the
+    field's dtype when they are sampled.
+    """
+
+    def parts(self, spec):
+        """
+        Returns:
+            List[Tuple[str, tuple, np.dtype]]: Name suffix, per-item shape and
+            dtype of every stored part.
+        """
+        return [("", tuple(spec.shape), spec.dtype.as_numpy_dtype)]
+
+    def encode(self, item):
+        """Returns the values of every part for `item`."""
+        return [item]
+
+    def decode(self, parts, spec):
+        """Returns the field values of the gathered `parts`."""
+        return parts[0]
+
+
+class CastCodec(FieldCodec):
+    """Stores a field in a narrower dtype, e.g. float16 or int8."""
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+
+    def parts(self, spec):
+        return [(self.dtype.name, tuple(spec.shape), self.dtype)]
+
+    def encode(self, item):
+        return [item.astype(self.dtype)]
+
+    def decode(self, parts, spec):
+        return parts[0].astype(spec.dtype.as_numpy_dtype)
+
+
+class BipedalWalkerObservationCodec(FieldCodec):
+    """
+    Stores a BipedalWalker observation in 35 bytes instead of 96.
+
+    The ten lidar fractions in [0, 1] are quantized to uint8, the two leg
+    ground contact flags are packed into the bits of one uint8 and the
+    other twelve values are stored as float16.
+    """
+
+    CONTACTS = [8, 13]
+    LIDAR = slice(14, 24)
+    STATE = [0, 1, 2, 3, 4, 5, 6, 7, 9, 10, 11, 12]
+
+    def parts(self, spec):
+        if tuple(spec.shape) != (24,):
+            raise ValueError(
+                f"Expected a BipedalWalker observation of shape (24,), got "
+                f"{spec.shape}")
+        return [("state", (12,), np.dtype(np.float16)),
+                ("contacts", (), np.dtype(np.uint8)),
+                ("lidar", (10,), np.dtype(np.uint8))]
+
+    def encode(self, item):
+        # Values beyond the float16 range saturate instead of becoming inf
+        state = np.clip(item[..., self.STATE], -FLOAT16_MAX, FLOAT16_MAX)
+        contacts = item[..., self.CONTACTS] > 0.5
+        lidar = np.rint(np.clip(item[..., self.LIDAR], 0.0, 1.0) * 255)
+        return [state.astype(np.float16),
+                (contacts[..., 0] | contacts[..., 1] << 1).astype(np.uint8),
+                lidar.astype(np.uint8)]
+
+    def decode(self, parts, spec):
+        state, contacts, lidar = parts
+        observation = np.empty(state.shape[:-1] + (24,), dtype=np.float32)
+        observation[..., self.STATE] = state
+        observation[..., self.CONTACTS[0]] = contacts & 1
+        observation[..., self.CONTACTS[1]] = contacts >> 1
+        observation[..., self.LIDAR] = lidar * np.float32(1 / 255)
+        return observation
+
+
+def compact_bipedal_walker_codecs(data_spec):
+    """
+    Codecs that store BipedalWalker trajectories compactly.
+
+    Observations use BipedalWalkerObservationCodec, actions and discounts
+    are stored as float16 and step types as int8. Rewards keep float32, as
+    the -100 fall penalty next to small shaping terms needs the precision.
+
+    Args:
+        data_spec: Nested TensorSpec of one item, e.g.
+            `agent.collect_data_spec`.
+
+    Returns:
+        List[FieldCodec]: One codec per field of `tf.nest.flatten(data_spec)`.
+    """
+    codecs = []
+    for path, spec in nest_utils.flatten_with_joined_paths(data_spec):
+        name = path.split("/")[-1]
+        if name == "observation":
+            codecs.append(BipedalWalkerObservationCodec())
+        elif name in ("step_type", "next_step_type"):
+            codecs.append(CastCodec(np.int8))
+        elif name in ("action", "discount") and spec.dtype.is_floating:
+            codecs.append(CastCodec(np.float16))
+        else:
+            codecs.append(FieldCodec())
+    return codecs
+
+
+class _NumpyReplayBuffer:
+    """
+    Replay buffer with the interface of TFUniformReplayBuffer, in NumPy.
+
+    Items are stored like in TFUniformReplayBuffer: `add_batch` appends one
+    step of each of `batch_size` environments, and `as_dataset` yields
+    sequences of `num_steps` consecutive steps of one environment together
+    with a BufferInfo of their ids and sampling probabilities. The id of a
+    sequence is `step * batch_size + column` of its first step, where `step`
+    counts the steps added before it, so ids are not reused when the buffer
+    wraps around.
+
+    Every field of `data_spec` is stored by a FieldCodec in one or more
+    arrays with shape (max_length, batch_size, ...), reached from TF graphs,
+    e.g. driver observers and the dataset, through tf.numpy_function.
+    Subclasses choose which sequences are sampled.
+    """
+
+    def __init__(self, data_spec, batch_size, max_length, num_steps, codecs,
+                 seed):
+        if not 1 <= num_steps <= max_length:
+            raise ValueError(
+                f"num_steps must be between 1 and max_length, got "
+                f"{num_steps}")
+        self.data_spec = data_spec
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.num_steps = num_steps
+        self._specs = tf.nest.flatten(data_spec)
+        if codecs is None:
+            codecs = [FieldCodec() for _ in self._specs]
+        if len(codecs) != len(self._specs):
+            raise ValueError(
+                f"Expected {len(self._specs)} codecs, got {len(codecs)}")
+        self._codecs = list(codecs)
+        self._parts = [codec.parts(spec)
+                       for codec, spec in zip(self._codecs, self._specs)]
+        self._num_adds = 0
+        self._columns = np.arange(batch_size)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._storage = self._allocate()
+
+    def _allocate(self):
+        """
+        Returns:
+            List[List[np.ndarray]]: The arrays of the parts of every field.
+        """
+        return [[np.zeros((self.max_length, self.batch_size) + shape,
+                          dtype=dtype) for _, shape, dtype in parts]
+                for parts in self._parts]
+
+    def bytes_per_item(self):
+        """Bytes stored per item, i.e. per step of one environment."""
+        return sum(np.dtype(dtype).itemsize * int(np.prod(shape))
+                   for parts in self._parts for _, shape, dtype in parts)
+
+    def num_frames(self):
+        """Number of stored items."""
+        return (self._num_adds - self._oldest_step()) * self.batch_size
+
+    def _oldest_step(self):
+        """The oldest stored step, counted like `_num_adds`."""
+        return max(self._num_adds - self.max_length, 0)
+
+    def add_batch(self, items):
+        """
+        Appends one item per environment. Usable as a driver observer.
+
+        Args:
+            items: Nested tensors matching `data_spec` with an outer
+                dimension of `batch_size`.
+        """
+        return tf.numpy_function(
+            self._add_batch, tf.nest.flatten(items), tf.int64,
+            name="replay_add_batch")
+
+    def _add_batch(self, *items):
+        with self._lock:
+            row = self._num_adds % self.max_length
+            self._adding(row)
+            for arrays, codec, item in zip(
+                    self._storage, self._codecs, items):
+                for array, values in zip(arrays, codec.encode(item)):
+                    array[row] = values
+            self._num_adds += 1
+            self._added(row)
+            return np.int64(self._num_adds)
+
+    def _adding(self, row):
+        """Called with the lock held before `row` is written."""
+
+    def _added(self, row):
+        """Called with the lock held after `row` has been written."""
+
+    def _sample_ids(self, sample_batch_size):
+        """
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ids of sampled sequences and their
+            sampling probabilities.
+        """
+        raise NotImplementedError
+
+    def sample(self, sample_batch_size):
+        """
+        Samples sequences in NumPy.
+
+        Returns:
+            Tuple[list, np.ndarray, np.ndarray]: The flattened items with
+            shape (sample_batch_size, num_steps, ...) each, the ids of the
+            sequences and their sampling probabilities, in random order.
+        """
+        with self._lock:
+            num_rows = self._num_adds - self._oldest_step()
+            if num_rows < self.num_steps:
+                raise ValueError(
+                    f"Sampling needs at least {self.num_steps} items per "
+                    f"environment, the buffer holds {num_rows}")
+            ids, probabilities = self._sample_ids(sample_batch_size)
+            rows = (ids // self.batch_size)[:, np.newaxis] + np.arange(
+                self.num_steps)
+            rows %= self.max_length
+            columns = (ids % self.batch_size)[:, np.newaxis]
+            parts = [[array[rows, columns] for array in arrays]
+                     for arrays in self._storage]
+        items = [codec.decode(field_parts, spec) for codec, field_parts, spec
+                 in zip(self._codecs, parts, self._specs)]
+        return items, ids, probabilities.astype(np.float32)
+
+    def as_dataset(self, sample_batch_size, num_steps=None,
+                   num_parallel_calls=None, batches_per_call=8):
+        """
+        Args:
+            sample_batch_size: Number of sequences per batch.
+            num_steps: Length of the sequences, must be None or the
+                `num_steps` of the buffer.
+            num_parallel_calls: Number of sampling calls run in parallel.
+            batches_per_call: Number of batches drawn by one call into
+                NumPy, which amortizes the cost of tf.numpy_function and of
+                the NumPy calls of a draw. The batches are drawn from the
+                same state of the buffer.
+
+        Returns:
+            tf.data.Dataset: Endless dataset of `(items, BufferInfo)` with
+            items of shape [sample_batch_size, num_steps, ...].
+        """
+        if num_steps is not None and num_steps != self.num_steps:
+            raise ValueError(
+                f"The buffer samples sequences of {self.num_steps} steps, "
+                f"got num_steps={num_steps}")
+        dtypes = [spec.dtype for spec in self._specs]
+        outer_shape = [batches_per_call, sample_batch_size]
+
+        def sample(_):
+            flat = tf.numpy_function(
+                lambda: self._sample_flat(sample_batch_size, batches_per_call),
+                [], dtypes + [tf.int64, tf.float32], name="replay_sample")
+            for tensor, spec in zip(flat, self._specs):
+                tensor.set_shape(
+                    outer_shape + [self.num_steps] + spec.shape.as_list())
+            for tensor in flat[-2:]:
+                tensor.set_shape(outer_shape)
+            items = tf.nest.pack_sequence_as(self.data_spec, flat[:-2])
+            return items, BufferInfo(ids=flat[-2], probabilities=flat[-1])
+
+        return tf.data.Dataset.range(1).repeat().map(
+            sample, num_parallel_calls=num_parallel_calls).unbatch()
+
+    def _sample_flat(self, sample_batch_size, num_batches):
+        items, ids, probabilities = self.sample(
+            sample_batch_size * num_batches)
+        return [array.reshape((num_batches, sample_batch_size)
+                              + array.shape[1:])
+                for array in items + [ids, probabilities]]
+
+
+class PrioritizedReplayBuffer(_NumpyReplayBuffer):
+    """
+    Prioritized experience replay with the interface of TFUniformReplayBuffer.
+
+    Sequences are sampled with probability proportional to
+    `priority ** alpha` from a SumTree; new sequences get the largest
+    priority seen so far, and `update_priorities` sets the priorities of
+    sampled sequences from their TD errors.
+    """
+
+    def __init__(self, data_spec, batch_size, max_length, num_steps=2,
+                 alpha=0.6, beta=0.4, epsilon=1e-6, codecs=None, seed=None):
+        """
+        Args:
+            data_spec: Nested TensorSpec of one item, e.g.
+                `agent.collect_data_spec`.
+            batch_size: Number of environments adding items together.
+            max_length: Number of steps stored per environment.
+            num_steps: Length of the sampled sequences, 2 for the DQN and
+                SAC agents.
+            alpha: Priority exponent, 0 samples uniformly.
+            beta: Importance sampling exponent used by
+                `importance_weights`, 1 fully corrects the sampling bias.
+            epsilon: Added to absolute TD errors so that no sequence stops
+                being sampled.
+            codecs: FieldCodec of every field of `tf.nest.flatten(data_spec)`,
+                e.g. `compact_bipedal_walker_codecs(data_spec)`. Fields are
+                stored as they are when None.
+            seed: Seed of the sampling random number generator.
+        """
+        super(PrioritizedReplayBuffer, self).__init__(
+            data_spec, batch_size, max_length, num_steps, codecs, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        # Leaf `id` holds the priority of the sequence with that id
+        self._tree = SumTree(max_length * batch_size)
+        self._max_priority = 1.0
+
+    def _added(self, row):
+        # Sequences starting in the last num_steps - 1 rows now run past the
+        # newest step into overwritten data, the sequence starting
+        # num_steps - 1 rows back has just been completed
+        stale_rows = (row - np.arange(self.num_steps - 1)) % self.max_length
+        leaves = (stale_rows[:, np.newaxis] * self.batch_size
+                  + self._columns).ravel()
+        priorities = np.zeros(len(leaves))
+        if self._num_adds >= self.num_steps:
+            start = (row - self.num_steps + 1) % self.max_length
+            leaves = np.concatenate(
+                (leaves, start * self.batch_size + self._columns))
+            priorities = np.concatenate(
+                (priorities, np.full(self.batch_size, self._max_priority)))
+        self._tree.update(leaves, priorities)
+
+    def _sample_ids(self, sample_batch_size):
+        # Stratified draws come out sorted by segment, shuffle them so that
+        # any slice of the sample is itself unbiased
+        leaves = self._rng.permutation(
+            self._tree.sample(sample_batch_size, self._rng))
+        rows, columns = np.divmod(leaves, self.batch_size)
+        # The step held by each row is the latest one written to it
+        steps = self._num_adds - 1 - (
+            self._num_adds - 1 - rows) % self.max_length
+        return (steps * self.batch_size + columns,
+                self._tree.get(leaves) / self._tree.total)
+
+    def update_priorities(self, ids, td_errors):
+        """
+        Sets the priorities of sampled sequences from their TD errors.
+
+        Sequences whose first step was overwritten since they were sampled
+        keep their current priority.
+        """
+        steps, columns = np.divmod(np.asarray(ids), self.batch_size)
+        priorities = (np.abs(np.asarray(td_errors, dtype=np.float64))
+                      + self.epsilon) ** self.alpha
+        with self._lock:
+            valid = steps >= self._num_adds - self.max_length
+            leaves = (steps[valid] % self.max_length * self.batch_size
+                      + columns[valid])
+            self._tree.update(leaves, priorities[valid])
+            if valid.any():
+                self._max_priority = max(
+                    self._max_priority, priorities[valid].max())
+
+    def importance_weights(self, probabilities):
+        """
+        Importance sampling weights `(1 / P) ** beta` of a sampled batch,
+        normalized by the largest weight of the batch.
+        """
+        weights = tf.pow(probabilities, -self.beta)
+        return weights / tf.reduce_max(weights)
+
+
+class UniformReplayBuffer(_NumpyReplayBuffer):
+    """
+    Uniform replay buffer with the interface of TFUniformReplayBuffer.
+
+    Unlike TFUniformReplayBuffer, fields can be stored compactly by codecs.
+    """
+
+    def __init__(self, data_spec, batch_size, max_length, num_steps=2,
+                 codecs=None, seed=None):
+        """
+        Args:
+            data_spec: Nested TensorSpec of one item, e.g.
+                `agent.collect_data_spec`.
+            batch_size: Number of environments adding items together.
+            max_length: Number of steps stored per environment.
+            num_steps: Length of the sampled sequences, 2 for the DQN and
+                SAC agents.
+            codecs: FieldCodec of every field of `tf.nest.flatten(data_spec)`,
+                e.g. `compact_bipedal_walker_codecs(data_spec)`. Fields are
+                stored as they are when None.
+            seed: Seed of the sampling random number generator.
+        """
+        super(UniformReplayBuffer, self).__init__(
+            data_spec, batch_size, max_length, num_steps, codecs, seed)
+
+    def _sample_ids(self, sample_batch_size):
+        oldest_step = self._oldest_step()
+        num_rows = self._num_adds - oldest_step
+        num_starts = num_rows - self.num_steps + 1
+        steps = oldest_step + self._rng.integers(
+            num_starts, size=sample_batch_size)
+        columns = self._rng.integers(self.batch_size, size=sample_batch_size)
+        probabilities = np.full(
+            sample_batch_size, 1.0 / (num_starts * self.batch_size))
+        return steps * self.batch_size + columns, probabilities
+
+
+class MemmapReplayBuffer(UniformReplayBuffer):
+    """
+    Uniform replay buffer stored in memory-mapped .npy files.
+
+    Every stored part of every field is a file in `directory`, so
+    the buffer can hold more transitions than fit in RAM, and sampled
+    sequences are gathered straight from the mapped pages without loading
+    the rest of the buffer. `flush` writes the number of stored steps next
+    to the files; a buffer opened on the same directory with the same
+    layout resumes from the last flush, which lets a restarted run train
+    on a warm buffer.
+
+    Steps added after the last flush may have reached the files before the
+    process stopped, overwriting the oldest flushed steps. Before adding
+    steps past the last flush, the buffer records how far ahead it may
+    write, in windows of 1/64 of `max_length`, and a resumed buffer leaves
+    out the flushed steps that such writes could have overwritten until
+    they are overwritten again.
+
+    Mapped pages count towards the resident memory of the process. With
+    `max_resident_bytes`, the buffer drops its pages after an add or a
+    sample once the pages it may have mapped since the last drop
+    exceed the limit; they are read back from the page cache or disk when
+    sampled again.
+    """
+
+    METADATA_FILE = "metadata.json"
+    # Linux maps up to 64 KiB of cached pages around a read fault
+    FAULT_AROUND_BYTES = 64 * 1024
+
+    def __init__(self, data_spec, batch_size, max_length, directory,
+                 num_steps=2, max_resident_bytes=None, codecs=None,
+                 seed=None):
+        """
+        Args:
+            data_spec: Nested TensorSpec of one item, e.g.
+                `agent.collect_data_spec`.
+            batch_size: Number of environments adding items together.
+            max_length: Number of steps stored per environment.
+            directory: Directory of the .npy files, created if needed.
+            num_steps: Length of the sampled sequences, 2 for the DQN and
+                SAC agents.
+            max_resident_bytes: Approximate limit on the resident memory of
+                the mapped files, unlimited when None.
+            codecs: FieldCodec of every field of `tf.nest.flatten(data_spec)`,
+                e.g. `compact_bipedal_walker_codecs(data_spec)`. Fields are
+                stored as they are when None.
+            seed: Seed of the sampling random number generator.
+        """
+        self.directory = directory
+        self.max_resident_bytes = max_resident_bytes
+        self._maps = []
+        # Steps past the last flush covered by one write of the metadata
+        self._window_steps = max(1, max_length // 64)
+        super(MemmapReplayBuffer, self).__init__(
+            data_spec, batch_size, max_length, num_steps, codecs, seed)
+        self._row_bytes = self.bytes_per_item() * batch_size
+        self._touched_bytes = 0
+
+    def _allocate(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for (path, _), parts in zip(
+                nest_utils.flatten_with_joined_paths(self.data_spec),
+                self._parts):
+            field = path.replace("/", ".")
+            for suffix, shape, dtype in parts:
+                name = field + "." + suffix if suffix else field
+                files.append((name, shape, np.dtype(dtype)))
+        self._layout = {
+            "batch_size": self.batch_size,
+            "max_length": self.max_length,
+            "fields": [
+                {"name": name, "dtype": dtype.name, "shape": list(shape)}
+                for name, shape, dtype in files],
+        }
+        metadata = self._read_metadata()
+        # Steps below `_dirty_until - max_length` may be overwritten on disk
+        # by steps that were not flushed
+        self._dirty_until = self.max_length
+        if metadata is not None:
+            num_adds = metadata.pop("num_adds")
+            dirty_until = metadata.pop("dirty_until", num_adds)
+            if metadata != self._layout:
+                raise ValueError(
+                    f"The replay buffer in {self.directory} has a different "
+                    f"layout: {metadata}")
+            self._num_adds = num_adds
+            self._dirty_until = dirty_until
+        self._flushed_adds = self._num_adds
+        # Flushed steps below this one are left out of samples
+        self._first_step = min(
+            self._dirty_until - self.max_length, self._num_adds)
+
+        arrays = []
+        for name, shape, dtype in files:
+            path = os.path.join(self.directory, name + ".npy")
+            if metadata is None:
+                # Writes the .npy header and sizes the file
+                np.lib.format.open_memmap(
+                    path, mode="w+", dtype=dtype,
+                    shape=(self.max_length, self.batch_size) + shape)
+            arrays.append(self._map(path))
+        # Regroup the flat list of files by field
+        storage = []
+        for parts in self._parts:
+            storage.append(arrays[:len(parts)])
+            arrays = arrays[len(parts):]
+        return storage
+
+    def _map(self, path):
+        with open(path, "r+b") as file:
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(file)
+            else:
+                header = np.lib.format.read_array_header_2_0(file)
+            shape, fortran_order, dtype = header
+            offset = file.tell()
+            mapping = mmap.mmap(file.fileno(), 0)
+        if hasattr(mmap, "MADV_RANDOM"):
+            # Sampling reads scattered pages, reading ahead of them would
+            # only inflate resident memory
+            mapping.madvise(mmap.MADV_RANDOM)
+        self._maps.append(mapping)
+        return np.ndarray(shape, dtype=dtype, buffer=mapping, offset=offset,
+                          order="F" if fortran_order else "C")
+
+    def _read_metadata(self):
+        path = os.path.join(self.directory, self.METADATA_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def flush(self):
+        """Writes the stored steps to disk and records their number."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        for mapping in self._maps:
+            mapping.flush()
+        # The metadata only ever describes rows that are already on disk.
+        # Flushed steps that were overwritten before a restart stay left out
+        # until they are overwritten again
+        self._flushed_adds = self._num_adds
+        self._dirty_until = max(
+            self._num_adds, self._first_step + self.max_length)
+        self._write_metadata()
+
+    def _write_metadata(self):
+        path = os.path.join(self.directory, self.METADATA_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump(dict(self._layout, num_adds=self._flushed_adds,
+                           dirty_until=self._dirty_until), file)
+        os.replace(path + ".tmp", path)
+
+    def _oldest_step(self):
+        return max(super(MemmapReplayBuffer, self)._oldest_step(),
+                   self._first_step)
+
+    def _touch(self, num_bytes):
+        self._touched_bytes += num_bytes
+        if (self.max_resident_bytes is None
+                or self._touched_bytes <= self.max_resident_bytes):
+            return
+        # Dropping shared file pages keeps dirty ones in the page cache, so
+        # nothing needs to be written first
+        if hasattr(mmap, "MADV_DONTNEED"):
+            for mapping in self._maps:
+                mapping.madvise(mmap.MADV_DONTNEED)
+        self._touched_bytes = 0
+
+    def _adding(self, row):
+        if self._num_adds >= self._dirty_until:
+            self._dirty_until = self._num_adds + self._window_steps
+            self._write_metadata()
+
+    def _added(self, row):
+        self._touch(self._row_bytes)
+
+    def sample(self, sample_batch_size):
+        sample = super(MemmapReplayBuffer, self).sample(sample_batch_size)
+        with self._lock:
+            # Every gathered item may map its own pages of every file
+            self._touch(sample_batch_size * self.num_steps * len(self._maps)
+                        * self.FAULT_AROUND_BYTES)
+        return sample
+
+
+class TDErrorRecorder:
+    """
+    Element-wise squared loss that records the absolute TD errors.
+
+    Agents such as SacAgent only report the total loss, so passing an
+    instance as their `td_errors_loss_fn` exposes the TD error of every
+    sampled sequence in `td_errors` after a train step. SacAgent calls the
+    loss once for each of its `num_critics` critics per step; the largest
+    of their errors is kept, so a transition is prioritized as long as any
+    critic still fits it poorly.
+    """
+
+    def __init__(self, sample_batch_size, num_critics=2):
+        self.num_critics = num_critics
+        self.td_errors = tf.Variable(
+            tf.zeros(sample_batch_size), trainable=False, name="td_errors")
+        self._calls = tf.Variable(
+            0, dtype=tf.int64, trainable=False, name="td_error_calls")
+
+    def __call__(self, td_targets, predictions):
+        td_errors = tf.stop_gradient(tf.abs(td_targets - predictions))
+        # The first critic of a train step replaces the previous step's errors
+        first_critic = tf.equal(self._calls % self.num_critics, 0)
+        self.td_errors.assign(tf.where(
+            first_critic, td_errors, tf.maximum(self.td_errors, td_errors)))
+        self._calls.assign_add(1)
+        return common.element_wise_squared_loss(td_targets, predictions)
@@ -1,19 +1,101 @@
+import time
+
 import tensorflow as tf
+from tf_agents.drivers import dynamic_step_driver
+from tf_agents.environments import batched_py_environment
 from tf_agents.environments import suite_gym
 from tf_agents.environments import tf_py_environment
 from tf_agents.agents.sac import sac_agent
-from tf_agents.networks import actor_distribution_network, critic_network
+from tf_agents.agents.ddpg import critic_network
+from tf_agents.networks import actor_distribution_network
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
-from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
+from tf_agents.policies import actor_policy
+from tf_agents.policies import greedy_policy
 from tf_agents.policies import policy_saver
+from tf_agents.policies import random_tf_policy
+
+from agents.evaluation import AsyncEvaluator, evaluate_episodes
+from agents.profiling import TrainingProfiler
+from agents.replay_buffers import (
+    MemmapReplayBuffer, PrioritizedReplayBuffer, TDErrorRecorder,
+    UniformReplayBuffer, compact_bipedal_walker_codecs
+)
+from agents.trajectory_io import TrajectoryWriter, fill_replay_buffer
+from environments.parallel_walker import ParallelBipedalWalker
+
+# Number of environments stepped together during collection
+num_parallel_environments = 1
+# Step the environments in BipedalWalkerV2 worker processes instead of
+# in-process BipedalWalker-v3 environments. This also changes the task:
+# BipedalWalkerV2 shapes its reward differently from BipedalWalker-v3
+use_worker_processes = False
+# Evaluation episodes, all played at once on a batch of environments
+num_eval_episodes = 10
+# Evaluate snapshots of the policy on a background thread instead of
+# pausing training
+async_evaluation = True
+# Sample transitions by TD error from a sum-tree instead of uniformly
+prioritized_replay = False
+# Transitions per training batch
+sample_batch_size = 64
+# Steps stored per environment
+replay_buffer_max_length = 100000
+# Keep the replay buffer in memory-mapped files in this directory instead of
+# in RAM, so it can outgrow RAM and a restarted run resumes with it warm.
+# The on-disk buffer samples uniformly.
+replay_buffer_dir = None
+# Approximate cap on the resident memory of the on-disk buffer
+replay_buffer_max_resident_bytes = 2 * 2**30
+# Store transitions quantized, lidar as uint8, contact flags as bits and
+# the other observation values, actions and discounts as float16: 51 bytes
+# per transition instead of 128
+compact_replay = False
+# Stream every collected trajectory to compressed .npz shards in this
+# directory, for offline training or warm starts
+trajectory_dir = None
+# Fill an empty replay buffer from the trajectory shards in this directory,
+# written with as many environments, instead of collecting random steps
+warm_start_dir = None
+# Append rolling histograms of the time spent stepping the environments,
+# in the policy, adding to and sampling from the replay buffer and training
+# to this JSON-lines file every profile_interval iterations
+profile_path = None
+profile_interval = 1000
+# Write a tf.profiler trace of these training steps, e.g. (500, 510), to
+# profile_trace_dir for TensorBoard
+profile_trace_steps = None
+profile_trace_dir = "./profile"
+
+profiler = TrainingProfiler(
+    profile_path,
+    export_interval=profile_interval,
+    trace_dir=profile_trace_dir,
+    trace_steps=profile_trace_steps
+)
 
 # Load the BipedalWalker environment
 env_name = "BipedalWalker-v3"
-train_py_env = suite_gym.load(env_name)
-eval_py_env = suite_gym.load(env_name)
+if use_worker_processes:
+    train_py_env = ParallelBipedalWalker(num_parallel_environments)
+    eval_py_env = ParallelBipedalWalker(num_eval_episodes)
+else:
+    if num_parallel_environments > 1:
+        train_py_env = batched_py_environment.BatchedPyEnvironment(
+            [suite_gym.load(env_name)
+             for _ in range(num_parallel_environments)],
+            multithreading=False
+        )
+    else:
+        train_py_env = suite_gym.load(env_name)
+    eval_py_env = batched_py_environment.BatchedPyEnvironment(
+        [suite_gym.load(env_name) for _ in range(num_eval_episodes)],
+        multithreading=False
+    )
 
-train_env = tf_py_environment.TFPyEnvironment(train_py_env)
+train_env = tf_py_environment.TFPyEnvironment(
+    profiler.wrap_environment(train_py_env)
+)
 eval_env = tf_py_environment.TFPyEnvironment(eval_py_env)
 
 # Define the Actor and Critic networks
@@ -33,7 +115,15 @@ critic_net = critic_network.CriticNetwork(
 optimizer = tf.compat.v1.train.AdamOptimizer(
     learning_rate=3e-4
 )
-train_step_counter = tf.Variable(0)
+train_step_counter = tf.Variable(0, dtype=tf.int64)
+
+# SacAgent only reports its total loss, so the per-transition TD errors used
+# as priorities are recorded by the critic loss function, which keeps the
+# larger error of the two critics
+if prioritized_replay:
+    td_errors_loss_fn = TDErrorRecorder(sample_batch_size)
+else:
+    td_errors_loss_fn = common.element_wise_squared_loss
 
 agent = sac_agent.SacAgent(
     train_env.time_step_spec(),
@@ -45,7 +135,7 @@ agent = sac_agent.SacAgent(
     alpha_optimizer=optimizer,
     target_update_tau=0.005,
     target_update_period=1,
-    td_errors_loss_fn=common.element_wise_squared_loss,
+    td_errors_loss_fn=td_errors_loss_fn,
     gamma=0.99,
     reward_scale_factor=1.0,
     train_step_counter=train_step_counter
@@ -53,54 +143,128 @@ agent = sac_agent.SacAgent(
 
 agent.initialize()
 
-# Define the replay buffer
-replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
-    data_spec=agent.collect_data_spec,
-    batch_size=train_env.batch_size,
-    max_length=100000
-)
+# Policy with its own copy of the actor weights, evaluated in the background
+if async_evaluation:
+    eval_actor_net = actor_net.copy(name="EvalActorDistributionNetwork")
+    eval_actor_net.create_variables(train_env.observation_spec())
+    eval_policy = greedy_policy.GreedyPolicy(actor_policy.ActorPolicy(
+        train_env.time_step_spec(),
+        train_env.action_spec(),
+        actor_network=eval_actor_net,
+        training=False
+    ))
+    evaluator = AsyncEvaluator(
+        eval_env, eval_policy, agent.policy.variables(), num_eval_episodes
+    )
 
-# Define the data collection function
+# Define the replay buffer
+if compact_replay:
+    replay_buffer_codecs = compact_bipedal_walker_codecs(
+        agent.collect_data_spec
+    )
+else:
+    replay_buffer_codecs = None
+if replay_buffer_dir is not None:
+    replay_buffer = MemmapReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length,
+        directory=replay_buffer_dir,
+        max_resident_bytes=replay_buffer_max_resident_bytes,
+        codecs=replay_buffer_codecs
+    )
+elif prioritized_replay:
+    replay_buffer = PrioritizedReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length,
+        codecs=replay_buffer_codecs
+    )
+elif compact_replay:
+    replay_buffer = UniformReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length,
+        codecs=replay_buffer_codecs
+    )
+else:
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length
+    )
 
+# Define the compute_avg_return function
 
-def collect_step(environment, policy, buffer):
-    time_step = environment.current_time_step()
-    action_step = policy.action(time_step)
-    next_time_step = environment.step(action_step.action)
-    traj = trajectory.from_transition(time_step, action_step, next_time_step)
 
-    # Add trajectory to the replay buffer
-    buffer.add_batch(traj)
+def compute_avg_return(environment, policy, num_episodes=10):
+    returns, unused_lengths = evaluate_episodes(
+        environment, policy, num_episodes
+    )
+    return returns.mean()
 
 
-# Define the compute_avg_return function
+def log_evaluations(evaluator, returns):
+    # Print and record the background evaluations that have finished
+    for result in evaluator.results():
+        print(f"step = {result.step}: "
+              f"Average Return = {result.returns.mean()}, "
+              f"Average Length = {result.lengths.mean()}")
+        returns.append(result.returns.mean())
 
 
-def compute_avg_return(environment, policy, num_episodes=10):
-    total_return = 0.0
-    for _ in range(num_episodes):
-        time_step = environment.reset()
-        episode_return = 0.0
-        while not time_step.is_last():
-            action_step = policy.action(time_step)
-            time_step = environment.step(action_step.action)
-            episode_return += time_step.reward
-        total_return += episode_return
-    avg_return = total_return / num_episodes
-    return avg_return.numpy()[0]
+def train_on_batch(experience, info):
+    # Prioritized batches are reweighted for their sampling bias, and their
+    # priorities are refreshed from the TD errors of the update
+    if not isinstance(replay_buffer, PrioritizedReplayBuffer):
+        return agent.train(experience)
+    loss_info = agent.train(
+        experience,
+        weights=replay_buffer.importance_weights(info.probabilities)
+    )
+    replay_buffer.update_priorities(
+        info.ids.numpy(), td_errors_loss_fn.td_errors.numpy()
+    )
+    return loss_info
 
 
 # Training the agent
 num_iterations = 20000
+# Random-policy steps per environment collected before training starts
+initial_collect_steps = 1000
+# Steps per environment collected, and gradient steps taken, per iteration
 collect_steps_per_iteration = 1
+train_steps_per_iteration = 1
 log_interval = 200
 eval_interval = 1000
-num_eval_episodes = 10
+
+# Drivers that collect into the replay buffer; num_steps counts the steps
+# of all the batched environments together
+observers = [profiler.timed("buffer_add", replay_buffer.add_batch)]
+if trajectory_dir is not None:
+    trajectory_writer = TrajectoryWriter(
+        trajectory_dir, agent.collect_data_spec
+    )
+    observers.append(profiler.timed("trajectory_write", trajectory_writer))
+initial_collect_driver = dynamic_step_driver.DynamicStepDriver(
+    train_env,
+    random_tf_policy.RandomTFPolicy(
+        train_env.time_step_spec(), train_env.action_spec()
+    ),
+    observers=observers,
+    num_steps=initial_collect_steps * train_env.batch_size
+)
+collect_driver = dynamic_step_driver.DynamicStepDriver(
+    train_env,
+    profiler.time_policy(agent.collect_policy),
+    observers=observers,
+    num_steps=collect_steps_per_iteration * train_env.batch_size
+)
 
 # Dataset generates trajectories with shape [Bx2x...]
 dataset = replay_buffer.as_dataset(
     num_parallel_calls=3,
-    sample_batch_size=64,
+    sample_batch_size=sample_batch_size,
     num_steps=2
 ).prefetch(3)
 
@@ -109,38 +273,101 @@ iterator = iter(dataset)
 # (Optional) Optimize by wrapping some of the code in a graph using TF
 # function.
 agent.train = common.function(agent.train)
+initial_collect_driver.run = common.function(initial_collect_driver.run)
+collect_driver.run = common.function(collect_driver.run)
 
 # Reset the train step
 agent.train_step_counter.assign(0)
 
 # Evaluate the agent's policy once before training.
-avg_return = compute_avg_return(eval_env, agent.policy, num_eval_episodes)
-returns = [avg_return]
+returns = []
+if async_evaluation:
+    evaluator.evaluate(0)
+else:
+    returns.append(
+        compute_avg_return(eval_env, agent.policy, num_eval_episodes)
+    )
 
-for _ in range(num_iterations):
+# Fill the replay buffer with random experience so sampling can start,
+# unless it was restored warm from disk, or from logged trajectories.
+if replay_buffer.num_frames() == 0:
+    if warm_start_dir is not None:
+        fill_replay_buffer(
+            replay_buffer, warm_start_dir, agent.collect_data_spec
+        )
+    else:
+        initial_collect_driver.run()
+
+collect_time = train_time = 0.0
+for iteration in range(1, num_iterations + 1):
     # Collect a few steps using collect_policy and save to the replay buffer.
-    for _ in range(collect_steps_per_iteration):
-        collect_step(train_env, agent.collect_policy, replay_buffer)
+    collect_start = time.perf_counter()
+    with profiler.section("collect"):
+        collect_driver.run()
+    collect_time += time.perf_counter() - collect_start
 
-    # Sample a batch of data from the buffer and update the agent's network.
-    experience, unused_info = next(iterator)
-    train_loss = agent.train(experience).loss
+    # Sample batches of data from the buffer and update the agent's network.
+    train_start = time.perf_counter()
+    for _ in range(train_steps_per_iteration):
+        with profiler.section("sample"):
+            experience, info = next(iterator)
+        with profiler.section("train"):
+            train_loss = train_on_batch(experience, info).loss
+    train_time += time.perf_counter() - train_start
 
     step = agent.train_step_counter.numpy()
 
-    if step % log_interval == 0:
+    if iteration % log_interval == 0:
+        env_steps = (log_interval * collect_steps_per_iteration
+                     * train_env.batch_size)
+        train_steps = log_interval * train_steps_per_iteration
         print(f"step = {step}: "
-              f"loss = {train_loss}")
+              f"loss = {train_loss}, "
+              f"env steps/sec = {env_steps / collect_time:.1f}, "
+              f"grad steps/sec = {train_steps / train_time:.1f}")
+        collect_time = train_time = 0.0
+        if profiler.enabled:
+            print(f"step = {step}: {profiler.format_summary()}")
 
-    if step % eval_interval == 0:
-        avg_return = compute_avg_return(
-            eval_env, agent.policy, num_eval_episodes
-        )
-        print(f"step = {step}: "
-              f"Average Return = {avg_return}")
-        returns.append(avg_return)
+    if iteration % eval_interval == 0:
+        with profiler.section("evaluate"):
+            if not async_evaluation:
+                avg_return = compute_avg_return(
+                    eval_env, agent.policy, num_eval_episodes
+                )
+                print(f"step = {step}: "
+                      f"Average Return = {avg_return}")
+                returns.append(avg_return)
+            elif not evaluator.evaluate(step):
+                print(f"step = {step}: "
+                      f"skipped evaluation, the previous one is still "
+                      f"running")
+
+    if async_evaluation:
+        log_evaluations(evaluator, returns)
+
+    if replay_buffer_dir is not None and iteration % eval_interval == 0:
+        with profiler.section("buffer_flush"):
+            replay_buffer.flush()
+
+    profiler.step(step)
+
+if replay_buffer_dir is not None:
+    replay_buffer.flush()
+
+if trajectory_dir is not None:
+    trajectory_writer.close()
+
+profiler.close()
 
 # Save the policy
 policy_dir = './policy'
 tf_policy_saver = policy_saver.PolicySaver(agent.policy)
 tf_policy_saver.save(policy_dir)
+
+if async_evaluation:
+    evaluator.close()
+    log_evaluations(evaluator, returns)
+
+train_env.close()
+eval_env.close()
@@ -0,0 +1,240 @@
+import glob
+import os
+import queue
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.utils import nest_utils
+
+SHARD_PATTERN = "shard-*.npz"
+
+
+def _field_names(data_spec):
+    return [path.replace("/", ".")
+            for path, _ in nest_utils.flatten_with_joined_paths(data_spec)]
+
+
+def shard_paths(directory):
+    """
+    Returns:
+        List[str]: The trajectory shards in `directory`, in writing order.
+    """
+    return sorted(glob.glob(os.path.join(directory, SHARD_PATTERN)))
+
+
+class TrajectoryWriter:
+    """
+    Streams collected trajectories to chunked .npz shards.
+
+    A writer is a driver observer, like `replay_buffer.add_batch`: every call
+    appends one step of every environment. Once `steps_per_shard` steps are
+    buffered, they are handed to a background thread that writes them to
+    `directory` as `shard-<n>.npz`, with one (steps, batch_size, ...) array
+    per field of `data_spec`, so collection does not wait for compression
+    or disk. Consecutive steps of an environment stay consecutive within a
+    shard, which lets `trajectory_dataset` cut them into sequences. A writer
+    opened on a directory that already holds shards numbers its shards
+    after them.
+    """
+
+    def __init__(self, directory, data_spec, steps_per_shard=1000,
+                 compress=True):
+        """
+        Args:
+            directory: Directory of the shards, created if needed.
+            data_spec: Nested TensorSpec of one item, e.g.
+                `agent.collect_data_spec`.
+            steps_per_shard: Number of steps of every environment per shard.
+            compress: Write the shards with np.savez_compressed instead of
+                np.savez.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.steps_per_shard = steps_per_shard
+        self._save = np.savez_compressed if compress else np.savez
+        self._names = _field_names(data_spec)
+        self._next_shard = len(shard_paths(directory))
+        self._steps = []
+        self._lock = threading.Lock()
+
+        self._requests = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="TrajectoryWriter", daemon=True)
+        self._thread.start()
+
+    def __call__(self, items):
+        """
+        Appends one item per environment. Usable as a driver observer.
+
+        Args:
+            items: Nested tensors matching `data_spec` with an outer
+                dimension of the number of environments.
+        """
+        return tf.numpy_function(
+            self._append, tf.nest.flatten(items), tf.int64,
+            name="trajectory_append")
+
+    def _append(self, *items):
+        self._raise_error()
+        with self._lock:
+            # numpy_function may hand over views of TF buffers
+            self._steps.append([np.array(item) for item in items])
+            if len(self._steps) >= self.steps_per_shard:
+                self._hand_over()
+            return np.int64(len(self._steps))
+
+    def _hand_over(self):
+        if not self._steps:
+            return
+        path = os.path.join(
+            self.directory, f"shard-{self._next_shard:06d}.npz")
+        self._requests.put((path, self._steps))
+        self._next_shard += 1
+        self._steps = []
+
+    def flush(self):
+        """Writes the buffered steps as a shard, even if it is not full."""
+        with self._lock:
+            self._hand_over()
+
+    def close(self):
+        """Writes the buffered steps and waits for every shard."""
+        self.flush()
+        self._requests.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Writing a trajectory shard failed") from (
+                self._error)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            path, steps = request
+            try:
+                fields = {name: np.stack(field)
+                          for name, field in zip(self._names, zip(*steps))}
+                # Written under a temporary name, so readers never see a
+                # partial shard
+                with open(path + ".tmp", "wb") as file:
+                    self._save(file, **fields)
+                os.replace(path + ".tmp", path)
+            except Exception as error:
+                self._error = error
+                return
+
+
+def read_shard(path, data_spec):
+    """
+    Returns:
+        Nested np.ndarray matching `data_spec`, with an outer shape of
+        (steps, batch_size).
+    """
+    with np.load(path) as shard:
+        return tf.nest.pack_sequence_as(
+            data_spec, [shard[name] for name in _field_names(data_spec)])
+
+
+def trajectory_dataset(directory, data_spec, sample_batch_size, num_steps=2,
+                       shuffle_buffer_size=10000, cycle_length=4,
+                       repeat=True, seed=None):
+    """
+    Streams sequences of consecutive steps from trajectory shards.
+
+    Shards are read in parallel by an interleaved tf.data pipeline, cut into
+    every sequence of `num_steps` consecutive steps of one environment,
+    shuffled and batched, and the batches are prefetched. Sequences do not
+    span two shards.
+
+    Args:
+        directory: Directory of the shards written by TrajectoryWriter.
+        data_spec: Nested TensorSpec the shards were written with.
+        sample_batch_size: Number of sequences per batch.
+        num_steps: Length of the sequences, 2 for the DQN and SAC agents.
+        shuffle_buffer_size: Number of sequences shuffled together.
+        cycle_length: Number of shards read at once.
+        repeat: Cycle through the shards endlessly instead of once.
+        seed: Seed of the shard order and of the shuffle.
+
+    Returns:
+        tf.data.Dataset: Nested tensors matching `data_spec` with an outer
+        shape of [sample_batch_size, num_steps], like the experience sampled
+        from a replay buffer.
+    """
+    paths = shard_paths(directory)
+    if not paths:
+        raise ValueError(f"No trajectory shards in {directory}")
+    names = _field_names(data_spec)
+    specs = tf.nest.flatten(data_spec)
+    # A mismatch would only surface inside the parallel reads
+    for name, spec, field in zip(
+            names, specs, tf.nest.flatten(read_shard(paths[0], data_spec))):
+        if (field.dtype != spec.dtype.as_numpy_dtype
+                or field.shape[2:] != tuple(spec.shape)):
+            raise ValueError(
+                f"Field {name} of {paths[0]} is {field.dtype} with item "
+                f"shape {field.shape[2:]}, expected {spec.dtype.name} with "
+                f"item shape {tuple(spec.shape)}")
+
+    def sequences(path):
+        with np.load(path.decode()) as shard:
+            fields = [shard[name] for name in names]
+        num_starts = max(len(fields[0]) - num_steps + 1, 0)
+        rows = np.arange(num_starts)[:, None] + np.arange(num_steps)
+        # (starts, num_steps, batch_size, ...) to one sequence per row
+        return [np.swapaxes(field[rows], 1, 2).reshape(
+                    (-1, num_steps) + field.shape[2:])
+                for field in fields]
+
+    def load(path):
+        fields = tf.numpy_function(
+            sequences, [path], [spec.dtype for spec in specs],
+            name="trajectory_load")
+        for field, spec in zip(fields, specs):
+            field.set_shape([None, num_steps] + spec.shape.as_list())
+        return tf.data.Dataset.from_tensor_slices(tuple(fields))
+
+    files = tf.data.Dataset.list_files(
+        os.path.join(directory, SHARD_PATTERN), shuffle=True, seed=seed)
+    if repeat:
+        files = files.repeat()
+    return files.interleave(
+        load, cycle_length=cycle_length,
+        num_parallel_calls=tf.data.AUTOTUNE, deterministic=False
+    ).shuffle(shuffle_buffer_size, seed=seed).batch(
+        sample_batch_size, drop_remainder=True
+    ).map(
+        lambda *fields: tf.nest.pack_sequence_as(data_spec, list(fields))
+    ).prefetch(tf.data.AUTOTUNE)
+
+
+def fill_replay_buffer(replay_buffer, directory, data_spec):
+    """
+    Adds the steps of every trajectory shard to a replay buffer, in order.
+
+    Warm-starts training from logged trajectories instead of collecting
+    random steps. The shards must have been written from as many
+    environments as the replay buffer has.
+
+    Returns:
+        int: Number of steps added per environment.
+    """
+    @tf.function(reduce_retracing=True)
+    def add(items):
+        num_steps = tf.shape(tf.nest.flatten(items)[0])[0]
+        for step in tf.range(num_steps):
+            replay_buffer.add_batch(
+                tf.nest.map_structure(lambda field: field[step], items))
+
+    num_steps = 0
+    for path in shard_paths(directory):
+        items = read_shard(path, data_spec)
+        add(items)
+        num_steps += len(tf.nest.flatten(items)[0])
+    return num_steps
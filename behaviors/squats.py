@@ -1,6 +1,22 @@
 import gym
 import numpy as np
 from gym import spaces
+from gym.vector import VectorEnv
+
+
+def _squat_spaces():
+    """
+    Returns:
+        Tuple[spaces.Box, spaces.Box]: Action and observation space of one
+        trainee.
+    """
+    action_space = spaces.Box(
+        low=np.array([-1, -1]), high=np.array([1, 1]), dtype=np.float32)
+    observation_space = spaces.Box(
+        low=np.array([-np.pi, -5.0, -5.0, -1.0]),
+        high=np.array([np.pi, 5.0, 5.0, 1.0]),
+        dtype=np.float32)
+    return action_space, observation_space
 
 
 class SquatEnv(gym.Env):
@@ -10,12 +26,7 @@ class SquatEnv(gym.Env):
 
     def __init__(self):
         super(SquatEnv, self).__init__()
-        self.action_space = spaces.Box(
-            low=np.array([-1, -1]), high=np.array([1, 1]), dtype=np.float32)
-        self.observation_space = spaces.Box(
-            low=np.array([-np.pi, -5.0, -5.0, -1.0]),
-            high=np.array([np.pi, 5.0, 5.0, 1.0]),
-            dtype=np.float32)
+        self.action_space, self.observation_space = _squat_spaces()
         self.state = None
         self.reset()
 
@@ -52,3 +63,71 @@ class SquatEnv(gym.Env):
 
     def close(self):
         pass
+
+
+class BatchedSquatEnv(VectorEnv):
+    """
+    Vectorized SquatEnv that steps N independent trainees at once.
+
+    The states of all trainees live in one (N, 4) float32 array of
+    [angle, angular_velocity, vertical_velocity, depth] rows, updated in
+    place, and rewards and terminations are computed as masks over the
+    batch. Implements the gym vector-env API like gym.vector.SyncVectorEnv:
+    `step` takes an (N, 2) action array and returns (N, 4) observations with
+    (N,) rewards and dones, and a trainee that falls over is reset right
+    away, its returned observation being the first of the next episode and
+    its final one stored in `infos[i]["terminal_observation"]`.
+    """
+
+    def __init__(self, num_envs):
+        """
+        Args:
+            num_envs: Number of trainees simulated in parallel.
+        """
+        if num_envs < 1:
+            raise ValueError(f"num_envs must be at least 1, got {num_envs}")
+        action_space, observation_space = _squat_spaces()
+        super(BatchedSquatEnv, self).__init__(
+            num_envs, observation_space, action_space)
+        self.state = np.zeros((num_envs, 4), dtype=np.float32)
+        self._actions = None
+
+    def reset_wait(self, seed=None, return_info=False, options=None):
+        # The initial state is deterministic, so seeds are not used
+        self.state[:] = 0.0
+        if return_info:
+            return self.state.copy(), [{} for _ in range(self.num_envs)]
+        return self.state.copy()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.float32).reshape(
+            self.num_envs, 2)
+
+    def step_wait(self):
+        """
+        Returns:
+            Tuple of the (N, 4) observations, (N,) float64 rewards, (N,)
+            bool dones and a list of N info dicts.
+        """
+        state = self.state
+        angle = state[:, 0]
+        action = self._actions
+        angle += action[:, 0] * 0.1
+        state[:, 1] = action[:, 0] * 5.0
+        state[:, 2] = np.abs(np.sin(angle)) * -5.0
+        state[:, 3] += action[:, 1] * 0.1
+
+        abs_angle = np.abs(angle).astype(np.float64)
+        reward = -abs_angle  # Reward for maintaining upright position
+        reward += abs_angle < 0.1  # Bonus for being close to upright
+        reward += np.abs(state[:, 3]) > 0.5  # Bonus for squat depth
+        done = abs_angle > np.pi / 2
+        reward[done] -= 10.0  # Penalty for falling over
+
+        infos = [{} for _ in range(self.num_envs)]
+        if np.any(done):
+            finished = np.flatnonzero(done)
+            for i, observation in zip(finished, state[finished]):
+                infos[i]["terminal_observation"] = observation
+            state[finished] = 0.0
+        return state.copy(), reward, done, infos
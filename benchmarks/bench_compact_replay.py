@@ -0,0 +1,189 @@
+"""
+Benchmark compact BipedalWalker transition storage.
+
+Reports the bytes stored per transition with and without
+`compact_bipedal_walker_codecs`, the quantization error of the compact
+observation layout on BipedalWalkerV2 random-action rollouts, and the
+sampling throughput of both layouts at 1M capacity. With
+`--learning-iterations`, SAC is also trained on BipedalWalker-v3 from the
+same seeds with either layout and the evaluation returns are printed side
+by side.
+
+Usage:
+    python -m benchmarks.bench_compact_replay [--batches 2000] [--learning-iterations 0]
+"""
+import argparse
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.agents.ddpg import critic_network
+from tf_agents.agents.sac import sac_agent
+from tf_agents.drivers import dynamic_step_driver
+from tf_agents.environments import batched_py_environment
+from tf_agents.environments import suite_gym
+from tf_agents.environments import tf_py_environment
+from tf_agents.networks import actor_distribution_network
+from tf_agents.policies import random_tf_policy
+from tf_agents.utils import common
+
+from agents.evaluation import evaluate_episodes
+from agents.replay_buffers import (
+    BipedalWalkerObservationCodec, UniformReplayBuffer,
+    compact_bipedal_walker_codecs
+)
+from benchmarks.bench_replay import fill, time_batches, transition_spec
+from environments.bipedal_walker import BipedalWalkerV2
+
+OBSERVATION_GROUPS = {
+    "state": BipedalWalkerObservationCodec.STATE,
+    "contacts": BipedalWalkerObservationCodec.CONTACTS,
+    "lidar": list(range(14, 24)),
+}
+
+
+def rollout_observations(num_steps, seed):
+    """
+    Returns:
+        np.ndarray: Observations of random-action BipedalWalkerV2 episodes.
+    """
+    env = BipedalWalkerV2()
+    rng = np.random.default_rng(seed)
+    observations = [env.reset(seed=seed)[0]]
+    for _ in range(num_steps - 1):
+        action = rng.uniform(-1, 1, size=4).astype(np.float32)
+        observation, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            observation = env.reset()[0]
+        observations.append(observation)
+    env.close()
+    return np.array(observations, dtype=np.float32)
+
+
+def train_sac(compact, num_iterations, eval_interval, seed):
+    """
+    Trains SAC as agents/train_agent.py does on one environment.
+
+    Returns:
+        List[float]: Average return of 5 evaluation episodes every
+        `eval_interval` iterations, starting before training.
+    """
+    tf.random.set_seed(seed)
+    train_py_env = suite_gym.load("BipedalWalker-v3")
+    train_py_env.seed(seed)
+    eval_py_envs = [suite_gym.load("BipedalWalker-v3") for _ in range(5)]
+    for i, eval_py_env in enumerate(eval_py_envs):
+        eval_py_env.seed(seed + 1 + i)
+    train_env = tf_py_environment.TFPyEnvironment(train_py_env)
+    eval_env = tf_py_environment.TFPyEnvironment(
+        batched_py_environment.BatchedPyEnvironment(
+            eval_py_envs, multithreading=False))
+
+    actor_net = actor_distribution_network.ActorDistributionNetwork(
+        train_env.observation_spec(), train_env.action_spec(),
+        fc_layer_params=(256, 256))
+    critic_net = critic_network.CriticNetwork(
+        (train_env.observation_spec(), train_env.action_spec()),
+        observation_fc_layer_params=None, action_fc_layer_params=None,
+        joint_fc_layer_params=(256, 256))
+    optimizer = tf.compat.v1.train.AdamOptimizer(learning_rate=3e-4)
+    agent = sac_agent.SacAgent(
+        train_env.time_step_spec(), train_env.action_spec(),
+        actor_network=actor_net, critic_network=critic_net,
+        actor_optimizer=optimizer, critic_optimizer=optimizer,
+        alpha_optimizer=optimizer, target_update_tau=0.005,
+        target_update_period=1,
+        td_errors_loss_fn=common.element_wise_squared_loss, gamma=0.99)
+    agent.initialize()
+
+    if compact:
+        codecs = compact_bipedal_walker_codecs(agent.collect_data_spec)
+    else:
+        codecs = None
+    replay_buffer = UniformReplayBuffer(
+        agent.collect_data_spec, batch_size=train_env.batch_size,
+        max_length=100000, codecs=codecs, seed=seed)
+    dynamic_step_driver.DynamicStepDriver(
+        train_env,
+        random_tf_policy.RandomTFPolicy(
+            train_env.time_step_spec(), train_env.action_spec()),
+        observers=[replay_buffer.add_batch], num_steps=1000).run()
+    collect = common.function(dynamic_step_driver.DynamicStepDriver(
+        train_env, agent.collect_policy,
+        observers=[replay_buffer.add_batch], num_steps=1).run)
+    train = common.function(agent.train)
+    iterator = iter(replay_buffer.as_dataset(
+        sample_batch_size=64, num_steps=2, num_parallel_calls=3).prefetch(3))
+
+    returns = [evaluate_episodes(eval_env, agent.policy, 5)[0].mean()]
+    for iteration in range(1, num_iterations + 1):
+        collect()
+        train(next(iterator)[0])
+        if iteration % eval_interval == 0:
+            returns.append(
+                evaluate_episodes(eval_env, agent.policy, 5)[0].mean())
+    return returns
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--sample-batch-size", type=int, default=256)
+    parser.add_argument("--environments", type=int, default=1000)
+    parser.add_argument("--max-length", type=int, default=1000)
+    parser.add_argument("--rollout-steps", type=int, default=20000)
+    parser.add_argument("--learning-iterations", type=int, default=0,
+                        help="SAC iterations per layout, 0 to skip.")
+    parser.add_argument("--eval-interval", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    spec = transition_spec()
+    full = UniformReplayBuffer(
+        spec, batch_size=args.environments, max_length=args.max_length,
+        seed=0)
+    compact = UniformReplayBuffer(
+        spec, batch_size=args.environments, max_length=args.max_length,
+        codecs=compact_bipedal_walker_codecs(spec), seed=0)
+    capacity = args.environments * args.max_length
+    print(f"{'layout':>8} {'bytes/transition':>17} "
+          f"{f'MB at {capacity}':>14}")
+    for name, replay_buffer in (("float32", full), ("compact", compact)):
+        size = replay_buffer.bytes_per_item()
+        print(f"{name:>8} {size:>17} {size * capacity / 2**20:>14.0f}")
+
+    observations = rollout_observations(args.rollout_steps, args.seed)
+    codec = BipedalWalkerObservationCodec()
+    decoded = codec.decode(codec.encode(observations), spec.observation)
+    errors = np.abs(decoded - observations)
+    print(f"\nobservation error over {len(observations)} rollout steps")
+    print(f"{'group':>8} {'max abs':>10} {'mean abs':>10}")
+    for name, indices in OBSERVATION_GROUPS.items():
+        print(f"{name:>8} {errors[:, indices].max():>10.2e} "
+              f"{errors[:, indices].mean():>10.2e}")
+
+    for replay_buffer in (full, compact):
+        fill(replay_buffer, spec, args.environments, args.max_length)
+    print(f"\nsample batch size {args.sample_batch_size}")
+    print(f"{'layout':>8} {'batches/s':>10}")
+    for name, replay_buffer in (("float32", full), ("compact", compact)):
+        rate = time_batches(replay_buffer.as_dataset(
+            sample_batch_size=args.sample_batch_size, num_steps=2,
+            num_parallel_calls=3).prefetch(3), args.batches)
+        print(f"{name:>8} {rate:>10.0f}")
+    del full, compact
+
+    if args.learning_iterations:
+        curves = [
+            train_sac(compact, args.learning_iterations, args.eval_interval,
+                      args.seed)
+            for compact in (False, True)]
+        print(f"\nSAC average return, seed {args.seed}")
+        print(f"{'iteration':>10} {'float32':>10} {'compact':>10}")
+        for i, (full_return, compact_return) in enumerate(zip(*curves)):
+            print(f"{i * args.eval_interval:>10} {full_return:>10.1f} "
+                  f"{compact_return:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark the per-action latency of DQNAgent.act on CartPole-v1 states.
+
+Times greedy action selection (epsilon = 0) with the NumPy forward pass
+used by DQNAgent.act against the Keras paths it replaced or could use:
+model.predict, a direct model call and a traced tf.function. Also checks
+that every path picks the same actions.
+
+Usage:
+    python -m benchmarks.bench_dqn_act [--actions 500]
+"""
+import argparse
+import time
+
+import gym
+import numpy as np
+import tensorflow as tf
+
+from walking_agents.walking_agent import DQNAgent
+
+
+def latency(select, states):
+    """
+    Returns:
+        Tuple[float, np.ndarray]: Mean latency of one action in us and the
+        selected actions.
+    """
+    select(states[0])  # Build and trace first
+    start = time.perf_counter()
+    actions = [select(state) for state in states]
+    return (time.perf_counter() - start) / len(states) * 1e6, np.array(actions)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actions", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    env = gym.make("CartPole-v1")
+    state_size = env.observation_space.shape[0]
+    agent = DQNAgent(state_size, env.action_space.n)
+    agent.epsilon = 0.0
+    states = np.random.uniform(
+        -1, 1, size=(args.actions, 1, state_size)).astype(np.float32)
+
+    model = agent.model
+    traced = tf.function(model)
+    paths = {
+        "predict": lambda state: np.argmax(
+            model.predict(state, verbose=0)[0]),
+        "model call": lambda state: np.argmax(model(state).numpy()[0]),
+        "tf.function": lambda state: np.argmax(traced(state).numpy()[0]),
+        "numpy (act)": agent.act,
+    }
+    results = {name: latency(select, states)
+               for name, select in paths.items()}
+
+    reference_us, reference_actions = results["predict"]
+    print(f"{'path':>12} {'us/action':>10} {'speedup':>8} {'same actions':>13}")
+    for name, (us, actions) in results.items():
+        same = np.array_equal(actions, reference_actions)
+        print(f"{name:>12} {us:>10.1f} {reference_us / us:>7.1f}x "
+              f"{str(same):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark DQNAgent.replay training throughput on CartPole-v1.
+
+Fills the agent's replay memory with random-policy CartPole-v1 transitions,
+then times minibatch updates of the batched DQNAgent.replay (two batched
+forward passes and one train_on_batch) against the previous per-sample
+update, which called predict twice and fit once for every transition.
+
+Usage:
+    python -m benchmarks.bench_dqn_replay [--updates 200] [--batch-size 32]
+"""
+import argparse
+import time
+
+import gym
+import numpy as np
+
+from walking_agents.walking_agent import DQNAgent
+
+
+def fill_memory(agent, env, num_transitions):
+    state = env.reset()
+    for _ in range(num_transitions):
+        action = env.action_space.sample()
+        next_state, reward, done, _ = env.step(action)
+        agent.remember(state, action, reward if not done else -10,
+                       next_state, done)
+        state = env.reset() if done else next_state
+
+
+def per_sample_replay(agent, batch_size):
+    """The replay update used before minibatches were batched."""
+    states, actions, rewards, next_states, dones = agent.memory.sample(
+        batch_size)
+    for state, action, reward, next_state, done in zip(
+            states[:, np.newaxis], actions, rewards,
+            next_states[:, np.newaxis], dones):
+        target = reward
+        if not done:
+            target = (reward + agent.gamma *
+                      np.amax(agent.model.predict(next_state, verbose=0)[0]))
+        target_f = agent.model.predict(state, verbose=0)
+        target_f[0][action] = target
+        agent.model.fit(state, target_f, epochs=1, verbose=0)
+
+
+def updates_per_second(update, num_updates):
+    update()  # Build and trace the Keras functions first
+    start = time.perf_counter()
+    for _ in range(num_updates):
+        update()
+    return num_updates / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--per-sample-updates", type=int, default=5,
+                        help="Updates timed for the slow per-sample path.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    env = gym.make("CartPole-v1")
+    env.seed(args.seed)
+    agent = DQNAgent(env.observation_space.shape[0], env.action_space.n)
+    fill_memory(agent, env, agent.memory.capacity)
+
+    per_sample = updates_per_second(
+        lambda: per_sample_replay(agent, args.batch_size),
+        args.per_sample_updates)
+    batched = updates_per_second(
+        lambda: agent.replay(args.batch_size), args.updates)
+    print(f"{'replay':>10} {'updates/s':>10} {'samples/s':>10}")
+    for name, speed in (("per-sample", per_sample), ("batched", batched)):
+        print(f"{name:>10} {speed:>10.1f} {speed * args.batch_size:>10.0f}")
+    print(f"speedup: {batched / per_sample:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
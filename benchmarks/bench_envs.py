@@ -0,0 +1,388 @@
+"""
+Benchmark the step rate of every environment in the repository.
+
+Covers BipedalWalkerV2 on normal and hardcore terrain, the legacy
+BipedalWalker, BirdRobotEnvironment raw and wrapped in a TFPyEnvironment,
+and SquatEnv, each under a seeded random policy and a scripted heuristic.
+For every environment and policy it reports env.step calls per second (only
+the step calls are timed, not the policy or the resets), the mean reset
+latency, both as the best of --repeats runs to filter out scheduling noise,
+and per-step allocations from tracemalloc: the blocks and bytes
+still held by the step results and the mean transient peak inside a step.
+
+Results can be written as JSON and compared against a stored baseline
+(benchmarks/baselines/envs.json by default). A step rate below, or a reset
+latency or allocation figure above, the baseline by more than the tolerance
+is reported as a regression and makes the benchmark exit with status 1.
+Baselines are machine-specific: refresh them with --save-baseline on the
+machine the comparisons run on.
+
+Usage:
+    python -m benchmarks.bench_envs [--steps 5000] [--output results.json] [--save-baseline]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.environments import tf_py_environment
+
+from behaviors.squats import SquatEnv
+from config.config import MAX_SPEED, TURN_RATE
+from environments.bipedal_walker import (
+    BipedalWalker,
+    BipedalWalkerHeuristics,
+    BipedalWalkerV2,
+)
+from src.environment import BirdRobotEnvironment
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "baselines", "envs.json")
+# Increases smaller than these are noise, not regressions
+MIN_ALLOCATION_BYTES = 256
+MIN_RESET_MS = 0.5
+
+
+class GymnasiumApi:
+    """Adapts environments whose `step` returns five values."""
+
+    def __init__(self, env):
+        self.env = env
+
+    def reset(self, seed):
+        return self.env.reset(seed=seed)[0]
+
+    def prepare(self, action):
+        return action
+
+    def step(self, action):
+        return self.env.step(action)
+
+    def unpack(self, result):
+        return result[0], result[2] or result[3]
+
+
+class GymApi(GymnasiumApi):
+    """Adapts environments with the gym 0.x `reset` and four-value `step`."""
+
+    def reset(self, seed):
+        if hasattr(self.env, "_seed"):
+            self.env._seed(seed)
+        return self.env.reset()
+
+    def unpack(self, result):
+        return result[0], result[2]
+
+
+class PyEnvironmentApi(GymnasiumApi):
+    """Adapts tf_agents Python environments."""
+
+    def reset(self, seed):
+        return self.env.reset().observation
+
+    def unpack(self, result):
+        return result.observation, result.is_last()
+
+
+class TFEnvironmentApi(GymnasiumApi):
+    """Adapts a TFPyEnvironment around one Python environment."""
+
+    def reset(self, seed):
+        return self.env.reset().observation.numpy()[0]
+
+    def prepare(self, action):
+        return tf.constant([action])
+
+    def unpack(self, result):
+        return result.observation.numpy()[0], bool(result.is_last()[0])
+
+
+def bipedal_random(rng, num_steps):
+    return list(rng.uniform(-1, 1, size=(num_steps, 4)).astype(np.float32))
+
+
+def bipedal_heuristic():
+    return BipedalWalkerHeuristics().step_heuristic
+
+
+def legacy_bipedal_random(rng, num_steps):
+    return list(rng.uniform(-1, 1, size=(num_steps, 2)).astype(np.float32))
+
+
+def legacy_bipedal_heuristic():
+    """Swings the two hips in antiphase, switching at the joint limits."""
+    swing = {"leg": 0}
+
+    def act(observation):
+        # 4 hull values, then (dx, dy, vx, vy, angle, speed) of every leg
+        angles = observation[[8, 14]]
+        leg = swing["leg"]
+        if angles[leg] > 0.8 and angles[1 - leg] < -0.5:
+            swing["leg"] = leg = 1 - leg
+        action = np.full(2, -1.0)
+        action[leg] = 1.0
+        return action
+    return act
+
+
+def bird_random(rng, num_steps):
+    return list(rng.integers(0, 6, size=num_steps).astype(np.int32))
+
+
+def bird_heuristic():
+    """Turns towards the goal, then speeds up and moves forward."""
+    def act(observation):
+        x, y, orientation, velocity, goal_x, goal_y = observation[:6]
+        heading = math.degrees(math.atan2(goal_y - y, goal_x - x))
+        error = (heading - orientation + 180) % 360 - 180
+        if error > TURN_RATE / 2:
+            action = BirdRobotEnvironment.ACTION_TURN_RIGHT
+        elif error < -TURN_RATE / 2:
+            action = BirdRobotEnvironment.ACTION_TURN_LEFT
+        elif velocity < MAX_SPEED:
+            action = BirdRobotEnvironment.ACTION_ACCELERATE
+        else:
+            action = BirdRobotEnvironment.ACTION_MOVE_FORWARD
+        return np.int32(action)
+    return act
+
+
+def squat_random(rng, num_steps):
+    return list(rng.uniform(-1, 1, size=(num_steps, 2)).astype(np.float32))
+
+
+def squat_heuristic():
+    """Keeps the torso upright while sinking to the target depth."""
+    def act(observation):
+        angle, _, _, depth = observation
+        return np.clip([-5.0 * angle, 5.0 * (0.6 - depth)], -1.0, 1.0)
+    return act
+
+
+# name: (make, random actions, make heuristic policy, fraction of --steps)
+ENVIRONMENTS = {
+    "BipedalWalkerV2": (
+        lambda: GymnasiumApi(BipedalWalkerV2()),
+        bipedal_random, bipedal_heuristic, 1.0),
+    "BipedalWalkerV2-hardcore": (
+        lambda: GymnasiumApi(BipedalWalkerV2(hardcore=True)),
+        bipedal_random, bipedal_heuristic, 1.0),
+    "BipedalWalker": (
+        lambda: GymApi(BipedalWalker()),
+        legacy_bipedal_random, legacy_bipedal_heuristic, 1.0),
+    "BirdRobotEnvironment": (
+        lambda: PyEnvironmentApi(BirdRobotEnvironment()),
+        bird_random, bird_heuristic, 1.0),
+    # Every TF step crosses into Python and back, so it runs fewer steps
+    "BirdRobotEnvironment-tf": (
+        lambda: TFEnvironmentApi(
+            tf_py_environment.TFPyEnvironment(BirdRobotEnvironment())),
+        bird_random, bird_heuristic, 0.2),
+    "SquatEnv": (
+        lambda: GymApi(SquatEnv()),
+        squat_random, squat_heuristic, 1.0),
+}
+
+
+def run_steps(api, policy, num_steps, seed, trace=False):
+    """
+    Steps `api` with `policy`, resetting after every episode.
+
+    Args:
+        policy: A list of actions, replayed open-loop, or a callable from
+            observations to actions.
+        trace: Count allocations with tracemalloc instead of timing.
+
+    Returns:
+        dict: Step rate and reset latency, or the per-step allocations when
+        `trace` is set.
+    """
+    observation = api.reset(seed)
+    step_seconds = 0.0
+    results, peaks = [], []
+    if trace:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    for i in range(num_steps):
+        if callable(policy):
+            action = api.prepare(policy(observation))
+        else:
+            action = api.prepare(policy[i])
+        if trace:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = api.step(action)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            results.append(result)
+        else:
+            start = time.perf_counter()
+            result = api.step(action)
+            step_seconds += time.perf_counter() - start
+        observation, done = api.unpack(result)
+        if done:
+            observation = api.reset(seed)
+    if not trace:
+        return {"steps_per_second": num_steps / step_seconds}
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Allocations still alive are the ones held by `results`
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    return {
+        "blocks_per_step": blocks / num_steps,
+        "bytes_per_step": size / num_steps,
+        "peak_bytes_per_step": float(np.mean(peaks)),
+    }
+
+
+def time_resets(api, num_resets, seed):
+    """
+    Returns:
+        float: Mean reset latency in ms.
+    """
+    start = time.perf_counter()
+    for i in range(num_resets):
+        api.reset(seed + i)
+    return (time.perf_counter() - start) / num_resets * 1e3
+
+
+def benchmark(name, args):
+    """
+    Returns:
+        Dict[str, dict]: Results of `name` under every policy, keyed by
+        "<environment>/<policy>".
+    """
+    make, random_actions, heuristic, fraction = ENVIRONMENTS[name]
+    num_steps = max(int(args.steps * fraction), 1)
+    num_alloc_steps = max(int(args.alloc_steps * fraction), 1)
+    actions = random_actions(
+        np.random.default_rng(args.seed), max(num_steps, num_alloc_steps))
+    results = {}
+    api = make()
+    reset_ms = min(time_resets(api, args.resets, args.seed)
+                   for _ in range(args.repeats))
+    for policy_name, make_policy in (("random", lambda: actions),
+                                     ("heuristic", heuristic)):
+        result = {
+            "steps_per_second": max(
+                run_steps(api, make_policy(), num_steps, args.seed)[
+                    "steps_per_second"]
+                for _ in range(args.repeats)),
+            "reset_ms": reset_ms,
+        }
+        result.update(run_steps(
+            api, make_policy(), num_alloc_steps, args.seed, trace=True))
+        results[f"{name}/{policy_name}"] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns:
+        Dict[str, List[str]]: Regressed metrics of every result, with the
+        ratio to the baseline of every metric compared.
+    """
+    regressions = {}
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        regressed = []
+        if result["steps_per_second"] < (
+                (1 - tolerance) * reference["steps_per_second"]):
+            regressed.append("steps_per_second")
+        if result["reset_ms"] > max((1 + tolerance) * reference["reset_ms"],
+                                    reference["reset_ms"] + MIN_RESET_MS):
+            regressed.append("reset_ms")
+        for metric in ("bytes_per_step", "peak_bytes_per_step"):
+            if result[metric] > max((1 + tolerance) * reference[metric],
+                                    reference[metric] + MIN_ALLOCATION_BYTES):
+                regressed.append(metric)
+        regressions[key] = regressed
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--alloc-steps", type=int, default=1000)
+    parser.add_argument("--resets", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Runs per timing, of which the best is kept.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--environments", nargs="+",
+                        choices=sorted(ENVIRONMENTS), default=None)
+    parser.add_argument("--output", help="Write the results as JSON.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store the results as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative change reported as a regression.")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.environments or ENVIRONMENTS:
+        results.update(benchmark(name, args))
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    print(f"{'environment/policy':>34} {'steps/s':>9} {'vs base':>8} "
+          f"{'reset ms':>9} {'blocks/step':>12} {'bytes/step':>11} "
+          f"{'peak bytes':>11}")
+    for key, result in results.items():
+        if key in baseline:
+            ratio = (result["steps_per_second"]
+                     / baseline[key]["steps_per_second"])
+            versus = f"{ratio:>7.2f}x"
+        else:
+            versus = f"{'-':>8}"
+        print(f"{key:>34} {result['steps_per_second']:>9.0f} {versus} "
+              f"{result['reset_ms']:>9.2f} {result['blocks_per_step']:>12.1f} "
+              f"{result['bytes_per_step']:>11.0f} "
+              f"{result['peak_bytes_per_step']:>11.0f}"
+              + "".join(f"  {metric} regressed"
+                        for metric in regressions.get(key, [])))
+
+    record = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "settings": {"steps": args.steps, "alloc_steps": args.alloc_steps,
+                     "resets": args.resets, "repeats": args.repeats,
+                     "seed": args.seed},
+        "results": results,
+        "regressions": {key: metrics for key, metrics in regressions.items()
+                        if metrics},
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(record, file, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        record.pop("regressions")
+        with open(args.baseline, "w") as file:
+            json.dump(record, file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}, nothing compared")
+    if record.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
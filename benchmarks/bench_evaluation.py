@@ -0,0 +1,84 @@
+"""
+Benchmark sequential against batched policy evaluation on BipedalWalker-v3.
+
+Evaluates an untrained SAC actor (the 256x256 ActorDistributionNetwork used
+by agents/train_agent.py) for the same number of episodes, once one episode
+after another on a single environment and once with evaluate_episodes on a
+batch of environments, and reports the wall-clock time of each.
+
+Usage:
+    python -m benchmarks.bench_evaluation [--episodes 10] [--max-steps 200]
+"""
+import argparse
+import time
+
+import numpy as np
+from tf_agents.agents.sac import tanh_normal_projection_network
+from tf_agents.environments import batched_py_environment
+from tf_agents.environments import suite_gym
+from tf_agents.environments import tf_py_environment
+from tf_agents.networks import actor_distribution_network
+from tf_agents.policies import actor_policy
+from tf_agents.policies import greedy_policy
+
+from agents.evaluation import evaluate_episodes
+
+
+def sequential_returns(environment, policy, num_episodes):
+    """The evaluation loop used before batching."""
+    returns = []
+    for _ in range(num_episodes):
+        time_step = environment.reset()
+        episode_return = 0.0
+        while not time_step.is_last():
+            action_step = policy.action(time_step)
+            time_step = environment.step(action_step.action)
+            episode_return += time_step.reward
+        returns.append(float(episode_return.numpy()[0]))
+    return np.array(returns)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--max-steps", type=int, default=200,
+                        help="Time limit of an evaluation episode.")
+    args = parser.parse_args()
+
+    def load():
+        return suite_gym.load("BipedalWalker-v3",
+                              max_episode_steps=args.max_steps)
+
+    single_env = tf_py_environment.TFPyEnvironment(load())
+    batched_env = tf_py_environment.TFPyEnvironment(
+        batched_py_environment.BatchedPyEnvironment(
+            [load() for _ in range(args.episodes)], multithreading=False))
+
+    actor_net = actor_distribution_network.ActorDistributionNetwork(
+        single_env.observation_spec(), single_env.action_spec(),
+        fc_layer_params=(256, 256),
+        continuous_projection_net=(
+            tanh_normal_projection_network.TanhNormalProjectionNetwork))
+    policy = greedy_policy.GreedyPolicy(actor_policy.ActorPolicy(
+        single_env.time_step_spec(), single_env.action_spec(),
+        actor_network=actor_net, training=False))
+
+    start = time.perf_counter()
+    sequential = sequential_returns(single_env, policy, args.episodes)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched, lengths = evaluate_episodes(batched_env, policy, args.episodes)
+    batched_time = time.perf_counter() - start
+
+    print(f"{'evaluation':>10} {'seconds':>8} {'mean return':>12}")
+    print(f"{'sequential':>10} {sequential_time:>8.2f} "
+          f"{sequential.mean():>12.2f}")
+    print(f"{'batched':>10} {batched_time:>8.2f} {batched.mean():>12.2f}")
+    print(f"speedup: {sequential_time / batched_time:.1f}x, "
+          f"mean episode length {lengths.mean():.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the heading lookup table against computing heading vectors directly.
+
+Times the step of BirdRobotEnvironment and BatchedBirdRobotEnvironment with the HeadingTable and with
+use_heading_table=False, which takes the same path as a TURN_RATE that does not divide 360, and reports the mean
+cost of a step in microseconds. Maps hold the 3 default obstacles or --obstacles random ones within the
+boundaries, so the field-of-view test runs on every sensed obstacle.
+
+Usage:
+    python -m benchmarks.bench_heading [--obstacles 100] [--budget 1.0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from config.config import BOUNDARY_MAX, BOUNDARY_MIN
+from src.batched_environment import BatchedBirdRobotEnvironment
+from src.environment import BirdRobotEnvironment
+
+BATCH_SIZES = (64, 1024)
+
+
+def time_steps(env, actions, budget):
+    """
+    Steps the environment until `budget` seconds have elapsed (at least 3 steps).
+
+    Returns:
+        float: Mean step time in microseconds.
+    """
+    env.reset()
+    steps = 0
+    start = time.perf_counter()
+    while steps < 3 or time.perf_counter() - start < budget:
+        env.step(actions[steps % len(actions)])
+        steps += 1
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--obstacles', type=int, default=100, help='Number of random obstacles of the dense map.')
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds spent timing each configuration.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Turning and moving, the actions whose cost depends on the heading
+    choices = [BirdRobotEnvironment.ACTION_ACCELERATE, BirdRobotEnvironment.ACTION_TURN_RIGHT,
+               BirdRobotEnvironment.ACTION_TURN_LEFT, BirdRobotEnvironment.ACTION_MOVE_FORWARD]
+    probabilities = [0.1, 0.1, 0.1, 0.7]
+    actions = rng.choice(choices, size=1000, p=probabilities).astype(np.int32)
+    maps = {'default': None, f'{args.obstacles} random': rng.uniform(BOUNDARY_MIN, BOUNDARY_MAX, size=(args.obstacles, 2))}
+
+    print(f"{'environment':>34} {'direct us/step':>15} {'table us/step':>14} {'speedup':>8}")
+    for map_name, obstacles in maps.items():
+        for use_index in (False, True):
+            name = f"single, {map_name}, {'grid' if use_index else 'linear'}"
+            direct = time_steps(BirdRobotEnvironment(obstacles, use_index, use_heading_table=False), actions, args.budget)
+            table = time_steps(BirdRobotEnvironment(obstacles, use_index, use_heading_table=True), actions, args.budget)
+            print(f"{name:>34} {direct:>15.1f} {table:>14.1f} {direct / table:>7.2f}x")
+        for batch_size in BATCH_SIZES:
+            batch_actions = rng.choice(choices, size=(100, batch_size), p=probabilities).astype(np.int32)
+            name = f"batch {batch_size}, {map_name}"
+            direct = time_steps(BatchedBirdRobotEnvironment(batch_size, obstacles, use_heading_table=False), batch_actions, args.budget)
+            table = time_steps(BatchedBirdRobotEnvironment(batch_size, obstacles, use_heading_table=True), batch_actions, args.budget)
+            print(f"{name:>34} {direct:>15.1f} {table:>14.1f} {direct / table:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
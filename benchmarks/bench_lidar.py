@@ -0,0 +1,102 @@
+"""
+Benchmark the vectorized BipedalWalkerV2 lidar against Box2D ray casts.
+
+For normal and hardcore terrain, a random-action episode is stepped with
+`lidar_mode="box2d"` and `lidar_mode="vectorized"`, and the mean cost of a
+whole step is reported next to the cost of the lidar alone (ten rays cast
+from hull positions recorded during the episode). The largest difference
+between the lidar fractions of the two modes is printed as a parity check.
+
+Usage:
+    python -m benchmarks.bench_lidar [--steps 1000] [--seed 0]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from environments.bipedal_walker import LIDAR_RANGE, BipedalWalkerV2
+
+
+def box2d_lidar(env, pos):
+    """Casts the ten lidar rays from `pos` through Box2D, as step() did."""
+    for i, lidar_sensor in enumerate(env.lidar):
+        lidar_sensor.fraction = 1.0
+        lidar_sensor.p1 = pos
+        lidar_sensor.p2 = (
+            pos[0] + math.sin(1.5 * i / 10.0) * LIDAR_RANGE,
+            pos[1] - math.cos(1.5 * i / 10.0) * LIDAR_RANGE,
+        )
+        env.world.RayCast(lidar_sensor, lidar_sensor.p1, lidar_sensor.p2)
+    return [lidar_sensor.fraction for lidar_sensor in env.lidar]
+
+
+def run_episode(env, actions, seed):
+    """
+    Returns:
+        Tuple[float, np.ndarray, np.ndarray]: Mean step time in us, the
+        lidar fractions of every step and the hull position of every step.
+    """
+    env.reset(seed=seed)
+    lidar, positions = [], []
+    elapsed = 0.0
+    for action in actions:
+        start = time.perf_counter()
+        observation, _, terminated, truncated, _ = env.step(action)
+        elapsed += time.perf_counter() - start
+        lidar.append(observation[14:])
+        positions.append(tuple(env.hull.position))
+        if terminated or truncated:
+            env.reset(seed=seed)
+    return elapsed / len(actions) * 1e6, np.array(lidar), positions
+
+
+def time_lidar(cast, positions):
+    """
+    Returns:
+        float: Mean time of one ten-ray lidar scan in us.
+    """
+    start = time.perf_counter()
+    for pos in positions:
+        cast(pos)
+    return (time.perf_counter() - start) / len(positions) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    actions = rng.uniform(-1, 1, size=(args.steps, 4)).astype(np.float32)
+
+    print(f"{'terrain':>9} {'mode':>11} {'us/step':>9} {'us/lidar':>9} "
+          f"{'max |diff|':>11}")
+    for hardcore in (False, True):
+        results = {}
+        for mode in ("box2d", "vectorized"):
+            env = BipedalWalkerV2(hardcore=hardcore, lidar_mode=mode)
+            step_us, lidar, positions = run_episode(env, actions, args.seed)
+            # Replay the hull positions on the final terrain of the episode
+            env.reset(seed=args.seed)
+            if mode == "box2d":
+                lidar_us = time_lidar(
+                    lambda pos: box2d_lidar(env, pos), positions)
+            else:
+                lidar_us = time_lidar(env._cast_lidar, positions)
+            results[mode] = (step_us, lidar_us, lidar)
+            env.close()
+
+        terrain = "hardcore" if hardcore else "normal"
+        difference = np.abs(
+            results["box2d"][2] - results["vectorized"][2]).max()
+        for mode, (step_us, lidar_us, _) in results.items():
+            print(f"{terrain:>9} {mode:>11} {step_us:>9.1f} {lidar_us:>9.1f} "
+                  f"{difference:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark the obstacle grid index against the linear obstacle scan.
+
+Times BirdRobotEnvironment.step for maps of K = 3 to 100k obstacles, with and without the
+ObstacleGrid, and reports the mean cost of a step in microseconds.
+
+Usage:
+    python -m benchmarks.bench_obstacle_index [--extent 2000] [--budget 1.0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.environment import BirdRobotEnvironment
+
+OBSTACLE_COUNTS = (3, 100, 1000, 10000, 100000)
+
+
+def time_steps(env, actions, budget):
+    """
+    Steps the environment until `budget` seconds have elapsed (at least 3 steps).
+
+    Returns:
+        float: Mean step time in microseconds.
+    """
+    env.reset()
+    steps = 0
+    start = time.perf_counter()
+    while steps < 3 or time.perf_counter() - start < budget:
+        env.step(actions[steps % len(actions)])
+        steps += 1
+    return (time.perf_counter() - start) / steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--extent', type=float, default=2000.0, help='Side length of the square obstacle map.')
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds spent timing each configuration.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    actions = rng.choice([BirdRobotEnvironment.ACTION_ACCELERATE, BirdRobotEnvironment.ACTION_TURN_RIGHT,
+                          BirdRobotEnvironment.ACTION_MOVE_FORWARD], size=1000, p=[0.1, 0.1, 0.8]).astype(np.int32)
+
+    print(f"{'obstacles':>10} {'linear us/step':>15} {'grid us/step':>13} {'speedup':>8}")
+    for num_obstacles in OBSTACLE_COUNTS:
+        obstacles = rng.uniform(0, args.extent, size=(num_obstacles, 2))
+        linear = time_steps(BirdRobotEnvironment(obstacles, use_index=False), actions, args.budget)
+        indexed = time_steps(BirdRobotEnvironment(obstacles, use_index=True), actions, args.budget)
+        print(f"{num_obstacles:>10} {linear:>15.1f} {indexed:>13.1f} {linear / indexed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
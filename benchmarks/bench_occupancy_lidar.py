@@ -0,0 +1,99 @@
+"""
+Benchmark the occupancy-grid lidar of BirdRobotSensors across beam counts.
+
+Rasterizes --obstacles random obstacles into an OccupancyLidar and scans --robots random robots with B = 1 to 64
+beams each, reporting the time of a batched scan and the throughput in beams and robots per second, next to the
+time of the point sensor of BirdRobotSensors called once per robot. The median and 90th percentile by which the
+grid ranges fall short of exact ray-circle intersections are reported per cell size.
+
+Usage:
+    python -m benchmarks.bench_occupancy_lidar [--robots 1024] [--obstacles 200] [--cell-size 1.0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from config.config import BOUNDARY_MAX, BOUNDARY_MIN, COLLISION_DISTANCE, SENSOR_RANGE
+from src.occupancy_lidar import OccupancyLidar
+from src.sensors import BirdRobotSensors
+
+BEAM_COUNTS = (1, 4, 16, 64)
+CELL_SIZES = (1.0, 0.5, 0.25)
+
+
+def best_time(function, repeats):
+    """
+    Returns:
+        float: Fastest of `repeats` calls of `function` in seconds.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def exact_ranges(origins, directions, obstacles):
+    """
+    Returns:
+        np.ndarray: Distances along the rays to the first obstacle disc or boundary, at most SENSOR_RANGE.
+    """
+    ranges = np.full(len(origins), SENSOR_RANGE)
+    for start in range(0, len(origins), 1024):
+        origin, direction = origins[start:start + 1024], directions[start:start + 1024]
+        offset = obstacles[np.newaxis, :, :] - origin[:, np.newaxis, :]
+        along = np.einsum('rkd,rd->rk', offset, direction)
+        squared = np.sum(offset ** 2, axis=-1)
+        miss = squared - along ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            entry = np.where(squared <= COLLISION_DISTANCE ** 2, 0.0, along - np.sqrt(COLLISION_DISTANCE ** 2 - miss))
+            entry = np.where((miss <= COLLISION_DISTANCE ** 2) & (entry >= 0), entry, np.inf)
+            walls = np.where(direction > 0, (BOUNDARY_MAX - origin) / direction, (BOUNDARY_MIN - origin) / direction)
+        walls = np.where(direction == 0, np.inf, walls).min(axis=1)
+        ranges[start:start + 1024] = np.minimum(np.minimum(entry.min(axis=1), walls), SENSOR_RANGE)
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--robots', type=int, default=1024)
+    parser.add_argument('--obstacles', type=int, default=200)
+    parser.add_argument('--cell-size', type=float, default=1.0, help='Cell size of the throughput runs.')
+    parser.add_argument('--repeats', type=int, default=3, help='Scans per configuration, of which the fastest is kept.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    obstacles = rng.uniform(BOUNDARY_MIN, BOUNDARY_MAX, size=(args.obstacles, 2))
+    positions = rng.uniform(BOUNDARY_MIN + 10, BOUNDARY_MAX - 10, size=(args.robots, 2))
+    orientations = rng.choice(np.arange(8) * 45.0, size=args.robots)
+
+    points = BirdRobotSensors(obstacles)
+    seconds = best_time(lambda: [points.detect_obstacles(position, orientation) for position, orientation in zip(positions, orientations)], args.repeats)
+    print(f"point sensor, one call per robot: {seconds * 1e3:.1f} ms, {args.robots / seconds:,.0f} robots/s")
+
+    start = time.perf_counter()
+    OccupancyLidar(obstacles, cell_size=args.cell_size)
+    print(f"rasterizing {args.obstacles} obstacles at cell size {args.cell_size}: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    print(f"{'beams':>6} {'scan ms':>9} {'beams/s':>12} {'robots/s':>10}")
+    for num_beams in BEAM_COUNTS:
+        lidar = OccupancyLidar(obstacles, num_beams=num_beams, cell_size=args.cell_size)
+        seconds = best_time(lambda: lidar.scan(positions, orientations), args.repeats)
+        print(f"{num_beams:>6} {seconds * 1e3:>9.1f} {args.robots * num_beams / seconds:>12,.0f} {args.robots / seconds:>10,.0f}")
+
+    print(f"{'cell size':>10} {'scan ms':>9} {'median short':>13} {'p90 short':>10}")
+    for cell_size in CELL_SIZES:
+        lidar = OccupancyLidar(obstacles, num_beams=16, cell_size=cell_size)
+        seconds = best_time(lambda: lidar.scan(positions, orientations), args.repeats)
+        ranges = lidar.scan(positions, orientations).ravel()
+        angles = np.deg2rad(orientations[:, np.newaxis] + lidar.beam_angles).ravel()
+        directions = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+        short = exact_ranges(np.repeat(positions, 16, axis=0), directions, obstacles) - ranges
+        print(f"{cell_size:>10} {seconds * 1e3:>9.1f} {np.median(short):>13.2f} {np.percentile(short, 90):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
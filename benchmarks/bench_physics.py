@@ -0,0 +1,103 @@
+"""
+Benchmark the BipedalWalkerV2 physics profiles against the accurate one.
+
+Every profile runs the same seeded episodes with the scripted
+BipedalWalkerHeuristics policy and no rendering, reporting the throughput in
+steps per second and the mean episode return. The heuristic is closed-loop
+and small physics differences change its gait, so the action sequences of
+the accurate episodes are also replayed open-loop under every profile and
+the mean absolute per-step reward difference ("drift") is reported.
+
+Usage:
+    python -m benchmarks.bench_physics [--episodes 8] [--hardcore]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from environments.bipedal_walker import (
+    PHYSICS_PROFILES,
+    BipedalWalkerHeuristics,
+    BipedalWalkerV2,
+)
+
+
+def run_episodes(env, seeds, max_episode_steps):
+    """
+    Returns:
+        Tuple[np.ndarray, list, float]: Return of every episode, the actions
+        taken in every episode and the mean number of env.step calls per second.
+    """
+    returns, actions = [], []
+    steps = 0
+    elapsed = 0.0
+    for seed in seeds:
+        heuristics = BipedalWalkerHeuristics()
+        heuristics.a = np.zeros(4)  # The class attribute is shared
+        episode_actions = []
+        observation, _ = env.reset(seed=int(seed))
+        total_reward = 0.0
+        for _ in range(max_episode_steps):
+            action = heuristics.step_heuristic(observation)
+            start = time.perf_counter()
+            observation, reward, terminated, _, _ = env.step(action)
+            elapsed += time.perf_counter() - start
+            episode_actions.append(action)
+            total_reward += reward
+            steps += 1
+            if terminated:
+                break
+        returns.append(total_reward)
+        actions.append(episode_actions)
+    return np.array(returns), actions, steps / elapsed
+
+
+def replay_rewards(env, seed, actions):
+    """Returns the rewards of replaying `actions` open-loop from `seed`."""
+    env.reset(seed=int(seed))
+    rewards = []
+    for action in actions:
+        _, reward, terminated, _, _ = env.step(action)
+        rewards.append(reward)
+        if terminated:
+            break
+    return np.array(rewards)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--hardcore", action="store_true")
+    parser.add_argument("--max-steps", type=int, default=1600)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seeds = np.arange(args.seed, args.seed + args.episodes)
+    envs = {
+        name: BipedalWalkerV2(hardcore=args.hardcore, physics=name)
+        for name in PHYSICS_PROFILES
+    }
+    results = {
+        name: run_episodes(env, seeds, args.max_steps)
+        for name, env in envs.items()
+    }
+
+    _, reference_actions, reference_speed = results["accurate"]
+    print(f"{'profile':>10} {'steps/s':>9} {'speedup':>8} "
+          f"{'mean return':>12} {'reward drift':>13}")
+    for name, (returns, _, speed) in results.items():
+        drift = []
+        for seed, actions in zip(seeds, reference_actions):
+            reference = replay_rewards(envs["accurate"], seed, actions)
+            rewards = replay_rewards(envs[name], seed, actions)
+            length = min(len(reference), len(rewards))
+            drift.append(np.abs(rewards[:length] - reference[:length]))
+        drift = np.concatenate(drift).mean()
+        print(f"{name:>10} {speed:>9.0f} {speed / reference_speed:>7.2f}x "
+              f"{returns.mean():>12.2f} {drift:>13.4f}")
+
+
+if __name__ == "__main__":
+    main()
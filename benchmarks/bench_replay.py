@@ -0,0 +1,123 @@
+"""
+Benchmark replay buffer sampling at 1M capacity.
+
+Fills a TFUniformReplayBuffer, a PrioritizedReplayBuffer and a
+MemmapReplayBuffer with the same BipedalWalker-sized transitions (1000
+environments x 1000 steps) and reports how many sampled batches per second
+each `as_dataset` pipeline delivers. The prioritized pipeline also updates
+the priorities of every batch, as the trainers do after each train step, and
+the on-disk buffer is timed with and without a cap on its resident memory.
+
+Usage:
+    python -m benchmarks.bench_replay [--batches 2000] [--sample-batch-size 256]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
+
+from agents.replay_buffers import MemmapReplayBuffer, PrioritizedReplayBuffer
+
+OBSERVATION_SIZE = 24
+ACTION_SIZE = 4
+
+
+def transition_spec():
+    observation_spec = tensor_spec.TensorSpec(
+        [OBSERVATION_SIZE], tf.float32, name="observation")
+    action_spec = tensor_spec.BoundedTensorSpec(
+        [ACTION_SIZE], tf.float32, minimum=-1.0, maximum=1.0, name="action")
+    time_step_spec = ts.time_step_spec(observation_spec)
+    return trajectory.Trajectory(
+        step_type=time_step_spec.step_type, observation=observation_spec,
+        action=action_spec, policy_info=(),
+        next_step_type=time_step_spec.step_type,
+        reward=time_step_spec.reward, discount=time_step_spec.discount)
+
+
+def fill(replay_buffer, spec, batch_size, max_length):
+    @tf.function
+    def add():
+        for _ in tf.range(max_length):
+            replay_buffer.add_batch(
+                tensor_spec.sample_spec_nest(spec, outer_dims=[batch_size]))
+    add()
+
+
+def time_batches(dataset, num_batches, on_batch=None):
+    """
+    Returns:
+        float: Batches per second delivered by `dataset`.
+    """
+    iterator = iter(dataset)
+    for _ in range(10):
+        next(iterator)
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        experience, info = next(iterator)
+        if on_batch is not None:
+            on_batch(info)
+    return num_batches / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--sample-batch-size", type=int, default=256)
+    parser.add_argument("--environments", type=int, default=1000)
+    parser.add_argument("--max-length", type=int, default=1000)
+    parser.add_argument("--max-resident-mb", type=int, default=64,
+                        help="Resident memory cap of the on-disk buffer.")
+    args = parser.parse_args()
+
+    spec = transition_spec()
+    uniform = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=args.environments, max_length=args.max_length)
+    prioritized = PrioritizedReplayBuffer(
+        spec, batch_size=args.environments, max_length=args.max_length,
+        seed=0)
+    directory = tempfile.TemporaryDirectory()
+    memmap = MemmapReplayBuffer(
+        spec, batch_size=args.environments, max_length=args.max_length,
+        directory=directory.name, seed=0)
+    for replay_buffer in (uniform, prioritized, memmap):
+        fill(replay_buffer, spec, args.environments, args.max_length)
+
+    rng = np.random.default_rng(0)
+
+    def update(info):
+        prioritized.update_priorities(
+            info.ids.numpy(), rng.random(args.sample_batch_size))
+
+    def dataset(replay_buffer):
+        return replay_buffer.as_dataset(
+            sample_batch_size=args.sample_batch_size, num_steps=2,
+            num_parallel_calls=3).prefetch(3)
+
+    capacity = args.environments * args.max_length
+    print(f"capacity {capacity}, sample batch size {args.sample_batch_size}")
+    print(f"{'buffer':>28} {'batches/s':>10} {'vs uniform':>11}")
+    results = [
+        ("uniform", time_batches(dataset(uniform), args.batches)),
+        ("prioritized", time_batches(dataset(prioritized), args.batches)),
+        ("prioritized + updates",
+         time_batches(dataset(prioritized), args.batches, update)),
+        ("memmap", time_batches(dataset(memmap), args.batches)),
+    ]
+    memmap.max_resident_bytes = args.max_resident_mb * 2**20
+    results.append((f"memmap, {args.max_resident_mb} MB resident",
+                    time_batches(dataset(memmap), args.batches)))
+    for name, rate in results:
+        print(f"{name:>28} {rate:>10.0f} {rate / results[0][1]:>10.2f}x")
+    directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
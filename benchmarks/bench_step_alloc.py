@@ -0,0 +1,95 @@
+"""
+Microbenchmark BipedalWalkerV2.step time and memory allocations.
+
+Runs random-action steps with observations returned as copies of the
+environment's internal buffer and as views of a caller-provided buffer
+(`set_observation_buffer`), for both lidar modes. For each configuration the
+mean step time is reported next to tracemalloc figures: the number of
+memory blocks and bytes allocated per step (from a snapshot diff over a
+stream of steps whose results are kept alive) and the mean peak of
+transient memory inside a step.
+
+Usage:
+    python -m benchmarks.bench_step_alloc [--steps 2000] [--seed 0]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from environments.bipedal_walker import BipedalWalkerV2
+
+
+def make_env(lidar_mode, external, seed):
+    env = BipedalWalkerV2(lidar_mode=lidar_mode)
+    if external:
+        env.set_observation_buffer(np.zeros(24, dtype=np.float32))
+    env.reset(seed=seed)
+    return env
+
+
+def time_steps(env, actions, seed):
+    """
+    Returns:
+        float: Mean step time in us.
+    """
+    start = time.perf_counter()
+    for action in actions:
+        if env.step(action)[2]:
+            env.reset(seed=seed)
+    return (time.perf_counter() - start) / len(actions) * 1e6
+
+
+def trace_steps(env, actions, seed):
+    """
+    Returns:
+        Tuple[float, float, float]: Blocks and bytes allocated per step for
+        the step results, and the mean transient peak of a step in bytes.
+    """
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peaks = []
+    for action in actions:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = env.step(action)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        results.append(result)
+        if result[2]:
+            env.reset(seed=seed)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # Allocations still alive are the ones held by `results`
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    return blocks / len(actions), size / len(actions), float(np.mean(peaks))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    actions = rng.uniform(-1, 1, size=(args.steps, 4)).astype(np.float32)
+
+    print(f"{'lidar':>11} {'observation':>12} {'us/step':>8} "
+          f"{'blocks/step':>12} {'bytes/step':>11} {'peak bytes':>11}")
+    for lidar_mode in ("box2d", "vectorized"):
+        for external in (False, True):
+            step_us = time_steps(
+                make_env(lidar_mode, external, args.seed), actions, args.seed)
+            blocks, size, peak = trace_steps(
+                make_env(lidar_mode, external, args.seed), actions, args.seed)
+            observation = "view" if external else "copy"
+            print(f"{lidar_mode:>11} {observation:>12} {step_us:>8.1f} "
+                  f"{blocks:>12.1f} {size:>11.0f} {peak:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
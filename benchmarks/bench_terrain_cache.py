@@ -0,0 +1,70 @@
+"""
+Benchmark BipedalWalkerV2 reset latency with and without the terrain cache.
+
+Short-episode workloads reset every few steps, so terrain generation
+dominates. Three seed schedules are timed for normal and hardcore terrain:
+
+* same seed: every reset reuses the previous terrain bodies,
+* seed pool: resets cycle through a pool of seeds and rebuild bodies from
+  cached arrays,
+* short episodes: seed pool resets followed by a few zero-action steps.
+
+Usage:
+    python -m benchmarks.bench_terrain_cache [--resets 200] [--pool 8]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from environments.bipedal_walker import BipedalWalkerV2, TerrainCache
+
+
+def time_resets(env, seeds, episode_steps=0):
+    """
+    Returns:
+        float: Mean time of one reset (plus `episode_steps` steps) in ms.
+    """
+    action = np.zeros(4, dtype=np.float32)
+    env.reset(seed=int(seeds[0]))
+    start = time.perf_counter()
+    for seed in seeds:
+        env.reset(seed=int(seed))
+        for _ in range(episode_steps):
+            env.step(action)
+    return (time.perf_counter() - start) / len(seeds) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resets", type=int, default=200)
+    parser.add_argument("--pool", type=int, default=8,
+                        help="Number of distinct seeds in the seed pool.")
+    parser.add_argument("--episode-steps", type=int, default=20)
+    args = parser.parse_args()
+
+    schedules = {
+        "same seed": (np.zeros(args.resets, dtype=int), 0),
+        "seed pool": (np.arange(args.resets) % args.pool, 0),
+        f"{args.episode_steps}-step episodes": (
+            np.arange(args.resets) % args.pool, args.episode_steps),
+    }
+    print(f"{'terrain':>9} {'schedule':>17} {'uncached ms':>12} "
+          f"{'cached ms':>10} {'speedup':>8}")
+    for hardcore in (False, True):
+        for name, (seeds, episode_steps) in schedules.items():
+            uncached = time_resets(
+                BipedalWalkerV2(hardcore=hardcore, terrain_cache=False),
+                seeds, episode_steps)
+            cached = time_resets(
+                BipedalWalkerV2(hardcore=hardcore,
+                                terrain_cache=TerrainCache()),
+                seeds, episode_steps)
+            terrain = "hardcore" if hardcore else "normal"
+            print(f"{terrain:>9} {name:>17} {uncached:>12.2f} "
+                  f"{cached:>10.2f} {uncached / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
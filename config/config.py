@@ -34,9 +34,28 @@ REWARD_STEP = 1.0  # Reward for each step taken
 # Training parameters
 NUM_ITERATIONS = 5000  # Total number of training iterations
 COLLECT_STEPS_PER_ITERATION = 1  # Number of steps to collect per iteration
+NUM_PARALLEL_ENVIRONMENTS = 64  # Number of bird robots simulated by the batched training environment
 LOG_INTERVAL = 200  # Interval for logging training progress
 EVAL_INTERVAL = 1000  # Interval for evaluating the agent's performance
+NUM_EVAL_EPISODES = 10  # Number of episodes played by each evaluation
+ASYNC_EVALUATION = True  # Evaluate policy snapshots on a background thread instead of pausing training
+EVAL_MAX_STEPS = 1000  # Step limit of a background evaluation episode
+CHECKPOINT_INTERVAL = 100  # Interval for saving variable checkpoints in the background
+CHECKPOINTS_TO_KEEP = 5  # Number of most recent checkpoints kept on disk
+PRIORITIZED_REPLAY = False  # Sample transitions by TD error from a sum-tree instead of uniformly
+PRIORITY_EXPONENT = 0.6  # How strongly TD errors skew sampling, 0 samples uniformly
+IMPORTANCE_SAMPLING_EXPONENT = 0.4  # How much of the sampling bias the loss weights correct, 1 corrects all of it
+REPLAY_BUFFER_MAX_LENGTH = 100000  # Transitions stored in the replay buffer, shared by all parallel environments
+REPLAY_BUFFER_MAX_RESIDENT_BYTES = 2 * 2**30  # Approximate cap on the resident memory of an on-disk replay buffer
+PROFILE_INTERVAL = 1000  # Interval for exporting the timing histograms of the training loop
+PROFILE_TRACE_STEPS = None  # Training steps traced by tf.profiler, e.g. (500, 510), no trace when None
 
 # Policy directory
 import os
 POLICY_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'policy')  # Directory to save the trained policy
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'checkpoints')  # Directory of the training checkpoints
+REPLAY_BUFFER_DIR = None  # Directory of a memory-mapped replay buffer that survives restarts (samples uniformly), in RAM when None
+TRAJECTORY_DIR = None  # Directory the collected trajectories are streamed to as .npz shards, not logged when None
+WARM_START_DIR = None  # Directory of trajectory shards an empty replay buffer is filled from instead of random collection
+PROFILE_PATH = None  # JSON-lines file the timing histograms of the training loop are appended to, not profiled when None
+PROFILE_TRACE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'profile')  # Directory of the tf.profiler trace
@@ -1,7 +1,9 @@
 __credits__ = ["Andrea PIERRÉ"]
 
+import bisect
 import math
-from typing import TYPE_CHECKING, List, Optional
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Union
 
 import numpy as np
 
@@ -37,10 +39,21 @@ SCALE = 30.0  # affects how fast-paced the game is, forces should be adjusted
 MOTORS_TORQUE = 80
 SPEED_HIP = 4
 SPEED_KNEE = 6
+JOINT_SPEEDS = np.array([SPEED_HIP, SPEED_KNEE, SPEED_HIP, SPEED_KNEE])
 LIDAR_RANGE = 160 / SCALE
 
 INITIAL_RANDOM = 5
 
+# Offsets from the hull to the far end of each of the 10 lidar rays
+LIDAR_RAYS = np.array(
+    [
+        (math.sin(1.5 * i / 10.0) * LIDAR_RANGE,
+         -math.cos(1.5 * i / 10.0) * LIDAR_RANGE)
+        for i in range(10)
+    ]
+)
+LIDAR_X_MIN, LIDAR_X_MAX = LIDAR_RAYS[:, 0].min(), LIDAR_RAYS[:, 0].max()
+
 HULL_POLY = [(-30, +9), (+6, +9), (+34, +1), (+34, -8), (-30, -8)]
 LEG_DOWN = -8 / SCALE
 LEG_W, LEG_H = 8 / SCALE, 34 / SCALE
@@ -55,6 +68,9 @@ TERRAIN_GRASS = 10  # low long are grass spots, in steps
 TERRAIN_STARTPAD = 20  # in steps
 FRICTION = 2.5
 
+# np_random draws made by _generate_clouds: 10 clouds of 1 + 5 * 2 draws
+CLOUD_RANDOM_DRAWS = TERRAIN_LENGTH // 20 * 11
+
 TERRAIN_STEPS = 20  # Define the missing constant
 GRAVITY = 9.8  # Define the missing constant
 
@@ -102,9 +118,16 @@ class BipedalWalker(gym.Env):
     def _destroy(self):
         if not self.terrain:
             return
+        self.world.contactListener = None
         for t in self.terrain:
             self.world.DestroyBody(t)
         self.terrain = []
+        self.world.DestroyBody(self.hull)
+        self.hull = None
+        for leg in self.legs:
+            self.world.DestroyBody(leg)
+        self.legs = []
+        self.joints = []
 
     def _generate_terrain(self, hardcore):
         GRASS, STUMP, STAIRS, PIT = 0, 1, 2, 3
@@ -206,6 +229,7 @@ class BipedalWalker(gym.Env):
 
     def reset(self):
         self._destroy()
+        self._generate_terrain(hardcore=False)
         self.world.contactListener_keepref = ContactDetector(self)
         self.world.contactListener = self.world.contactListener_keepref
 
@@ -383,22 +407,88 @@ class ContactDetector(contactListener):
         contactListener.__init__(self)
         self.env = env
 
+    def _feet(self):
+        # The lower legs of BipedalWalkerV2, or the one-piece legs of
+        # BipedalWalker
+        legs = self.env.legs
+        return [legs[1], legs[3]] if len(legs) == 4 else legs
+
     def BeginContact(self, contact):
         if (
             self.env.hull == contact.fixtureA.body
             or self.env.hull == contact.fixtureB.body
         ):
             self.env.game_over = True
-        for leg in [self.env.legs[1], self.env.legs[3]]:
+        for leg in self._feet():
             if leg in [contact.fixtureA.body, contact.fixtureB.body]:
                 leg.ground_contact = True
 
     def EndContact(self, contact):
-        for leg in [self.env.legs[1], self.env.legs[3]]:
+        for leg in self._feet():
             if leg in [contact.fixtureA.body, contact.fixtureB.body]:
                 leg.ground_contact = False
 
 
+class TerrainData(NamedTuple):
+    """Generated terrain of one (seed, hardcore) pair, stored as arrays."""
+
+    terrain_x: np.ndarray  # (TERRAIN_LENGTH,) x of the ground vertices
+    terrain_y: np.ndarray  # (TERRAIN_LENGTH,) y of the ground vertices
+    obstacle_polys: np.ndarray  # (P, 4, 2) stumps, stairs and pit walls
+    rng_state: dict  # np_random state right after generation
+
+
+class TerrainCache:
+    """
+    Least-recently-used cache of generated terrain keyed by (seed, hardcore).
+
+    Terrain generation only depends on the seed and the hardcore flag, so a
+    single cache can be shared by every BipedalWalkerV2 in a process.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, TerrainData]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[TerrainData]:
+        terrain = self._entries.get(key)
+        if terrain is not None:
+            self._entries.move_to_end(key)
+        return terrain
+
+    def put(self, key: tuple, terrain: TerrainData):
+        self._entries[key] = terrain
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+DEFAULT_TERRAIN_CACHE = TerrainCache()
+
+
+class PhysicsProfile(NamedTuple):
+    """Box2D solver settings used for one environment step."""
+
+    velocity_iterations: int
+    position_iterations: int
+    substeps: int = 1  # world.Step calls of 1 / (FPS * substeps) seconds
+
+
+PHYSICS_PROFILES = {
+    # Solver settings of the reference BipedalWalker
+    "accurate": PhysicsProfile(6 * 30, 2 * 30),
+    "fast": PhysicsProfile(30, 10),
+    # Box2D's recommended iterations
+    "ultrafast": PhysicsProfile(8, 3),
+}
+
+
 class BipedalWalkerV2(gym.Env, EzPickle):
     """
     ## Description
@@ -441,6 +531,32 @@ class BipedalWalkerV2(gym.Env, EzPickle):
 
     ## Arguments
 
+    The lidar is computed by intersecting all ten rays at once with an array
+    of the static terrain segments (`lidar_mode="vectorized"`, the default);
+    dynamic bodies that the lidar can see, if any, are still ray-cast through
+    Box2D. `lidar_mode="box2d"` ray-casts everything through Box2D.
+
+    Resets with an explicit `seed` reuse the terrain generated for the same
+    `(seed, hardcore)` pair from a `TerrainCache` (shared by default, disable
+    with `terrain_cache=False`). When the terrain of the previous episode is
+    requested again its static bodies are kept instead of being rebuilt.
+    Either way a seed plays the same episode as with generated terrain, and
+    regardless of the episodes before it.
+
+    `physics` selects the Box2D solver settings of a step: "accurate" (the
+    reference 180 velocity and 60 position iterations), "fast", "ultrafast"
+    or a custom `PhysicsProfile`, whose `substeps` splits each step into
+    several shorter world steps. With `action_repeat=k` every action is held
+    for k physics ticks (stopping early when the episode ends) and the
+    observation is built once; the reward is the sum of the rewards single
+    steps would get for the ticks, with -100 for a tick that ends in a fall.
+
+    Observations are written into a reused float32 buffer and returned as
+    copies; `set_observation_buffer` makes the environment write into a
+    caller-provided array instead and return views of it. Without a
+    `render_mode`, the scrolling, lidar animation and cloud bookkeeping used
+    only for drawing is skipped.
+
     To use the _hardcore_ environment, you need to specify the `hardcore=True`:
 
     ```python
@@ -474,15 +590,68 @@ class BipedalWalkerV2(gym.Env, EzPickle):
     }
 
     def __init__(
-        self, render_mode: Optional[str] = None, hardcore: bool = False
+        self,
+        render_mode: Optional[str] = None,
+        hardcore: bool = False,
+        terrain_cache: Union[bool, TerrainCache] = True,
+        lidar_mode: str = "vectorized",
+        physics: Union[str, PhysicsProfile] = "accurate",
+        action_repeat: int = 1,
     ):
-        EzPickle.__init__(self, render_mode, hardcore)
+        EzPickle.__init__(
+            self,
+            render_mode,
+            hardcore,
+            terrain_cache,
+            lidar_mode,
+            physics,
+            action_repeat,
+        )
+        if action_repeat < 1:
+            raise ValueError(
+                f"action_repeat must be at least 1, got {action_repeat}"
+            )
+        self.action_repeat = action_repeat
+        if isinstance(physics, str):
+            if physics not in PHYSICS_PROFILES:
+                raise ValueError(
+                    f"physics must be one of {sorted(PHYSICS_PROFILES)} "
+                    f"or a PhysicsProfile, got {physics!r}"
+                )
+            physics = PHYSICS_PROFILES[physics]
+        if physics.substeps < 1:
+            raise ValueError(
+                f"physics.substeps must be at least 1, got {physics.substeps}"
+            )
+        self.physics = physics
+        self._physics_time_step = 1.0 / (FPS * physics.substeps)
+        if lidar_mode not in ("vectorized", "box2d"):
+            raise ValueError(
+                f"lidar_mode must be 'vectorized' or 'box2d', "
+                f"got {lidar_mode!r}"
+            )
+        self.lidar_mode = lidar_mode
+        self._observation = np.zeros(24, dtype=np.float32)
+        self._observation_is_external = False
+        # Rows: ten denominators, ten s numerators and ten t numerators
+        self._lidar_projection = np.zeros((30, 6))
+        self._lidar_projection[:10, 4:6] = LIDAR_RAYS
+        self._lidar_projection[10:20, 0] = LIDAR_RAYS[:, 1]
+        self._lidar_projection[10:20, 1] = -LIDAR_RAYS[:, 0]
+        self._lidar_projection[20:30, 3] = 1.0
         self.isopen = True
 
         self.world = Box2D.b2World()
         self.terrain: List[Box2D.b2Body] = []
         self.hull: Optional[Box2D.b2Body] = None
 
+        if terrain_cache is True:
+            terrain_cache = DEFAULT_TERRAIN_CACHE
+        elif terrain_cache is False:
+            terrain_cache = None
+        self.terrain_cache: Optional[TerrainCache] = terrain_cache
+        self._terrain_key: Optional[tuple] = None
+
         self.prev_shaping = None
 
         self.hardcore = hardcore
@@ -498,6 +667,9 @@ class BipedalWalkerV2(gym.Env, EzPickle):
             categoryBits=0x0001,
         )
 
+        # Reused for every terrain body, avoids building a b2BodyDef per body
+        self.terrain_body_def = Box2D.b2BodyDef()
+
         # we use 5.0 to represent the joints moving at maximum
         # 5 x the rated speed due to impulses from ground contact etc.
         low = np.array(
@@ -548,13 +720,21 @@ class BipedalWalkerV2(gym.Env, EzPickle):
         self.screen: Optional[pygame.Surface] = None
         self.clock = None
 
-    def _destroy(self):
+    def _destroy(self, keep_terrain: bool = False):
         if not self.terrain:
             return
         self.world.contactListener = None
-        for t in self.terrain:
-            self.world.DestroyBody(t)
-        self.terrain = []
+        if not keep_terrain:
+            # Start from a new world rather than destroying every body, so
+            # that the broadphase proxy ids, and with them the order contacts
+            # are solved in, do not depend on earlier episodes
+            self.world = Box2D.b2World()
+            self.terrain = []
+            self._terrain_key = None
+            self.hull = None
+            self.legs = []
+            self.joints = []
+            return
         self.world.DestroyBody(self.hull)
         self.hull = None
         for leg in self.legs:
@@ -563,21 +743,25 @@ class BipedalWalkerV2(gym.Env, EzPickle):
         self.joints = []
 
     def _generate_terrain(self, hardcore):
+        self._create_terrain(*self._generate_terrain_data(hardcore))
+
+    def _generate_terrain_data(self, hardcore):
+        """Runs the terrain generator and returns its output as arrays."""
         GRASS, STUMP, STAIRS, PIT, _STATES_ = range(5)
         state = GRASS
         velocity = 0.0
         y = TERRAIN_HEIGHT
         counter = TERRAIN_STARTPAD
         oneshot = False
-        self.terrain = []
-        self.terrain_x = []
-        self.terrain_y = []
+        terrain_x = []
+        terrain_y = []
+        obstacle_polys = []
 
         stair_steps, stair_width, stair_height = 0, 0, 0
         original_y = 0
         for i in range(TERRAIN_LENGTH):
             x = i * TERRAIN_STEP
-            self.terrain_x.append(x)
+            terrain_x.append(x)
 
             if state == GRASS and not oneshot:
                 velocity = 0.8 * velocity + 0.01 * np.sign(TERRAIN_HEIGHT - y)
@@ -593,17 +777,10 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                     (x + TERRAIN_STEP, y - 4 * TERRAIN_STEP),
                     (x, y - 4 * TERRAIN_STEP),
                 ]
-                self.fd_polygon.shape.vertices = poly
-                t = self.world.CreateStaticBody(fixtures=self.fd_polygon)
-                t.color1, t.color2 = (255, 255, 255), (153, 153, 153)
-                self.terrain.append(t)
-
-                self.fd_polygon.shape.vertices = [
-                    (p[0] + TERRAIN_STEP * counter, p[1]) for p in poly
-                ]
-                t = self.world.CreateStaticBody(fixtures=self.fd_polygon)
-                t.color1, t.color2 = (255, 255, 255), (153, 153, 153)
-                self.terrain.append(t)
+                obstacle_polys.append(poly)
+                obstacle_polys.append(
+                    [(p[0] + TERRAIN_STEP * counter, p[1]) for p in poly]
+                )
                 counter += 2
                 original_y = y
 
@@ -620,10 +797,7 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                     (x + counter * TERRAIN_STEP, y + counter * TERRAIN_STEP),
                     (x, y + counter * TERRAIN_STEP),
                 ]
-                self.fd_polygon.shape.vertices = poly
-                t = self.world.CreateStaticBody(fixtures=self.fd_polygon)
-                t.color1, t.color2 = (255, 255, 255), (153, 153, 153)
-                self.terrain.append(t)
+                obstacle_polys.append(poly)
 
             elif state == STAIRS and oneshot:
                 stair_height = +1 if self.np_random.random() > 0.5 else -1
@@ -649,10 +823,7 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                             y + (-1 + s * stair_height) * TERRAIN_STEP,
                         ),
                     ]
-                    self.fd_polygon.shape.vertices = poly
-                    t = self.world.CreateStaticBody(fixtures=self.fd_polygon)
-                    t.color1, t.color2 = (255, 255, 255), (153, 153, 153)
-                    self.terrain.append(t)
+                    obstacle_polys.append(poly)
                 counter = stair_steps * stair_width
 
             elif state == STAIRS and not oneshot:
@@ -661,7 +832,7 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                 y = original_y + (n * stair_height) * TERRAIN_STEP
 
             oneshot = False
-            self.terrain_y.append(y)
+            terrain_y.append(y)
             counter -= 1
             if counter == 0:
                 counter = self.np_random.integers(
@@ -674,14 +845,31 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                     state = GRASS
                     oneshot = True
 
+        return (
+            np.array(terrain_x),
+            np.array(terrain_y),
+            np.array(obstacle_polys, dtype=np.float64).reshape(-1, 4, 2),
+        )
+
+    def _create_terrain(self, terrain_x, terrain_y, obstacle_polys):
+        """Creates the static terrain bodies from generated arrays."""
+        self.terrain = []
+        self.terrain_x = terrain_x
+        self.terrain_y = terrain_y
+        for poly in obstacle_polys.tolist():
+            self.fd_polygon.shape.vertices = poly
+            t = self.world.CreateBody(self.terrain_body_def)
+            t.CreateFixture(self.fd_polygon)
+            t.color1, t.color2 = (255, 255, 255), (153, 153, 153)
+            self.terrain.append(t)
+
         self.terrain_poly = []
+        points = np.stack([terrain_x, terrain_y], axis=1).tolist()
         for i in range(TERRAIN_LENGTH - 1):
-            poly = [
-                (self.terrain_x[i], self.terrain_y[i]),
-                (self.terrain_x[i + 1], self.terrain_y[i + 1]),
-            ]
+            poly = [tuple(points[i]), tuple(points[i + 1])]
             self.fd_edge.shape.vertices = poly
-            t = self.world.CreateStaticBody(fixtures=self.fd_edge)
+            t = self.world.CreateBody(self.terrain_body_def)
+            t.CreateFixture(self.fd_edge)
             color = (76, 255 if i % 2 == 0 else 204, 76)
             t.color1 = color
             t.color2 = color
@@ -690,6 +878,112 @@ class BipedalWalkerV2(gym.Env, EzPickle):
             poly += [(poly[1][0], 0), (poly[0][0], 0)]
             self.terrain_poly.append((poly, color))
         self.terrain.reverse()
+        self._build_lidar_segments(terrain_x, terrain_y, obstacle_polys)
+
+    def _build_lidar_segments(self, terrain_x, terrain_y, obstacle_polys):
+        """Collects the static lidar targets as segments sorted by min x."""
+        ground_start = np.stack([terrain_x[:-1], terrain_y[:-1]], axis=1)
+        ground_end = np.stack([terrain_x[1:], terrain_y[1:]], axis=1)
+        # Orient polygons counter-clockwise so (v_y, -v_x) points outwards
+        polys = obstacle_polys.copy()
+        area = np.sum(
+            polys[:, :, 0] * np.roll(polys[:, :, 1], -1, axis=1)
+            - np.roll(polys[:, :, 0], -1, axis=1) * polys[:, :, 1],
+            axis=1,
+        )
+        polys[area < 0] = polys[area < 0, ::-1]
+        start = np.concatenate([ground_start, polys.reshape(-1, 2)])
+        end = np.concatenate(
+            [ground_end, np.roll(polys, -1, axis=1).reshape(-1, 2)]
+        )
+        # Edges are hit from both sides, polygons only when entering them
+        one_sided = np.arange(len(start)) >= len(ground_start)
+
+        x_min = np.minimum(start[:, 0], end[:, 0])
+        order = np.argsort(x_min, kind="stable")
+        start, vector = start[order], (end - start)[order]
+        # Ray r from pos crosses segment (p, v) at t = (p - pos) x v / r x v
+        # and s = (p - pos) x r / r x v. Rows of _lidar_segments are
+        # (p_x, p_y, 1, p x v, v_y, -v_x), so the denominators and both
+        # numerators of all rays are one product with _lidar_projection.
+        normal = np.stack([vector[:, 1], -vector[:, 0]], axis=1)
+        self._lidar_segments = np.concatenate(
+            [
+                start,
+                np.ones((len(start), 1)),
+                np.sum(start * normal, axis=1, keepdims=True),
+                normal,
+            ],
+            axis=1,
+        ).T
+        self._lidar_two_sided = ~one_sided[order]
+        self._lidar_x_min = x_min[order].tolist()
+        self._lidar_max_width = float(np.abs(vector[:, 0]).max())
+
+    def _cast_lidar(self, pos, out=None):
+        """
+        Intersects the ten lidar rays from `pos` with the static segments.
+
+        Returns the fraction of LIDAR_RANGE at which each ray first hits,
+        1.0 when it hits nothing, like the Box2D ray cast callback. The
+        fractions are written into `out` when it is given.
+        """
+        pos_x, pos_y = pos[0], pos[1]
+        low = bisect.bisect_left(
+            self._lidar_x_min, pos_x + LIDAR_X_MIN - self._lidar_max_width)
+        high = bisect.bisect_right(self._lidar_x_min, pos_x + LIDAR_X_MAX)
+
+        projection = self._lidar_projection
+        projection[10:20, 2] = LIDAR_RAYS[:, 0] * pos_y
+        projection[10:20, 2] -= LIDAR_RAYS[:, 1] * pos_x
+        projection[20:30, 4] = -pos_x
+        projection[20:30, 5] = -pos_y
+        products = projection @ self._lidar_segments[:, low:high]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s_t = products[10:30].reshape(2, 10, -1) / products[:10]
+        hit = (
+            (np.abs(s_t - 0.5) <= 0.5).all(axis=0)
+            & (self._lidar_two_sided[low:high] | (products[:10] < 0))
+        )
+        fractions = np.where(hit, s_t[1], 1.0).min(axis=1, initial=1.0)
+
+        for fixture in self._lidar_dynamic_fixtures:
+            for i, fraction in enumerate(fractions):
+                ray = Box2D.b2RayCastInput(
+                    p1=(pos_x, pos_y),
+                    p2=(pos_x + LIDAR_RAYS[i, 0], pos_y + LIDAR_RAYS[i, 1]),
+                    maxFraction=fraction,
+                )
+                output = Box2D.b2RayCastOutput()
+                if fixture.RayCast(output, ray, 0):
+                    fractions[i] = output.fraction
+        if out is None:
+            return fractions
+        out[:] = fractions
+        return out
+
+    def set_observation_buffer(self, buffer: Optional[np.ndarray]):
+        """
+        Makes reset and step write observations into `buffer` and return it.
+
+        `buffer` must be a writable (24,) float32 array, e.g. a row of a
+        batched observation array. The returned observations are then views
+        that the next step overwrites. With None, a private buffer is used
+        again and every observation is returned as a copy.
+        """
+        if buffer is None:
+            self._observation = np.zeros(24, dtype=np.float32)
+            self._observation_is_external = False
+            return
+        if buffer.shape != (24,) or buffer.dtype != np.float32:
+            raise ValueError(
+                f"Observation buffer must have shape (24,) and dtype "
+                f"float32, got {buffer.shape} {buffer.dtype}"
+            )
+        if not buffer.flags.writeable:
+            raise ValueError("Observation buffer must be writable")
+        self._observation = buffer
+        self._observation_is_external = True
 
     def _generate_clouds(self):
         # Sorry for the clouds, couldn't resist
@@ -719,16 +1013,50 @@ class BipedalWalkerV2(gym.Env, EzPickle):
         options: Optional[dict] = None,
     ):
         super().reset(seed=seed)
-        self._destroy()
+        key = None
+        cached = None
+        if seed is not None and self.terrain_cache is not None:
+            key = (seed, self.hardcore)
+            cached = self.terrain_cache.get(key)
+        keep_terrain = cached is not None and key == self._terrain_key
+        self._destroy(keep_terrain=keep_terrain)
         self.world.contactListener_bug_workaround = ContactDetector(self)
         self.world.contactListener = self.world.contactListener_bug_workaround
         self.game_over = False
         self.prev_shaping = None
-        self.scroll = 0.0
-        self.lidar_render = 0
+        if self.render_mode is not None:
+            self.scroll = 0.0
+            self.lidar_render = 0
 
-        self._generate_terrain(self.hardcore)
-        self._generate_clouds()
+        if cached is None:
+            terrain_x, terrain_y, obstacle_polys = (
+                self._generate_terrain_data(self.hardcore)
+            )
+            if key is not None:
+                cached = TerrainData(
+                    terrain_x,
+                    terrain_y,
+                    obstacle_polys,
+                    self.np_random.bit_generator.state,
+                )
+                self.terrain_cache.put(key, cached)
+            self._create_terrain(terrain_x, terrain_y, obstacle_polys)
+        else:
+            # Continue the random stream exactly where generation left it
+            self.np_random.bit_generator.state = cached.rng_state
+            if not keep_terrain:
+                self._create_terrain(
+                    cached.terrain_x, cached.terrain_y, cached.obstacle_polys
+                )
+        self._terrain_key = key
+
+        if self.render_mode is not None:
+            self._generate_clouds()
+        else:
+            # Draw the cloud randomness anyway so a seed gives the same
+            # episode with and without rendering
+            self.cloud_poly = []
+            self.np_random.uniform(size=CLOUD_RANDOM_DRAWS)
 
         init_x = TERRAIN_STEP * TERRAIN_STARTPAD / 2
         init_y = TERRAIN_HEIGHT + 2 * LEG_H
@@ -801,66 +1129,108 @@ class BipedalWalkerV2(gym.Env, EzPickle):
                 return fraction
 
         self.lidar = [LidarCallback() for _ in range(10)]
+        self._lidar_dynamic_fixtures = [
+            fixture
+            for body in self.world.bodies
+            if body.type != Box2D.b2_staticBody
+            for fixture in body.fixtures
+            if fixture.filterData.categoryBits & 1
+        ]
         if self.render_mode == "human":
             self.render()
-        return self.step(np.array([0, 0, 0, 0]))[0], {}
+        return self._step(np.array([0, 0, 0, 0]), 1)[0], {}
 
     def step(self, action: np.ndarray):
+        return self._step(action, self.action_repeat)
+
+    @staticmethod
+    def _shaping(x: float, hull_angle: float) -> float:
+        # Adjusted reward shaping for digital walking, with an increased
+        # penalty for head tilt
+        return 200 * x / SCALE - 20.0 * abs(hull_angle)
+
+    def _reward(self, shaping: float, ticks: int, action: np.ndarray) -> float:
+        """Reward of `ticks` ticks of `action` that end at `shaping`."""
+        # Shaping differences telescope, so the reward of repeated ticks
+        # only needs the shaping after the last one
+        reward = 0
+        if self.prev_shaping is not None:
+            reward = shaping - self.prev_shaping
+        # Adjusted motor penalty, paid for every tick
+        return reward - ticks * 0.001 * MOTORS_TORQUE * float(
+            np.abs(action).sum()
+        )
+
+    def _step(self, action: np.ndarray, ticks: int):
+        """Holds `action` for up to `ticks` physics ticks."""
         assert self.hull is not None
 
         # self.hull.ApplyForceToCenter(
         #     (0, 20), True
         # )  # Uncomment this to receive a bit of stability help
         control_speed = False  # Should be easier as well
+        action = np.clip(action, -1, 1)
         if control_speed:
-            self.joints[0].motorSpeed = float(
-                SPEED_HIP * np.clip(action[0], -1, 1)
-            )
-            self.joints[1].motorSpeed = float(
-                SPEED_KNEE * np.clip(action[1], -1, 1)
-            )
-            self.joints[2].motorSpeed = float(
-                SPEED_HIP * np.clip(action[2], -1, 1)
-            )
-            self.joints[3].motorSpeed = float(
-                SPEED_KNEE * np.clip(action[3], -1, 1)
-            )
+            for joint, speed in zip(
+                self.joints, (JOINT_SPEEDS * action).tolist()
+            ):
+                joint.motorSpeed = speed
         else:
-            self.joints[0].motorSpeed = float(SPEED_HIP * np.sign(action[0]))
-            self.joints[0].maxMotorTorque = float(
-                MOTORS_TORQUE * np.clip(np.abs(action[0]), 0, 1)
-            )
-            self.joints[1].motorSpeed = float(SPEED_KNEE * np.sign(action[1]))
-            self.joints[1].maxMotorTorque = float(
-                MOTORS_TORQUE * np.clip(np.abs(action[1]), 0, 1)
-            )
-            self.joints[2].motorSpeed = float(SPEED_HIP * np.sign(action[2]))
-            self.joints[2].maxMotorTorque = float(
-                MOTORS_TORQUE * np.clip(np.abs(action[2]), 0, 1)
-            )
-            self.joints[3].motorSpeed = float(SPEED_KNEE * np.sign(action[3]))
-            self.joints[3].maxMotorTorque = float(
-                MOTORS_TORQUE * np.clip(np.abs(action[3]), 0, 1)
-            )
-
-        self.world.Step(1.0 / FPS, 6 * 30, 2 * 30)
+            for joint, speed, torque in zip(
+                self.joints,
+                (JOINT_SPEEDS * np.sign(action)).tolist(),
+                (MOTORS_TORQUE * np.abs(action)).tolist(),
+            ):
+                joint.motorSpeed = speed
+                joint.maxMotorTorque = torque
+
+        terrain_end = (TERRAIN_LENGTH - TERRAIN_GRASS) * TERRAIN_STEP
+        for tick in range(1, ticks + 1):
+            # Shaping inputs before this tick, in case it ends the episode
+            tick_start = self.hull.position.x, self.hull.angle
+            for _ in range(self.physics.substeps):
+                self.world.Step(
+                    self._physics_time_step,
+                    self.physics.velocity_iterations,
+                    self.physics.position_iterations,
+                )
+            # Stop repeating as soon as the episode is over
+            x = self.hull.position.x
+            if self.game_over or x < 0 or x > terrain_end:
+                break
 
         pos = self.hull.position
         vel = self.hull.linearVelocity
 
-        for i in range(10):
-            self.lidar[i].fraction = 1.0
-            self.lidar[i].p1 = pos
-            self.lidar[i].p2 = (
-                pos[0] + math.sin(1.5 * i / 10.0) * LIDAR_RANGE,
-                pos[1] - math.cos(1.5 * i / 10.0) * LIDAR_RANGE,
-            )
-            self.world.RayCast(
-                self.lidar[i], self.lidar[i].p1, self.lidar[i].p2
-            )
+        observation = self._observation
+        if self.lidar_mode == "vectorized":
+            fractions = self._cast_lidar(pos, out=observation[14:])
+            if self.render_mode is not None:
+                for i, lidar_sensor in enumerate(self.lidar):
+                    lidar_sensor.fraction = fractions[i]
+                    lidar_sensor.p1 = pos
+                    lidar_sensor.p2 = (
+                        pos[0] + fractions[i] * LIDAR_RAYS[i, 0],
+                        pos[1] + fractions[i] * LIDAR_RAYS[i, 1],
+                    )
+        else:
+            for i in range(10):
+                self.lidar[i].fraction = 1.0
+                self.lidar[i].p1 = pos
+                self.lidar[i].p2 = (
+                    pos[0] + math.sin(1.5 * i / 10.0) * LIDAR_RANGE,
+                    pos[1] - math.cos(1.5 * i / 10.0) * LIDAR_RANGE,
+                )
+                self.world.RayCast(
+                    self.lidar[i], self.lidar[i].p1, self.lidar[i].p2
+                )
+            observation[14:] = [
+                lidar_sensor.fraction for lidar_sensor in self.lidar
+            ]
 
-        state = [
-            self.hull.angle,
+        hull_angle = self.hull.angle
+        observation[:14] = (
+            hull_angle,
             2.0 * self.hull.angularVelocity / FPS,
             0.3 * vel.x * (VIEWPORT_W / SCALE) / FPS,
             0.3 * vel.y * (VIEWPORT_H / SCALE) / FPS,
@@ -874,36 +1244,31 @@ class BipedalWalkerV2(gym.Env, EzPickle):
             self.joints[3].angle + 1.0,
             self.joints[3].speed / SPEED_KNEE,
             1.0 if self.legs[3].ground_contact else 0.0,
-        ]
-        state += [lidar_sensor.fraction for lidar_sensor in self.lidar]
-        assert len(state) == 24
-
-        self.scroll = pos.x - VIEWPORT_W / SCALE / 5
-
-        shaping = 200 * pos[0] / SCALE  # Adjusted reward shaping
-        # for digital walking
-        shaping -= 20.0 * abs(state[0])  # Increased penalty for head tilt
-
-        reward = 0
-        if self.prev_shaping is not None:
-            reward = shaping - self.prev_shaping
-        self.prev_shaping = shaping
+        )
 
-        for a in action:
-            reward -= (
-                0.001 * MOTORS_TORQUE * np.clip(np.abs(a), 0, 1)
-            )  # Adjusted motor penalty
+        if self.render_mode is not None:
+            self.scroll = pos.x - VIEWPORT_W / SCALE / 5
 
+        shaping = self._shaping(pos[0], hull_angle)
         terminated = False
         if self.game_over or pos[0] < 0:
-            reward = -100
+            # As in a single step, the tick that ends the episode gets -100
+            # instead of its shaping and motor penalty, the ticks before it
+            # are rewarded as usual
+            reward = -100 + self._reward(
+                self._shaping(*tick_start), tick - 1, action)
             terminated = True
-        if pos[0] > (TERRAIN_LENGTH - TERRAIN_GRASS) * TERRAIN_STEP:
+        else:
+            reward = self._reward(shaping, tick, action)
+        self.prev_shaping = shaping
+        if pos[0] > terrain_end:
             terminated = True
 
         if self.render_mode == "human":
             self.render()
-        return np.array(state, dtype=np.float32), reward, terminated, False, {}
+        if self._observation_is_external:
+            return observation, reward, terminated, False, {}
+        return observation.copy(), reward, terminated, False, {}
 
     def render(self):
         if self.render_mode is None:
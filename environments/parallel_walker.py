@@ -0,0 +1,213 @@
+import ctypes
+import math
+import multiprocessing
+from typing import Optional
+
+import numpy as np
+from tf_agents.environments import py_environment
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import time_step as ts
+
+from environments.bipedal_walker import BipedalWalkerV2
+
+OBSERVATION_SIZE = 24
+ACTION_SIZE = 4
+
+# TimeLimit used by the registered BipedalWalker-v3 environments
+MAX_EPISODE_STEPS = 1600
+MAX_EPISODE_STEPS_HARDCORE = 2000
+
+_COMMAND_STEP, _COMMAND_RESET, _COMMAND_CLOSE = range(3)
+
+
+def _as_array(buffer, dtype, shape):
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+def _worker(index, env_kwargs, max_episode_steps, seed, barrier, command,
+            actions, observations, rewards, discounts, step_types):
+    """
+    Runs one BipedalWalkerV2 in a worker process.
+
+    The worker waits on `barrier` for the parent to publish a command and
+    actions, writes its row of the shared result arrays, then waits on
+    `barrier` again to signal that the results are ready. Episodes that end
+    are reset on the following step, which then reports a FIRST time step.
+    """
+    try:
+        env = BipedalWalkerV2(**env_kwargs)
+        actions = _as_array(actions, np.float32, (-1, ACTION_SIZE))[index]
+        observations = _as_array(
+            observations, np.float32, (-1, OBSERVATION_SIZE))[index]
+        rewards = _as_array(rewards, np.float32, (-1,))
+        discounts = _as_array(discounts, np.float32, (-1,))
+        step_types = _as_array(step_types, np.int32, (-1,))
+        # Observations are written straight into this worker's shared row
+        env.set_observation_buffer(observations)
+
+        needs_reset = True
+        episode_steps = 0
+        while True:
+            barrier.wait()
+            if command.value == _COMMAND_CLOSE:
+                env.close()
+                return
+            if command.value == _COMMAND_RESET or needs_reset:
+                env.reset(seed=seed)
+                seed = None  # Only the first episode is seeded
+                rewards[index] = 0.0
+                discounts[index] = 1.0
+                step_types[index] = ts.StepType.FIRST
+                needs_reset = False
+                episode_steps = 0
+            else:
+                _, reward, terminated, truncated, _ = env.step(actions)
+                episode_steps += 1
+                truncated = truncated or episode_steps >= max_episode_steps
+                rewards[index] = reward
+                discounts[index] = 0.0 if terminated else 1.0
+                needs_reset = terminated or truncated
+                step_types[index] = (
+                    ts.StepType.LAST if needs_reset else ts.StepType.MID)
+            barrier.wait()
+    except Exception:
+        # Wake the parent with a BrokenBarrierError instead of hanging it
+        barrier.abort()
+        raise
+
+
+class ParallelBipedalWalker(py_environment.PyEnvironment):
+    """
+    Batched BipedalWalkerV2 environment simulated by a pool of processes.
+
+    Each worker process owns one BipedalWalkerV2 and its own b2World, so M
+    workers step M Box2D simulations on M cores. Actions, observations,
+    rewards, discounts and step types are exchanged through shared-memory
+    arrays and two barrier waits per step; nothing is pickled after start-up.
+
+    The environment is batched with `batch_size == num_workers` and can be
+    wrapped in a TFPyEnvironment. Workers apply the BipedalWalker-v3 time
+    limit and reset finished episodes on the next step.
+
+    The workers simulate BipedalWalkerV2, not gym's BipedalWalker-v3: its
+    reward weights forward progress, hull tilt and motor torque differently,
+    so returns are not comparable with those of `suite_gym.load(
+    "BipedalWalker-v3")`, and a policy trained on one is trained for a
+    different task than the other.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        env_kwargs: Optional[dict] = None,
+        max_episode_steps: Optional[int] = None,
+        seed: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ):
+        """
+        Args:
+            num_workers: Number of worker processes, one environment each.
+            env_kwargs: Keyword arguments for BipedalWalkerV2, e.g.
+                `{"hardcore": True}`.
+            max_episode_steps: Episode time limit in steps. Defaults to
+                the BipedalWalker-v3 limit for the chosen terrain, divided
+                by the `action_repeat` of the environment.
+            seed: Seed of the first episode of worker 0; worker i uses
+                `seed + i`. Unseeded when None.
+            start_method: multiprocessing start method. Defaults to the
+                platform default; "spawn" requires the calling script to
+                guard its entry point with `if __name__ == "__main__"`.
+        """
+        super(ParallelBipedalWalker, self).__init__()
+        if num_workers < 1:
+            raise ValueError(
+                f"num_workers must be at least 1, got {num_workers}")
+        env_kwargs = dict(env_kwargs or {})
+        env_kwargs.setdefault("render_mode", None)
+        if max_episode_steps is None:
+            max_episode_steps = (
+                MAX_EPISODE_STEPS_HARDCORE if env_kwargs.get("hardcore")
+                else MAX_EPISODE_STEPS)
+            # The time limit is in physics ticks, each step runs several
+            max_episode_steps = math.ceil(
+                max_episode_steps / env_kwargs.get("action_repeat", 1))
+        self._num_workers = num_workers
+        self._max_episode_steps = max_episode_steps
+
+        observation_space = BipedalWalkerV2(**env_kwargs).observation_space
+        self._observation_spec = array_spec.BoundedArraySpec(
+            shape=(OBSERVATION_SIZE,), dtype=np.float32,
+            minimum=observation_space.low, maximum=observation_space.high,
+            name="observation")
+        self._action_spec = array_spec.BoundedArraySpec(
+            shape=(ACTION_SIZE,), dtype=np.float32, minimum=-1.0,
+            maximum=1.0, name="action")
+
+        context = multiprocessing.get_context(start_method)
+        buffers = (
+            context.RawArray(ctypes.c_float, num_workers * ACTION_SIZE),
+            context.RawArray(ctypes.c_float, num_workers * OBSERVATION_SIZE),
+            context.RawArray(ctypes.c_float, num_workers),
+            context.RawArray(ctypes.c_float, num_workers),
+            context.RawArray(ctypes.c_int32, num_workers),
+        )
+        self._actions = _as_array(buffers[0], np.float32, (-1, ACTION_SIZE))
+        self._observations = _as_array(
+            buffers[1], np.float32, (-1, OBSERVATION_SIZE))
+        self._rewards = _as_array(buffers[2], np.float32, (-1,))
+        self._discounts = _as_array(buffers[3], np.float32, (-1,))
+        self._step_types = _as_array(buffers[4], np.int32, (-1,))
+        self._command = context.RawValue(ctypes.c_int, _COMMAND_RESET)
+        self._barrier = context.Barrier(num_workers + 1)
+
+        self._workers = []
+        for index in range(num_workers):
+            worker = context.Process(
+                target=_worker,
+                args=(index, env_kwargs, max_episode_steps,
+                      None if seed is None else seed + index, self._barrier,
+                      self._command) + buffers,
+                daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    @property
+    def batched(self):
+        return True
+
+    @property
+    def batch_size(self):
+        return self._num_workers
+
+    def observation_spec(self):
+        return self._observation_spec
+
+    def action_spec(self):
+        return self._action_spec
+
+    def _run(self, command):
+        self._command.value = command
+        self._barrier.wait()  # Workers read the command and actions
+        self._barrier.wait()  # Workers have written their results
+        return ts.TimeStep(
+            self._step_types.copy(), self._rewards.copy(),
+            self._discounts.copy(), self._observations.copy())
+
+    def _reset(self):
+        return self._run(_COMMAND_RESET)
+
+    def _step(self, action):
+        self._actions[:] = np.reshape(action, self._actions.shape)
+        return self._run(_COMMAND_STEP)
+
+    def close(self):
+        if not self._workers:
+            return
+        if not self._barrier.broken:
+            self._command.value = _COMMAND_CLOSE
+            self._barrier.wait()
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
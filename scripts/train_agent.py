@@ -11,15 +11,26 @@ from tf_agents.drivers import dynamic_step_driver
 from tf_agents.metrics import tf_metrics
 from tf_agents.eval import metric_utils
 from tf_agents.policies import policy_saver
-
-from environment import BirdRobotEnvironment
-from config import CONTROL_FREQUENCY, REWARD_COLLISION, REWARD_GOAL, REWARD_STEP, NUM_ITERATIONS, COLLECT_STEPS_PER_ITERATION, LOG_INTERVAL, EVAL_INTERVAL, POLICY_DIR
-import os
+from tf_agents.policies import greedy_policy
+from tf_agents.policies import q_policy
+
+from src.environment import BirdRobotEnvironment
+from src.batched_environment import BatchedBirdRobotEnvironment
+from config.config import CONTROL_FREQUENCY, REWARD_COLLISION, REWARD_GOAL, REWARD_STEP, NUM_ITERATIONS, COLLECT_STEPS_PER_ITERATION, NUM_PARALLEL_ENVIRONMENTS, LOG_INTERVAL, EVAL_INTERVAL, NUM_EVAL_EPISODES, ASYNC_EVALUATION, EVAL_MAX_STEPS, CHECKPOINT_INTERVAL, CHECKPOINTS_TO_KEEP, PRIORITIZED_REPLAY, PRIORITY_EXPONENT, IMPORTANCE_SAMPLING_EXPONENT, REPLAY_BUFFER_MAX_LENGTH, REPLAY_BUFFER_MAX_RESIDENT_BYTES, POLICY_DIR, CHECKPOINT_DIR, REPLAY_BUFFER_DIR, TRAJECTORY_DIR, WARM_START_DIR, PROFILE_PATH, PROFILE_INTERVAL, PROFILE_TRACE_STEPS, PROFILE_TRACE_DIR
+from agents.checkpointing import AsyncCheckpointer, export_policy
+from agents.evaluation import AsyncEvaluator
+from agents.profiling import TrainingProfiler
+from agents.replay_buffers import MemmapReplayBuffer, PrioritizedReplayBuffer
+from agents.trajectory_io import TrajectoryWriter, fill_replay_buffer
 
 print(f"POLICY_DIR is set to: {POLICY_DIR}")
 
-# Set up the environment
-train_py_env = BirdRobotEnvironment()
+# Set up the profiler, which times the hot paths of the training loop when PROFILE_PATH or PROFILE_TRACE_STEPS is set
+profiler = TrainingProfiler(
+    PROFILE_PATH, export_interval=PROFILE_INTERVAL, trace_dir=PROFILE_TRACE_DIR, trace_steps=PROFILE_TRACE_STEPS)
+
+# Set up the environment, the training environment steps NUM_PARALLEL_ENVIRONMENTS robots per call
+train_py_env = profiler.wrap_environment(BatchedBirdRobotEnvironment(NUM_PARALLEL_ENVIRONMENTS))
 eval_py_env = BirdRobotEnvironment()
 train_env = tf_py_environment.TFPyEnvironment(train_py_env)
 eval_env = tf_py_environment.TFPyEnvironment(eval_py_env)
@@ -33,7 +44,7 @@ q_net = q_network.QNetwork(
 
 # Set up the DQN agent
 optimizer = tf.compat.v1.train.AdamOptimizer(learning_rate=1e-3)
-train_step_counter = tf.Variable(0)
+train_step_counter = tf.Variable(0, dtype=tf.int64)
 agent = dqn_agent.DqnAgent(
     train_env.time_step_spec(),
     train_env.action_spec(),
@@ -43,11 +54,63 @@ agent = dqn_agent.DqnAgent(
     train_step_counter=train_step_counter)
 agent.initialize()
 
-# Set up the replay buffer
-replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
-    data_spec=agent.collect_data_spec,
-    batch_size=train_env.batch_size,
-    max_length=100000)
+# Set up the background checkpointer and resume from the latest checkpoint, if any
+# The optimizer is checkpointed too, so that a resumed run keeps its Adam moments
+checkpointer = AsyncCheckpointer(CHECKPOINT_DIR, {'agent': agent, 'optimizer': optimizer}, max_to_keep=CHECKPOINTS_TO_KEEP)
+restored_step = checkpointer.restore()
+if restored_step is not None:
+    print(f"Restored checkpoint {checkpointer.latest_checkpoint} at step {restored_step}")
+
+# Set up the background evaluator, which plays every evaluation episode at once with its own copy of the Q-Network
+if ASYNC_EVALUATION:
+    eval_q_net = q_net.copy(name='EvalQNetwork')
+    eval_q_net.create_variables(train_env.observation_spec())
+    eval_policy = greedy_policy.GreedyPolicy(q_policy.QPolicy(
+        train_env.time_step_spec(), train_env.action_spec(), q_network=eval_q_net))
+    evaluator = AsyncEvaluator(
+        tf_py_environment.TFPyEnvironment(BatchedBirdRobotEnvironment(NUM_EVAL_EPISODES)),
+        eval_policy, agent.policy.variables(), NUM_EVAL_EPISODES, max_steps=EVAL_MAX_STEPS)
+
+
+def log_evaluations():
+    """
+    Prints the background evaluations that have finished since the last call.
+    """
+    for result in evaluator.results():
+        print('step = {0}: Average Return = {1}, Average Length = {2}'.format(
+            result.step, result.returns.mean(), result.lengths.mean()))
+
+
+def log_checkpoints():
+    """
+    Prints the background checkpoints that have been written since the last call.
+    """
+    for result in checkpointer.results():
+        print('step = {0}: saved {1}, blocked for {2:.1f} ms, written in {3:.1f} ms'.format(
+            result.step, result.path, result.snapshot_seconds * 1e3, result.write_seconds * 1e3))
+
+
+# Set up the replay buffer, whose capacity REPLAY_BUFFER_MAX_LENGTH is shared by the rows of the batched environment
+replay_buffer_max_length = max(1, REPLAY_BUFFER_MAX_LENGTH // train_env.batch_size)
+if REPLAY_BUFFER_DIR is not None:
+    replay_buffer = MemmapReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length,
+        directory=REPLAY_BUFFER_DIR,
+        max_resident_bytes=REPLAY_BUFFER_MAX_RESIDENT_BYTES)
+elif PRIORITIZED_REPLAY:
+    replay_buffer = PrioritizedReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length,
+        alpha=PRIORITY_EXPONENT,
+        beta=IMPORTANCE_SAMPLING_EXPONENT)
+else:
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_max_length)
 
 # Set up the random policy
 random_policy = random_tf_policy.RandomTFPolicy(train_env.time_step_spec(), train_env.action_spec())
@@ -56,22 +119,34 @@ random_policy = random_tf_policy.RandomTFPolicy(train_env.time_step_spec(), trai
 train_metrics = [
     tf_metrics.NumberOfEpisodes(),
     tf_metrics.EnvironmentSteps(),
+    tf_metrics.AverageReturnMetric(batch_size=train_env.batch_size),
+    tf_metrics.AverageEpisodeLengthMetric(batch_size=train_env.batch_size),
+]
+eval_metrics = [
     tf_metrics.AverageReturnMetric(),
     tf_metrics.AverageEpisodeLengthMetric(),
 ]
 
-# Set up the driver
+# Set up the driver, which also streams the collected trajectories to shards if TRAJECTORY_DIR is set
+observers = [profiler.timed('buffer_add', replay_buffer.add_batch)] + train_metrics
+if TRAJECTORY_DIR is not None:
+    trajectory_writer = TrajectoryWriter(TRAJECTORY_DIR, agent.collect_data_spec)
+    observers.append(profiler.timed('trajectory_write', trajectory_writer))
 collect_driver = dynamic_step_driver.DynamicStepDriver(
     train_env,
-    random_policy,
-    observers=[replay_buffer.add_batch] + train_metrics,
+    profiler.time_policy(random_policy),
+    observers=observers,
     num_steps=1)
 
-# Collect initial data
-initial_collect_steps = 1000
+# Collect initial data, 1000 transitions in all, unless the replay buffer was restored warm from disk or is filled from logged trajectories
+initial_collect_steps = -(-1000 // train_env.batch_size)
 collect_driver.run = common.function(collect_driver.run)
-for _ in range(initial_collect_steps):
-    collect_driver.run()
+if replay_buffer.num_frames() == 0:
+    if WARM_START_DIR is not None:
+        fill_replay_buffer(replay_buffer, WARM_START_DIR, agent.collect_data_spec)
+    else:
+        for _ in range(initial_collect_steps):
+            collect_driver.run()
 
 # Set up the dataset
 dataset = replay_buffer.as_dataset(
@@ -95,52 +170,78 @@ policy_saver = policy_saver.PolicySaver(agent.policy)
 try:
     for _ in range(num_iterations):
         # Collect a few steps and save to the replay buffer
-        collect_driver.run()
+        with profiler.section('collect'):
+            collect_driver.run()
 
         # Sample a batch of data from the replay buffer and update the agent's network
-        experience, _ = next(iterator)
-        train_loss = agent.train(experience).loss
+        with profiler.section('sample'):
+            experience, info = next(iterator)
+        with profiler.section('train'):
+            if isinstance(replay_buffer, PrioritizedReplayBuffer):
+                # Correct the sampling bias and refresh the priorities from the TD errors of the update
+                loss_info = agent.train(experience, weights=replay_buffer.importance_weights(info.probabilities))
+                replay_buffer.update_priorities(info.ids.numpy(), loss_info.extra.td_error.numpy())
+            else:
+                loss_info = agent.train(experience)
+        train_loss = loss_info.loss
 
         step = agent.train_step_counter.numpy()
 
         if step % log_interval == 0:
             print('step = {0}: loss = {1}'.format(step, train_loss))
+            if profiler.enabled:
+                print('step = {0}: {1}'.format(step, profiler.format_summary()))
 
         if step % eval_interval == 0:
-            avg_return = metric_utils.compute_summaries(
-                metrics=train_metrics,
-                environment=eval_env,
-                policy=agent.policy,
-                num_episodes=10,
-                tf_summaries=False,
-                log=True)
-            print('step = {0}: Average Return = {1}'.format(step, avg_return))
-
-        # Attempt to save the policy more frequently for debugging purposes
-        if step % (eval_interval // 10) == 0:
-            policy_dir = POLICY_DIR
-            print(f"Attempting to save policy at step {step} in directory {policy_dir}")
-            if not os.path.exists(policy_dir):
-                try:
-                    os.makedirs(policy_dir)
-                    print(f"Directory {policy_dir} created successfully.")
-                except Exception as e:
-                    print(f"Error creating directory {policy_dir}: {e}")
-            try:
-                policy_saver.save(policy_dir)
-                print(f"Policy saved successfully in {policy_dir} at step {step}")
-            except Exception as e:
-                print(f"Error saving policy at step {step}: {e}")
-
-    # Final save of the trained policy
-    policy_dir = POLICY_DIR
-    print(f"Attempting final save of policy in directory {policy_dir}")
-    if not os.path.exists(policy_dir):
-        os.makedirs(policy_dir)
-
+            with profiler.section('evaluate'):
+                if not ASYNC_EVALUATION:
+                    avg_return = metric_utils.compute_summaries(
+                        metrics=eval_metrics,
+                        environment=eval_env,
+                        policy=agent.policy,
+                        num_episodes=NUM_EVAL_EPISODES,
+                        tf_summaries=False,
+                        log=True)
+                    print('step = {0}: Average Return = {1}'.format(step, avg_return))
+                elif not evaluator.evaluate(step):
+                    print('step = {0}: skipped evaluation, the previous one is still running'.format(step))
+
+        # Log the background evaluations that have finished
+        if ASYNC_EVALUATION:
+            log_evaluations()
+
+        # Snapshot the variables, the checkpoint is written in the background
+        if step % CHECKPOINT_INTERVAL == 0:
+            with profiler.section('checkpoint'):
+                if not checkpointer.save(step):
+                    print('step = {0}: skipped checkpoint, the previous one is still being written'.format(step))
+                # Keep the on-disk replay buffer in step with the checkpoints
+                if REPLAY_BUFFER_DIR is not None:
+                    replay_buffer.flush()
+        log_checkpoints()
+
+        profiler.step(step)
+
+    # Wait for the last background evaluation
+    if ASYNC_EVALUATION:
+        evaluator.close()
+        log_evaluations()
+
+    if REPLAY_BUFFER_DIR is not None:
+        replay_buffer.flush()
+
+    if TRAJECTORY_DIR is not None:
+        trajectory_writer.close()
+
+    profiler.close()
+
+    # Wait for the last checkpoint, then export the trained policy as a full SavedModel
+    checkpointer.close()
+    log_checkpoints()
+    print(f"Attempting final save of policy in directory {POLICY_DIR}")
     try:
-        policy_saver.save(policy_dir)
-        print(f"Policy saved successfully in {policy_dir}")
+        export_seconds = export_policy(policy_saver, POLICY_DIR)
+        print(f"Policy saved successfully in {POLICY_DIR} in {export_seconds:.2f} s")
     except Exception as e:
         print(f"Error saving policy: {e}")
 except Exception as e:
@@ -0,0 +1,190 @@
+from tf_agents.environments import py_environment
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import time_step as ts
+import numpy as np
+from config.config import MAX_SPEED, ACCELERATION, TURN_RATE, SENSOR_RANGE, SIMULATION_TIME_STEP, COLLISION_DISTANCE, BOUNDARY_MIN, BOUNDARY_MAX, REWARD_COLLISION, REWARD_GOAL, REWARD_STEP, BOUNDARY_OFFSET, INITIAL_ORIENTATION
+from src.environment import BirdRobotEnvironment
+from src.heading import HeadingTable, in_field_of_view
+from src.obstacle_index import ObstacleGrid
+
+DEFAULT_OBSTACLES = [[20, 20], [40, 40], [60, 60]]  # Same example obstacles as BirdRobotEnvironment
+
+
+class BatchedBirdRobotEnvironment(py_environment.PyEnvironment):
+    """
+    Batched version of BirdRobotEnvironment that advances N independent bird robots with array operations.
+
+    Every robot shares the same obstacle map, goal and dynamics as BirdRobotEnvironment, but the state of the
+    whole batch lives in a single (N, 6 + 3K) float32 array so one call to `step` produces N transitions.
+    The environment reports `batched = True`, so it can be wrapped directly in a TFPyEnvironment.
+
+    Robots whose previous step ended an episode are reset individually on the next step and report a FIRST
+    time step, mirroring the per-environment auto-reset of BatchedPyEnvironment.
+
+    Attributes:
+        _batch_size (int): Number of robots simulated in parallel.
+        _obstacles (np.ndarray): Obstacle positions with shape (K, 2).
+        _obstacle_index (ObstacleGrid): Grid index over the obstacles, or None when every robot checks every obstacle.
+        _headings (HeadingTable): Lookup of the unit heading vectors of the reachable orientations.
+        _state (np.ndarray): Current state of every robot with shape (N, 6 + 3K).
+        _episode_ended (np.ndarray): Boolean mask of robots whose episode ended on the previous step.
+    """
+
+    ACTION_ACCELERATE = BirdRobotEnvironment.ACTION_ACCELERATE
+    ACTION_DECELERATE = BirdRobotEnvironment.ACTION_DECELERATE
+    ACTION_TURN_RIGHT = BirdRobotEnvironment.ACTION_TURN_RIGHT
+    ACTION_TURN_LEFT = BirdRobotEnvironment.ACTION_TURN_LEFT
+    ACTION_MOVE_FORWARD = BirdRobotEnvironment.ACTION_MOVE_FORWARD
+    ACTION_MOVE_BACKWARD = BirdRobotEnvironment.ACTION_MOVE_BACKWARD
+
+    def __init__(self, batch_size, obstacles=None, use_index=True, use_heading_table=True) -> None:
+        """
+        Initializes the batched environment.
+
+        Args:
+            batch_size (int): Number of robots to simulate in parallel.
+            obstacles (array-like, optional): Obstacle positions with shape (K, 2). Defaults to the example
+                obstacles used by BirdRobotEnvironment.
+            use_index (bool): Whether to build an ObstacleGrid once for the map so each robot only checks the
+                obstacles within SENSOR_RANGE. When False, the full (N, K) distance matrix is computed every step.
+            use_heading_table (bool): Whether to look up the heading vectors of the orientations reachable with
+                TURN_RATE in a HeadingTable. When False, or when TURN_RATE does not divide 360, they are computed
+                directly.
+        """
+        super(BatchedBirdRobotEnvironment, self).__init__()
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        self._batch_size = batch_size
+        if obstacles is None:
+            obstacles = DEFAULT_OBSTACLES
+        self._obstacles = np.asarray(obstacles, dtype=np.float64).reshape(-1, 2)
+        self._obstacle_index = ObstacleGrid(self._obstacles, max(SENSOR_RANGE, COLLISION_DISTANCE)) if use_index else None
+        self._headings = HeadingTable(enabled=use_heading_table)
+        num_obstacles = len(self._obstacles)
+        self._action_spec = array_spec.BoundedArraySpec(
+            shape=(), dtype=np.int32, minimum=self.ACTION_ACCELERATE, maximum=self.ACTION_MOVE_BACKWARD, name='action')
+        self._observation_spec = array_spec.BoundedArraySpec(
+            shape=(6 + num_obstacles * 3,), dtype=np.float32, minimum=BOUNDARY_MIN, maximum=BOUNDARY_MAX, name='observation')
+
+        # Initial state shared by every robot: [x, y, orientation, velocity, goal_x, goal_y, obstacle_x1, obstacle_y1, distance1, ...]
+        self._initial_state = np.zeros(6 + num_obstacles * 3, dtype=np.float32)
+        self._initial_state[:2] = [BOUNDARY_MIN + BOUNDARY_OFFSET, BOUNDARY_MIN + BOUNDARY_OFFSET]
+        self._initial_state[2] = INITIAL_ORIENTATION
+        self._initial_state[4:6] = [BOUNDARY_MAX - BOUNDARY_OFFSET, BOUNDARY_MAX - BOUNDARY_OFFSET]
+        self._initial_state[6::3] = self._obstacles[:, 0]
+        self._initial_state[7::3] = self._obstacles[:, 1]
+        self._initial_state[8::3] = SENSOR_RANGE
+
+        self._state = np.tile(self._initial_state, (batch_size, 1))
+        self._episode_ended = np.zeros(batch_size, dtype=bool)
+
+    @property
+    def batched(self):
+        return True
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    def action_spec(self):
+        return self._action_spec
+
+    def observation_spec(self):
+        return self._observation_spec
+
+    def _reset(self):
+        """
+        Resets every robot to its initial state at the start of a new episode.
+        """
+        self._state[:] = self._initial_state
+        self._episode_ended[:] = False
+        return ts.restart(self._get_observation(), batch_size=self._batch_size)
+
+    def _step(self, action):
+        """
+        Advances all robots by one step.
+
+        Args:
+            action (np.ndarray): Integer actions with shape (N,). Valid actions are defined by the ACTION_* constants.
+
+        Returns:
+            ts.TimeStep: A batched TimeStep whose fields have a leading dimension of N. Robots that ended their
+            episode on the previous step are reset and report a FIRST step; the others follow the same
+            termination conditions and rewards as BirdRobotEnvironment.
+        """
+        action = np.asarray(action).reshape(self._batch_size)
+        state = self._state
+        position = state[:, 0:2]
+        orientation = state[:, 2]
+        velocity = state[:, 3]
+
+        # Update the state based on the action
+        velocity[action == self.ACTION_ACCELERATE] += ACCELERATION
+        velocity[action == self.ACTION_DECELERATE] -= ACCELERATION
+        turn = (action == self.ACTION_TURN_RIGHT).astype(np.float32) - (action == self.ACTION_TURN_LEFT)
+        orientation[:] = (orientation + turn * TURN_RATE) % 360
+        move = (action == self.ACTION_MOVE_FORWARD).astype(np.float32) - (action == self.ACTION_MOVE_BACKWARD)
+        unit_vectors = self._headings.unit_vectors(orientation)
+        position += (move * velocity * SIMULATION_TIME_STEP)[:, np.newaxis] * unit_vectors
+        np.clip(velocity, -MAX_SPEED, MAX_SPEED, out=velocity)
+
+        # Update obstacle distances for every robot at once
+        collided = self._update_obstacles(unit_vectors)
+
+        # Check which episodes have ended
+        out_of_bounds = np.any(position < BOUNDARY_MIN + BOUNDARY_OFFSET, axis=1) | np.any(position > BOUNDARY_MAX - BOUNDARY_OFFSET, axis=1)
+        goal_offset = position.astype(np.float64) - state[:, 4:6]
+        reached_goal = np.hypot(goal_offset[:, 0], goal_offset[:, 1]) < COLLISION_DISTANCE
+
+        failed = out_of_bounds | collided
+        done = failed | reached_goal
+        reward = np.where(failed, REWARD_COLLISION, np.where(reached_goal, REWARD_GOAL, REWARD_STEP)).astype(np.float32)
+        discount = np.where(done, 0.0, 0.9).astype(np.float32)
+        step_type = np.where(done, ts.StepType.LAST, ts.StepType.MID).astype(np.int32)
+
+        # Robots whose episode ended on the previous step start a new one instead
+        restarted = self._episode_ended
+        if np.any(restarted):
+            state[restarted] = self._initial_state
+            reward[restarted] = 0.0
+            discount[restarted] = 1.0
+            step_type[restarted] = ts.StepType.FIRST
+            done[restarted] = False
+        self._episode_ended = done
+
+        return ts.TimeStep(step_type, reward, discount, self._get_observation())
+
+    def _update_obstacles(self, unit_vectors):
+        """
+        Updates the sensed obstacle distances of every robot.
+
+        With the obstacle index only (robot, obstacle) pairs that share nearby grid cells are checked;
+        otherwise the full (N, K) distance matrix is computed.
+
+        Args:
+            unit_vectors (np.ndarray): Unit heading vectors of every robot with shape (N, 2).
+
+        Returns:
+            np.ndarray: Boolean mask of robots that collide with an obstacle.
+        """
+        position = self._state[:, 0:2].astype(np.float64)
+        if self._obstacle_index is None:
+            offset = self._obstacles[np.newaxis, :, :] - position[:, np.newaxis, :]
+            distance = np.hypot(offset[..., 0], offset[..., 1])
+            visible = in_field_of_view(offset, distance, unit_vectors[:, np.newaxis, :])
+            self._state[:, 8::3] = np.where(visible, distance, SENSOR_RANGE)
+            return np.any(distance < COLLISION_DISTANCE, axis=1)
+
+        robot, obstacle = self._obstacle_index.query_pairs(position, max(SENSOR_RANGE, COLLISION_DISTANCE))
+        offset = np.take(self._obstacles, obstacle, axis=0) - np.take(position, robot, axis=0)
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        visible = in_field_of_view(offset, distance, np.take(unit_vectors, robot, axis=0))
+        self._state[:, 8::3] = SENSOR_RANGE
+        self._state[robot[visible], 8 + obstacle[visible] * 3] = distance[visible]
+        return np.bincount(robot[distance < COLLISION_DISTANCE], minlength=self._batch_size) > 0
+
+    def _get_observation(self):
+        """
+        Returns a copy of the current state of every robot.
+        """
+        return self._state.copy()
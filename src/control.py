@@ -1,40 +1,68 @@
 import numpy as np
-from config import MAX_SPEED, ACCELERATION, TURN_RATE, CONTROL_FREQUENCY, SIMULATION_TIME_STEP
+from src.kinematics import ACCELERATE, DECELERATE, TURN_RIGHT, TURN_LEFT, MOVE_FORWARD, MOVE_BACKWARD, COMMANDS, KinematicsState
+
+# One command row per control method
+_COMMANDS = np.eye(len(COMMANDS), dtype=bool)[:, np.newaxis, :]
+
 
 class BirdRobotControl:
     """
     Control system for the 2D bird robot.
 
     This class provides methods to control the bird robot's movement and orientation.
+    It is a view of one robot of a KinematicsState, so many robots can share one state and be advanced together
+    with KinematicsState.step.
     """
 
-    def __init__(self):
-        self.velocity = 0.0
-        self.orientation = 0.0
+    def __init__(self, state=None, index=0):
+        """
+        Args:
+            state (KinematicsState, optional): State that holds the robot. Defaults to a new state of one robot.
+            index (int): Index of the robot in `state`.
+        """
+        self.state = state if state is not None else KinematicsState(1)
+        self.index = index
+        self._robot = slice(index, index + 1)
+
+    @property
+    def velocity(self):
+        return float(self.state.velocity[self.index])
+
+    @velocity.setter
+    def velocity(self, velocity):
+        self.state.velocity[self.index] = velocity
+
+    @property
+    def orientation(self):
+        return float(self.state.orientation[self.index])
+
+    @orientation.setter
+    def orientation(self, orientation):
+        self.state.orientation[self.index] = orientation
 
     def accelerate(self):
         """
         Increases the velocity of the bird robot.
         """
-        self.velocity = np.clip(self.velocity + ACCELERATION, -MAX_SPEED, MAX_SPEED)
+        self.state.step(_COMMANDS[ACCELERATE], self._robot)
 
     def decelerate(self):
         """
         Decreases the velocity of the bird robot.
         """
-        self.velocity = np.clip(self.velocity - ACCELERATION, -MAX_SPEED, MAX_SPEED)
+        self.state.step(_COMMANDS[DECELERATE], self._robot)
 
     def turn_right(self):
         """
         Turns the bird robot to the right.
         """
-        self.orientation = (self.orientation + TURN_RATE) % 360
+        self.state.step(_COMMANDS[TURN_RIGHT], self._robot)
 
     def turn_left(self):
         """
         Turns the bird robot to the left.
         """
-        self.orientation = (self.orientation - TURN_RATE) % 360
+        self.state.step(_COMMANDS[TURN_LEFT], self._robot)
 
     def move_forward(self, position):
         """
@@ -46,9 +74,7 @@ class BirdRobotControl:
         Returns:
             np.ndarray: The new position of the bird robot [x, y].
         """
-        position[0] += self.velocity * np.cos(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-        position[1] += self.velocity * np.sin(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-        return position
+        return self._move(MOVE_FORWARD, position)
 
     def move_backward(self, position):
         """
@@ -60,6 +86,11 @@ class BirdRobotControl:
         Returns:
             np.ndarray: The new position of the bird robot [x, y].
         """
-        position[0] -= self.velocity * np.cos(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-        position[1] -= self.velocity * np.sin(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
+        return self._move(MOVE_BACKWARD, position)
+
+    def _move(self, command, position):
+        # The position is passed in, so it is moved through the state and written back in place
+        self.state.position[self.index] = position
+        self.state.step(_COMMANDS[command], self._robot)
+        position[:] = self.state.position[self.index]
         return position
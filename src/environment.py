@@ -5,7 +5,9 @@ from tf_agents.environments import tf_py_environment
 from tf_agents.specs import array_spec
 from tf_agents.trajectories import time_step as ts
 import numpy as np
-from config.config import MAX_SPEED, ACCELERATION, TURN_RATE, SENSOR_RANGE, SENSOR_ANGLE, CONTROL_FREQUENCY, SIMULATION_TIME_STEP, COLLISION_DISTANCE, BOUNDARY_MIN, BOUNDARY_MAX, REWARD_COLLISION, REWARD_GOAL, REWARD_STEP, BOUNDARY_OFFSET, INITIAL_ORIENTATION
+from src.heading import HeadingTable, in_field_of_view
+from src.obstacle_index import ObstacleGrid
+from config.config import MAX_SPEED, ACCELERATION, TURN_RATE, SENSOR_RANGE, CONTROL_FREQUENCY, SIMULATION_TIME_STEP, COLLISION_DISTANCE, BOUNDARY_MIN, BOUNDARY_MAX, REWARD_COLLISION, REWARD_GOAL, REWARD_STEP, BOUNDARY_OFFSET, INITIAL_ORIENTATION
 
 class BirdRobotEnvironment(py_environment.PyEnvironment):
     """
@@ -16,7 +18,8 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
 
     Attributes:
         _action_spec (array_spec.BoundedArraySpec): Specification of the action space.
-        _obstacles (List[np.ndarray]): List of obstacle positions.
+        _obstacles (np.ndarray): Obstacle positions with shape (K, 2).
+        _obstacle_index (ObstacleGrid): Grid index over the obstacles, or None when every obstacle is scanned.
         _observation_spec (array_spec.BoundedArraySpec): Specification of the observation space.
         _state (np.ndarray): Current state of the environment.
         _episode_ended (bool): Flag indicating whether the episode has ended.
@@ -29,14 +32,26 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
     ACTION_MOVE_FORWARD = 4
     ACTION_MOVE_BACKWARD = 5
 
-    def __init__(self) -> None:
+    def __init__(self, obstacles=None, use_index=True, use_heading_table=True) -> None:
         """
         Initializes the BirdRobotEnvironment with action and observation specifications,
         and sets up the initial state and obstacles.
+
+        Args:
+            obstacles (array-like, optional): Obstacle positions with shape (K, 2). Defaults to three example obstacles.
+            use_index (bool): Whether to build an ObstacleGrid once for the map so each step only checks the
+                obstacles within SENSOR_RANGE. When False, every obstacle is scanned on each step.
+            use_heading_table (bool): Whether to look up the heading vectors of the orientations reachable with
+                TURN_RATE in a HeadingTable. When False, or when TURN_RATE does not divide 360, they are computed
+                directly.
         """
         self._action_spec = array_spec.BoundedArraySpec(
             shape=(), dtype=np.int32, minimum=self.ACTION_ACCELERATE, maximum=self.ACTION_MOVE_BACKWARD, name='action')
-        self._obstacles = [np.array([20, 20]), np.array([40, 40]), np.array([60, 60])]  # Example obstacles
+        if obstacles is None:
+            obstacles = [[20, 20], [40, 40], [60, 60]]  # Example obstacles
+        self._obstacles = np.asarray(obstacles).reshape(-1, 2)
+        self._obstacle_index = ObstacleGrid(self._obstacles, max(SENSOR_RANGE, COLLISION_DISTANCE)) if use_index else None
+        self._headings = HeadingTable(enabled=use_heading_table)
         num_obstacles = len(self._obstacles)
         self._observation_spec = array_spec.BoundedArraySpec(
             shape=(6 + num_obstacles * 3,), dtype=np.float32, minimum=BOUNDARY_MIN, maximum=BOUNDARY_MAX, name='observation')
@@ -99,11 +114,9 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
         elif action == self.ACTION_TURN_LEFT:
             self._state[2] = (self._state[2] - TURN_RATE) % 360  # Turn left
         elif action == self.ACTION_MOVE_FORWARD:
-            self._state[0] += self._state[3] * np.cos(np.deg2rad(self._state[2])) * SIMULATION_TIME_STEP  # Move forward
-            self._state[1] += self._state[3] * np.sin(np.deg2rad(self._state[2])) * SIMULATION_TIME_STEP  # Move forward
+            self._state[:2] += self._state[3] * self._headings.unit_vector(self._state[2]) * SIMULATION_TIME_STEP  # Move forward
         elif action == self.ACTION_MOVE_BACKWARD:
-            self._state[0] -= self._state[3] * np.cos(np.deg2rad(self._state[2])) * SIMULATION_TIME_STEP  # Move backward
-            self._state[1] -= self._state[3] * np.sin(np.deg2rad(self._state[2])) * SIMULATION_TIME_STEP  # Move backward
+            self._state[:2] -= self._state[3] * self._headings.unit_vector(self._state[2]) * SIMULATION_TIME_STEP  # Move backward
 
         # Ensure the orientation stays within 0 to 360 degrees
         self._state[2] = self._state[2] % 360
@@ -112,15 +125,7 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
         self._state[3] = np.clip(self._state[3], -MAX_SPEED, MAX_SPEED)
 
         # Update obstacle information in the state
-        for i, obstacle in enumerate(self._obstacles):
-            self._state[6 + i * 3] = obstacle[0]
-            self._state[7 + i * 3] = obstacle[1]
-            distance = np.linalg.norm(self._state[:2] - obstacle)
-            angle = np.arctan2(obstacle[1] - self._state[1], obstacle[0] - self._state[0]) - np.deg2rad(self._state[2])
-            if distance <= SENSOR_RANGE and np.abs(np.rad2deg(angle)) <= SENSOR_ANGLE / 2:
-                self._state[8 + i * 3] = distance
-            else:
-                self._state[8 + i * 3] = SENSOR_RANGE
+        collided = self._update_obstacles()
 
         # Check if the episode has ended
         if np.any(self._state[:2] < BOUNDARY_MIN + BOUNDARY_OFFSET) or np.any(self._state[:2] > BOUNDARY_MAX - BOUNDARY_OFFSET):
@@ -128,10 +133,9 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
             return ts.termination(self._get_observation(), reward=REWARD_COLLISION)
 
         # Check for collisions with obstacles
-        for obstacle in self._obstacles:
-            if np.linalg.norm(self._state[:2] - obstacle) < COLLISION_DISTANCE:
-                self._episode_ended = True
-                return ts.termination(self._get_observation(), reward=REWARD_COLLISION)
+        if collided:
+            self._episode_ended = True
+            return ts.termination(self._get_observation(), reward=REWARD_COLLISION)
 
         # Check if the goal is reached
         if np.linalg.norm(self._state[:2] - self._state[4:6]) < COLLISION_DISTANCE:
@@ -143,6 +147,41 @@ class BirdRobotEnvironment(py_environment.PyEnvironment):
         else:
             return ts.transition(self._get_observation(), reward=REWARD_STEP, discount=0.9)
 
+    def _update_obstacles(self):
+        """
+        Updates the sensed obstacle distances in the state.
+
+        With the obstacle index only the obstacles near the robot are checked and every other obstacle
+        reports SENSOR_RANGE; otherwise every obstacle is scanned.
+
+        Returns:
+            bool: Whether the robot collides with an obstacle.
+        """
+        if self._obstacle_index is not None:
+            self._state[8::3] = SENSOR_RANGE
+            candidates = self._obstacle_index.query(self._state[:2], max(SENSOR_RANGE, COLLISION_DISTANCE))
+            offset = self._obstacle_index.obstacles[candidates] - self._state[:2]
+            distance = np.linalg.norm(offset, axis=1)
+            visible = in_field_of_view(offset, distance, self._headings.unit_vector(self._state[2]))
+            self._state[8 + candidates[visible] * 3] = distance[visible]
+            return bool(np.any(distance < COLLISION_DISTANCE))
+
+        unit_vector = self._headings.unit_vector(self._state[2])
+        for i, obstacle in enumerate(self._obstacles):
+            self._state[6 + i * 3] = obstacle[0]
+            self._state[7 + i * 3] = obstacle[1]
+            offset = obstacle - self._state[:2]
+            distance = np.linalg.norm(offset)
+            if in_field_of_view(offset, distance, unit_vector):
+                self._state[8 + i * 3] = distance
+            else:
+                self._state[8 + i * 3] = SENSOR_RANGE
+
+        for obstacle in self._obstacles:
+            if np.linalg.norm(self._state[:2] - obstacle) < COLLISION_DISTANCE:
+                return True
+        return False
+
     def _get_observation(self):
         """
         Returns the current state of the environment.
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+from config.config import TURN_RATE, INITIAL_ORIENTATION, SENSOR_RANGE, SENSOR_ANGLE
+
+# Cosine of half the sensor field of view, compared against the cosine of the bearing of an obstacle
+COS_HALF_SENSOR_ANGLE = math.cos(math.radians(SENSOR_ANGLE / 2))
+
+
+class HeadingTable:
+    """
+    Precomputed unit heading vectors of the orientations a bird robot can take.
+
+    Robots start at INITIAL_ORIENTATION and turn by TURN_RATE degrees modulo 360, so when TURN_RATE divides 360
+    they only ever face 360 / TURN_RATE orientations. Their [cos, sin] vectors are computed once and looked up by
+    orientation, with a dictionary for one robot and by dividing by the turn rate for arrays of robots.
+    Orientations off that grid, or a turn rate that does not divide 360, fall back to computing the vectors
+    directly.
+
+    Attributes:
+        size (int): Number of tabulated orientations, 0 when the table is disabled.
+        orientations (np.ndarray): Tabulated orientations in degrees with shape (size,).
+    """
+
+    def __init__(self, turn_rate=TURN_RATE, initial_orientation=INITIAL_ORIENTATION, enabled=True):
+        """
+        Args:
+            turn_rate (float): Degrees turned per turn action.
+            initial_orientation (float): Orientation in degrees robots start from.
+            enabled (bool): Whether to use the table at all. When False, every vector is computed directly.
+        """
+        self.turn_rate = float(turn_rate)
+        self.initial_orientation = float(initial_orientation) % 360
+        num_orientations = 360 / self.turn_rate if self.turn_rate else 0.0
+        self.size = int(round(num_orientations)) if enabled and num_orientations >= 1 and num_orientations == round(num_orientations) else 0
+        self.orientations = (self.initial_orientation + np.arange(self.size) * self.turn_rate) % 360
+        heading = np.deg2rad(self.orientations)
+        self._vectors = np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+        self._vectors_by_orientation = {float(orientation): vector for orientation, vector in zip(self.orientations, self._vectors)}
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def unit_vector(self, orientation):
+        """
+        Args:
+            orientation (float): Orientation in degrees.
+
+        Returns:
+            np.ndarray: The unit heading vector [cos, sin] with shape (2,). Must not be modified.
+        """
+        vector = self._vectors_by_orientation.get(float(orientation))
+        if vector is not None:
+            return vector
+        heading = math.radians(orientation)
+        return np.array([math.cos(heading), math.sin(heading)])
+
+    def unit_vectors(self, orientations):
+        """
+        Args:
+            orientations (np.ndarray): Orientations in degrees with shape (N,).
+
+        Returns:
+            np.ndarray: The unit heading vectors with shape (N, 2).
+        """
+        if self.size:
+            # Exact for orientations on the grid, which lie in [0, 360) and so map to rows in (-size, size)
+            steps = (orientations - self.initial_orientation) / self.turn_rate
+            rows = steps.astype(np.intp)
+            if (rows == steps).all():
+                return np.take(self._vectors, rows, axis=0)
+        heading = np.deg2rad(np.asarray(orientations, dtype=np.float64))
+        return np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+
+
+def in_field_of_view(offset, distance, unit_vector):
+    """
+    Tests which obstacles the sensors see, without trigonometry.
+
+    An obstacle is visible when it lies within SENSOR_RANGE and its bearing is within SENSOR_ANGLE / 2 of the
+    heading, i.e. when the dot product of its offset with the unit heading vector is at least
+    distance * cos(SENSOR_ANGLE / 2).
+
+    Args:
+        offset (np.ndarray): Obstacle positions relative to the robot with shape (..., 2).
+        distance (np.ndarray): Lengths of the offsets with shape (...).
+        unit_vector (np.ndarray): Unit heading vectors broadcastable against `offset`.
+
+    Returns:
+        np.ndarray: Boolean mask with shape (...).
+    """
+    facing = offset[..., 0] * unit_vector[..., 0]
+    facing += offset[..., 1] * unit_vector[..., 1]
+    return (distance <= SENSOR_RANGE) & (facing >= distance * COS_HALF_SENSOR_ANGLE)
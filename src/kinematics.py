@@ -0,0 +1,155 @@
+import math
+
+import numpy as np
+from config.config import MAX_SPEED, ACCELERATION, TURN_RATE, SIMULATION_TIME_STEP
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Without Numba, smaller batches run faster through the plain Python loop than through masked array operations
+MAX_LOOP_ROBOTS = 8
+
+# Columns of a command array, in the order they are applied within one step
+COMMANDS = ('accelerate', 'decelerate', 'turn_right', 'turn_left', 'move_forward', 'move_backward')
+ACCELERATE, DECELERATE, TURN_RIGHT, TURN_LEFT, MOVE_FORWARD, MOVE_BACKWARD = range(len(COMMANDS))
+
+
+def commands_from_dicts(control_commands):
+    """
+    Converts control command dictionaries, as taken by BirdRobotMovement.update_position, to a command array.
+
+    Args:
+        control_commands (list of dict): One dictionary per robot with keys from COMMANDS.
+
+    Returns:
+        np.ndarray: Boolean commands with shape (N, len(COMMANDS)).
+    """
+    return np.array([[bool(command.get(name)) for name in COMMANDS] for command in control_commands], dtype=bool).reshape(-1, len(COMMANDS))
+
+
+def commands_from_actions(actions):
+    """
+    Converts discrete BirdRobotEnvironment actions to a command array with one command per robot.
+
+    Args:
+        actions (array-like): Integer actions with shape (N,), numbered like the ACTION_* constants of BirdRobotEnvironment.
+
+    Returns:
+        np.ndarray: Boolean commands with shape (N, len(COMMANDS)).
+    """
+    return np.eye(len(COMMANDS), dtype=bool)[np.asarray(actions, dtype=np.int64).reshape(-1)]
+
+
+def _integrate_arrays(position, orientation, velocity, commands):
+    """
+    NumPy implementation of `integrate`: one masked array operation per command.
+    """
+    accelerate, decelerate, turn_right, turn_left, move_forward, move_backward = commands.T
+    np.add(velocity, ACCELERATION, out=velocity, where=accelerate)
+    np.clip(velocity, -MAX_SPEED, MAX_SPEED, out=velocity, where=accelerate)
+    np.subtract(velocity, ACCELERATION, out=velocity, where=decelerate)
+    np.clip(velocity, -MAX_SPEED, MAX_SPEED, out=velocity, where=decelerate)
+    np.mod(orientation + TURN_RATE, 360, out=orientation, where=turn_right)
+    np.mod(orientation - TURN_RATE, 360, out=orientation, where=turn_left)
+    if move_forward.any() or move_backward.any():
+        heading = np.deg2rad(orientation)
+        delta_x = velocity * np.cos(heading) * SIMULATION_TIME_STEP
+        delta_y = velocity * np.sin(heading) * SIMULATION_TIME_STEP
+        for sign, mask in ((1, move_forward), (-1, move_backward)):
+            if mask.any():
+                np.add(position[:, 0], sign * delta_x, out=position[:, 0], where=mask)
+                np.add(position[:, 1], sign * delta_y, out=position[:, 1], where=mask)
+
+
+def _integrate_loop(position, orientation, velocity, commands):
+    """
+    Loop implementation of `integrate`, compiled with Numba when it is installed.
+    """
+    for i in range(velocity.shape[0]):
+        if commands[i, 0]:
+            velocity[i] = min(max(velocity[i] + ACCELERATION, -MAX_SPEED), MAX_SPEED)
+        if commands[i, 1]:
+            velocity[i] = min(max(velocity[i] - ACCELERATION, -MAX_SPEED), MAX_SPEED)
+        if commands[i, 2]:
+            orientation[i] = (orientation[i] + TURN_RATE) % 360
+        if commands[i, 3]:
+            orientation[i] = (orientation[i] - TURN_RATE) % 360
+        if commands[i, 4] or commands[i, 5]:
+            heading = math.radians(orientation[i])
+            delta_x = velocity[i] * math.cos(heading) * SIMULATION_TIME_STEP
+            delta_y = velocity[i] * math.sin(heading) * SIMULATION_TIME_STEP
+            if commands[i, 4]:
+                position[i, 0] += delta_x
+                position[i, 1] += delta_y
+            if commands[i, 5]:
+                position[i, 0] -= delta_x
+                position[i, 1] -= delta_y
+
+
+_integrate_compiled = numba.njit(cache=True, nogil=True)(_integrate_loop) if numba is not None else None
+
+
+def integrate(position, orientation, velocity, commands, use_numba=None):
+    """
+    Advances N robots by one control step, in place.
+
+    Commands are applied in the order of COMMANDS, like BirdRobotMovement.update_position: velocity changes by
+    ACCELERATION and is clipped to MAX_SPEED, orientation turns by TURN_RATE degrees modulo 360, and moving
+    integrates the position over SIMULATION_TIME_STEP along the current heading.
+
+    Args:
+        position (np.ndarray): Positions with shape (N, 2).
+        orientation (np.ndarray): Orientations in degrees with shape (N,).
+        velocity (np.ndarray): Velocities with shape (N,).
+        commands (np.ndarray): Boolean commands with shape (N, len(COMMANDS)).
+        use_numba (bool, optional): Whether to run the Numba-compiled kernel. Defaults to whether Numba is installed.
+            Without it, batches of fewer than MAX_LOOP_ROBOTS robots, e.g. the views of BirdRobotMovement and
+            BirdRobotControl, run the same loop in plain Python and larger ones run as masked array operations.
+    """
+    if use_numba is None:
+        use_numba = _integrate_compiled is not None
+    if use_numba:
+        if _integrate_compiled is None:
+            raise ImportError("use_numba requires numba, install it with `pip install numba`")
+        _integrate_compiled(position, orientation, velocity, commands)
+    elif len(velocity) < MAX_LOOP_ROBOTS:
+        _integrate_loop(position, orientation, velocity, commands)
+    else:
+        _integrate_arrays(position, orientation, velocity, commands)
+
+
+class KinematicsState:
+    """
+    Velocity, orientation and position of N robots, stored as arrays.
+
+    Attributes:
+        position (np.ndarray): Positions with shape (N, 2).
+        orientation (np.ndarray): Orientations in degrees with shape (N,).
+        velocity (np.ndarray): Velocities with shape (N,).
+    """
+
+    def __init__(self, num_robots, use_numba=None):
+        """
+        Args:
+            num_robots (int): Number of robots.
+            use_numba (bool, optional): Passed on to `integrate`.
+        """
+        self.position = np.zeros((num_robots, 2))
+        self.orientation = np.zeros(num_robots)
+        self.velocity = np.zeros(num_robots)
+        self.use_numba = use_numba
+
+    def __len__(self):
+        return len(self.velocity)
+
+    def step(self, commands, robots=slice(None)):
+        """
+        Advances robots by one control step.
+
+        Args:
+            commands (np.ndarray): Boolean commands with shape (M, len(COMMANDS)) for the M selected robots.
+            robots (slice): The robots to advance. Defaults to every robot.
+        """
+        integrate(self.position[robots], self.orientation[robots], self.velocity[robots], commands, self.use_numba)
@@ -1,17 +1,49 @@
-import numpy as np
-from config import MAX_SPEED, ACCELERATION, TURN_RATE, SIMULATION_TIME_STEP
+from src.kinematics import KinematicsState, commands_from_dicts
+
 
 class BirdRobotMovement:
     """
     Movement system for the 2D bird robot.
 
     This class provides methods to update the bird robot's position and orientation based on control commands.
+    It is a view of one robot of a KinematicsState, so many robots can share one state and be advanced together
+    with KinematicsState.step.
     """
 
-    def __init__(self):
-        self.position = np.array([0.0, 0.0])
-        self.orientation = 0.0
-        self.velocity = 0.0
+    def __init__(self, state=None, index=0):
+        """
+        Args:
+            state (KinematicsState, optional): State that holds the robot. Defaults to a new state of one robot.
+            index (int): Index of the robot in `state`.
+        """
+        self.state = state if state is not None else KinematicsState(1)
+        self.index = index
+        self._robot = slice(index, index + 1)
+
+    @property
+    def position(self):
+        """np.ndarray: The position of the bird robot [x, y], a view into the state."""
+        return self.state.position[self.index]
+
+    @position.setter
+    def position(self, position):
+        self.state.position[self.index] = position
+
+    @property
+    def orientation(self):
+        return float(self.state.orientation[self.index])
+
+    @orientation.setter
+    def orientation(self, orientation):
+        self.state.orientation[self.index] = orientation
+
+    @property
+    def velocity(self):
+        return float(self.state.velocity[self.index])
+
+    @velocity.setter
+    def velocity(self, velocity):
+        self.state.velocity[self.index] = velocity
 
     def update_position(self, control_command):
         """
@@ -23,19 +55,5 @@ class BirdRobotMovement:
         Returns:
             np.ndarray: The new position of the bird robot [x, y].
         """
-        if control_command.get('accelerate'):
-            self.velocity = np.clip(self.velocity + ACCELERATION, -MAX_SPEED, MAX_SPEED)
-        if control_command.get('decelerate'):
-            self.velocity = np.clip(self.velocity - ACCELERATION, -MAX_SPEED, MAX_SPEED)
-        if control_command.get('turn_right'):
-            self.orientation = (self.orientation + TURN_RATE) % 360
-        if control_command.get('turn_left'):
-            self.orientation = (self.orientation - TURN_RATE) % 360
-        if control_command.get('move_forward'):
-            self.position[0] += self.velocity * np.cos(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-            self.position[1] += self.velocity * np.sin(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-        if control_command.get('move_backward'):
-            self.position[0] -= self.velocity * np.cos(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-            self.position[1] -= self.velocity * np.sin(np.deg2rad(self.orientation)) * SIMULATION_TIME_STEP
-
+        self.state.step(commands_from_dicts([control_command]), self._robot)
         return self.position
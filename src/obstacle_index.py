@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+
+
+class ObstacleGrid:
+    """
+    Uniform grid index over static obstacle positions.
+
+    Obstacles are bucketed once per map into square cells and stored in cell order, so a range query only
+    touches the cells that overlap the query radius instead of scanning every obstacle. Queries return
+    candidates; callers still apply the exact distance test to them.
+
+    Attributes:
+        obstacles (np.ndarray): Obstacle positions with shape (K, 2).
+        cell_size (float): Side length of a grid cell.
+    """
+
+    def __init__(self, obstacles, cell_size):
+        """
+        Builds the grid index.
+
+        Args:
+            obstacles (array-like): Obstacle positions with shape (K, 2).
+            cell_size (float): Side length of a grid cell. Using the largest query radius (e.g. SENSOR_RANGE)
+                keeps every query within the 3x3 block of cells around the query position.
+        """
+        if cell_size <= 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+        self.obstacles = np.asarray(obstacles, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        if len(self.obstacles) == 0:
+            self._origin = np.zeros(2)
+            self._shape = np.array([1, 1])
+        else:
+            self._origin = self.obstacles.min(axis=0)
+            self._shape = self._cell_of(self.obstacles).max(axis=0) + 1
+        cells = self._cell_of(self.obstacles)
+        flat_cells = cells[:, 0] * self._shape[1] + cells[:, 1]
+        # Obstacle indices sorted by cell, with cell c occupying _order[_starts[c]:_starts[c + 1]]
+        self._order = np.argsort(flat_cells, kind='stable')
+        counts = np.bincount(flat_cells, minlength=int(np.prod(self._shape)))
+        self._starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def _cell_of(self, positions):
+        return np.floor((positions - self._origin) / self.cell_size).astype(np.int64)
+
+    def query_pairs(self, positions, radius):
+        """
+        Finds candidate obstacles near each of several query positions.
+
+        Args:
+            positions (np.ndarray): Query positions with shape (N, 2).
+            radius (float): Query radius.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Flat arrays (query_index, obstacle_index) listing every obstacle
+            stored in a cell within `radius` of each query position. Every obstacle within `radius` is included.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        reach = int(np.ceil(radius / self.cell_size))
+        cells = self._cell_of(positions)
+        # Cells of one grid column are contiguous in _order, so each column overlapping the query is one run
+        column = cells[:, 0, np.newaxis] + np.arange(-reach, reach + 1)
+        low = np.maximum(cells[:, 1] - reach, 0)[:, np.newaxis]
+        high = np.minimum(cells[:, 1] + reach, self._shape[1] - 1)[:, np.newaxis]
+        valid = (column >= 0) & (column < self._shape[0]) & (low <= high)
+        column = np.where(valid, column, 0)
+        run_starts = self._starts[column * self._shape[1] + np.where(valid, low, 0)]
+        run_ends = self._starts[column * self._shape[1] + np.where(valid, high + 1, 0)]
+        counts = np.where(valid, run_ends - run_starts, 0).ravel()
+        run_starts = run_starts.ravel()
+
+        query_index = np.repeat(np.arange(len(positions)), column.shape[1])
+        query_index = np.repeat(query_index, counts)
+        # Position of every candidate inside its run, offset by the run's start in _order
+        run_offsets = np.cumsum(counts) - counts
+        slots = np.arange(counts.sum()) - np.repeat(run_offsets - run_starts, counts)
+        return query_index, self._order[slots]
+
+    def query(self, position, radius):
+        """
+        Finds candidate obstacles near a single position.
+
+        Uses plain Python arithmetic for the cell lookup, which is cheaper than query_pairs for one position.
+
+        Args:
+            position (np.ndarray): Query position [x, y].
+            radius (float): Query radius.
+
+        Returns:
+            np.ndarray: Indices of obstacles stored in cells within `radius` of the position.
+        """
+        reach = math.ceil(radius / self.cell_size)
+        num_columns, num_rows = int(self._shape[0]), int(self._shape[1])
+        cell_x = math.floor((float(position[0]) - self._origin[0]) / self.cell_size)
+        cell_y = math.floor((float(position[1]) - self._origin[1]) / self.cell_size)
+        low, high = max(cell_y - reach, 0), min(cell_y + reach, num_rows - 1)
+        runs = [
+            self._order[self._starts[x * num_rows + low]:self._starts[x * num_rows + high + 1]]
+            for x in range(max(cell_x - reach, 0), min(cell_x + reach, num_columns - 1) + 1)
+        ] if low <= high else []
+        if not runs:
+            return self._order[:0]
+        return runs[0] if len(runs) == 1 else np.concatenate(runs)
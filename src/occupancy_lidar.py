@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+from config.config import SENSOR_RANGE, SENSOR_ANGLE, COLLISION_DISTANCE, BOUNDARY_MIN, BOUNDARY_MAX
+from src.heading import HeadingTable
+
+
+def rasterize_obstacles(obstacles, cell_size, radius=COLLISION_DISTANCE, bounds=(BOUNDARY_MIN, BOUNDARY_MAX)):
+    """
+    Rasterizes obstacles into an occupancy grid over the square [bounds[0], bounds[1]].
+
+    Every obstacle is a disc of `radius` around its position and marks each cell the disc overlaps. The grid is
+    surrounded by a border of occupied cells, so the boundaries act as walls.
+
+    Args:
+        obstacles (array-like): Obstacle positions with shape (K, 2).
+        cell_size (float): Side length of a grid cell.
+        radius (float): Radius of the obstacles. COLLISION_DISTANCE by default, the distance a robot collides at.
+        bounds (Tuple[float, float]): Lower and upper boundary of both coordinates.
+
+    Returns:
+        np.ndarray: Boolean occupancy with shape (M + 2, M + 2) for M = ceil((bounds[1] - bounds[0]) / cell_size)
+        cells per side, indexed [x, y], whose cell (i, j) spans bounds[0] + (i - 1, j - 1) * cell_size.
+    """
+    if cell_size <= 0:
+        raise ValueError(f"cell_size must be positive, got {cell_size}")
+    lower = float(bounds[0])
+    num_cells = int(math.ceil((bounds[1] - lower) / cell_size))
+    occupancy = np.ones((num_cells + 2, num_cells + 2), dtype=bool)
+    occupancy[1:-1, 1:-1] = False
+
+    obstacles = np.asarray(obstacles, dtype=np.float64).reshape(-1, 2)
+    # Every cell within `reach` cells of the cell of an obstacle is a candidate
+    reach = int(math.ceil(radius / cell_size))
+    stencil = np.stack(np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing='ij'), axis=-1).reshape(-1, 2)
+    cells = np.floor((obstacles - lower) / cell_size).astype(np.int64)[:, np.newaxis, :] + stencil  # (K, S, 2)
+    cell_min = lower + cells * cell_size
+    nearest = np.clip(obstacles[:, np.newaxis, :], cell_min, cell_min + cell_size)
+    overlaps = np.sum((nearest - obstacles[:, np.newaxis, :]) ** 2, axis=-1) <= radius ** 2
+    overlaps &= np.all((cells >= 0) & (cells < num_cells), axis=-1)
+    occupancy[cells[overlaps, 0] + 1, cells[overlaps, 1] + 1] = True
+    return occupancy
+
+
+class OccupancyLidar:
+    """
+    Multi-beam range sensor that ray-marches an occupancy grid.
+
+    Obstacles are rasterized once per map by `rasterize_obstacles`. Each robot casts `num_beams` beams spread
+    evenly across SENSOR_ANGLE around its heading, and every beam of every robot is marched through the grid at
+    once with a vectorized DDA traversal (Amanatides and Woo), one cell boundary per iteration, until it enters an
+    occupied cell, leaves `max_range` or hits a wall. A beam's range is the distance at which it enters the
+    occupied cell: never more than the distance to the obstacle discs, and never less than the distance to the
+    discs grown by one cell diagonal. Beams that hit nothing report `max_range`.
+
+    Attributes:
+        occupancy (np.ndarray): Occupancy grid with a border of walls, see `rasterize_obstacles`.
+        cell_size (float): Side length of a grid cell.
+        max_range (float): Range of the beams.
+        beam_angles (np.ndarray): Beam directions relative to the heading in degrees with shape (num_beams,).
+    """
+
+    def __init__(self, obstacles, num_beams=16, cell_size=1.0, max_range=SENSOR_RANGE, field_of_view=SENSOR_ANGLE,
+                 obstacle_radius=COLLISION_DISTANCE, bounds=(BOUNDARY_MIN, BOUNDARY_MAX), headings=None):
+        """
+        Args:
+            obstacles (array-like): Obstacle positions with shape (K, 2).
+            num_beams (int): Number of beams per robot.
+            cell_size (float): Side length of a grid cell.
+            max_range (float): Range of the beams.
+            field_of_view (float): Angle in degrees the beams are spread across.
+            obstacle_radius (float): Radius of the obstacles.
+            bounds (Tuple[float, float]): Lower and upper boundary of both coordinates.
+            headings (HeadingTable, optional): Lookup of the heading vectors. Defaults to a new HeadingTable.
+        """
+        if num_beams < 1:
+            raise ValueError(f"num_beams must be at least 1, got {num_beams}")
+        self.occupancy = rasterize_obstacles(obstacles, cell_size, obstacle_radius, bounds)
+        self.cell_size = float(cell_size)
+        self.max_range = float(max_range)
+        self.beam_angles = np.linspace(-field_of_view / 2, field_of_view / 2, num_beams) if num_beams > 1 else np.zeros(1)
+        beam_angles = np.deg2rad(self.beam_angles)
+        self._beam_cos, self._beam_sin = np.cos(beam_angles), np.sin(beam_angles)
+        self._headings = headings if headings is not None else HeadingTable()
+        # Grid coordinates are measured from the outer corner of the wall border
+        self._origin = float(bounds[0]) - self.cell_size
+        self._flat_occupancy = self.occupancy.ravel()
+        self._height = self.occupancy.shape[1]
+
+    @property
+    def num_beams(self):
+        return len(self.beam_angles)
+
+    def scan(self, positions, orientations):
+        """
+        Casts the beams of N robots.
+
+        Args:
+            positions (np.ndarray): Robot positions with shape (N, 2).
+            orientations (np.ndarray): Robot orientations in degrees with shape (N,).
+
+        Returns:
+            np.ndarray: Ranges with shape (N, num_beams), ordered from the rightmost to the leftmost beam.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        heading = self._headings.unit_vectors(np.asarray(orientations).reshape(-1))
+        # Rotating the beam offsets by the heading vectors, without trigonometry
+        cos, sin = heading[:, 0:1], heading[:, 1:2]
+        direction_x = cos * self._beam_cos - sin * self._beam_sin
+        direction_y = sin * self._beam_cos + cos * self._beam_sin
+        origin_x = np.repeat(positions[:, 0], self.num_beams)
+        origin_y = np.repeat(positions[:, 1], self.num_beams)
+        ranges = self.cast(origin_x, origin_y, direction_x.ravel(), direction_y.ravel())
+        return ranges.reshape(len(positions), self.num_beams)
+
+    def cast(self, origin_x, origin_y, direction_x, direction_y):
+        """
+        Marches rays through the occupancy grid.
+
+        Args:
+            origin_x, origin_y (np.ndarray): Ray origins with shape (R,).
+            direction_x, direction_y (np.ndarray): Unit ray directions with shape (R,).
+
+        Returns:
+            np.ndarray: Distance to the first occupied cell along every ray, at most `max_range`, with shape (R,).
+        """
+        ranges = np.full(len(origin_x), self.max_range)
+        max_t = self.max_range / self.cell_size
+        # Everything below is in units of cells, along directions of unit length
+        grid_x = (np.asarray(origin_x, dtype=np.float64) - self._origin) / self.cell_size
+        grid_y = (np.asarray(origin_y, dtype=np.float64) - self._origin) / self.cell_size
+        last = self._height - 1
+        cell_x = np.clip(np.floor(grid_x), 0, last).astype(np.intp)
+        cell_y = np.clip(np.floor(grid_y), 0, last).astype(np.intp)
+        step_x, t_delta_x, t_max_x = self._axis_setup(grid_x, cell_x, np.asarray(direction_x, dtype=np.float64))
+        step_y, t_delta_y, t_max_y = self._axis_setup(grid_y, cell_y, np.asarray(direction_y, dtype=np.float64))
+        t = np.zeros(len(origin_x))
+        rays = np.arange(len(origin_x))
+
+        # Rays are dropped from the arrays once a quarter of them are finished, and held in place until then
+        finished = np.zeros(len(rays), dtype=bool)
+        while len(rays):
+            occupied = self._flat_occupancy[cell_x * self._height + cell_y]
+            hit = occupied & (t < max_t) & ~finished
+            if hit.any():
+                ranges[rays[hit]] = t[hit] * self.cell_size
+            finished |= occupied | (t >= max_t)
+            if 4 * np.count_nonzero(finished) >= len(rays):
+                keep = ~finished
+                rays, t, cell_x, cell_y = rays[keep], t[keep], cell_x[keep], cell_y[keep]
+                step_x, t_delta_x, t_max_x = step_x[keep], t_delta_x[keep], t_max_x[keep]
+                step_y, t_delta_y, t_max_y = step_y[keep], t_delta_y[keep], t_max_y[keep]
+                finished = finished[keep]
+            # Cross whichever cell boundary comes first
+            cross_x = t_max_x < t_max_y
+            cross_y = ~cross_x
+            cross_x &= ~finished
+            cross_y &= ~finished
+            np.minimum(t_max_x, t_max_y, out=t)
+            np.add(cell_x, step_x, out=cell_x, where=cross_x)
+            np.add(cell_y, step_y, out=cell_y, where=cross_y)
+            np.add(t_max_x, t_delta_x, out=t_max_x, where=cross_x)
+            np.add(t_max_y, t_delta_y, out=t_max_y, where=cross_y)
+        return ranges
+
+    @staticmethod
+    def _axis_setup(grid, cell, direction):
+        """
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Cell step along the axis, distance between two crossings of
+            the axis and distance to the first crossing. Rays parallel to the axis never cross it.
+        """
+        step = np.where(direction > 0, 1, -1).astype(np.intp)
+        to_boundary = np.where(direction > 0, cell + 1 - grid, grid - cell)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_delta = np.abs(1.0 / direction)
+            t_max = np.where(direction == 0, np.inf, to_boundary * t_delta)
+        return step, t_delta, t_max
@@ -1,15 +1,40 @@
 import numpy as np
-from config import SENSOR_RANGE, SENSOR_ANGLE
+from config.config import SENSOR_RANGE
+from src.heading import HeadingTable, in_field_of_view
+from src.obstacle_index import ObstacleGrid
+from src.occupancy_lidar import OccupancyLidar
 
 class BirdRobotSensors:
     """
     Sensor system for the 2D bird robot.
 
     This class provides methods to simulate sensor input, such as detecting obstacles and the bird robot's current state relative to the environment.
+
+    In the default "points" mode obstacles are points, sensed at their center distance when they lie inside the
+    sensor cone. In "lidar" mode the sensor is a multi-beam rangefinder: obstacles are discs rasterized into an
+    occupancy grid with walls at the boundaries, and `num_beams` beams across the sensor cone report the range to
+    the first occupied cell (see OccupancyLidar).
     """
 
-    def __init__(self, obstacles):
+    def __init__(self, obstacles, use_index=True, use_heading_table=True, mode="points", num_beams=16, cell_size=1.0):
+        """
+        Args:
+            obstacles (List[np.ndarray]): Obstacle positions [x, y].
+            use_index (bool): Whether to build an ObstacleGrid so that only obstacles within SENSOR_RANGE are
+                checked. When False, every obstacle is scanned on each call.
+            use_heading_table (bool): Whether to look up the heading vectors of the orientations reachable with
+                TURN_RATE in a HeadingTable instead of computing them.
+            mode (str): "points" or "lidar".
+            num_beams (int): Number of beams in "lidar" mode.
+            cell_size (float): Side length of the occupancy grid cells in "lidar" mode.
+        """
+        if mode not in ("points", "lidar"):
+            raise ValueError(f"mode must be 'points' or 'lidar', got {mode!r}")
         self.obstacles = obstacles
+        self.mode = mode
+        self.obstacle_index = ObstacleGrid(obstacles, SENSOR_RANGE) if use_index and mode == "points" else None
+        self.headings = HeadingTable(enabled=use_heading_table)
+        self.lidar = OccupancyLidar(obstacles, num_beams, cell_size, headings=self.headings) if mode == "lidar" else None
 
     def detect_obstacles(self, position, orientation):
         """
@@ -21,17 +46,35 @@ class BirdRobotSensors:
 
         Returns:
             List[float]: A list of distances to detected obstacles. If an obstacle is not detected, the distance is set to SENSOR_RANGE.
+            In "lidar" mode, the range of every beam instead.
         """
+        if self.lidar is not None:
+            return self.lidar.scan(position, [orientation])[0].tolist()
+        if self.obstacle_index is not None:
+            return self._detect_obstacles_indexed(position, orientation)
+        unit_vector = self.headings.unit_vector(orientation)
         distances = []
         for obstacle in self.obstacles:
-            distance = np.linalg.norm(position - obstacle)
-            angle = np.arctan2(obstacle[1] - position[1], obstacle[0] - position[0]) - np.deg2rad(orientation)
-            if distance <= SENSOR_RANGE and np.abs(np.rad2deg(angle)) <= SENSOR_ANGLE / 2:
+            offset = obstacle - position
+            distance = np.linalg.norm(offset)
+            if in_field_of_view(offset, distance, unit_vector):
                 distances.append(distance)
             else:
                 distances.append(SENSOR_RANGE)
         return distances
 
+    def _detect_obstacles_indexed(self, position, orientation):
+        """
+        Same as detect_obstacles, but only checks the obstacles the grid index reports within SENSOR_RANGE.
+        """
+        distances = np.full(len(self.obstacle_index), SENSOR_RANGE)
+        candidates = self.obstacle_index.query(position, SENSOR_RANGE)
+        offset = self.obstacle_index.obstacles[candidates] - position
+        distance = np.linalg.norm(offset, axis=1)
+        visible = in_field_of_view(offset, distance, self.headings.unit_vector(orientation))
+        distances[candidates[visible]] = distance[visible]
+        return distances.tolist()
+
     def get_state(self, position, orientation):
         """
         Returns the current state of the bird robot, including its position, orientation, and detected obstacles.
@@ -46,3 +89,18 @@ class BirdRobotSensors:
         distances = self.detect_obstacles(position, orientation)
         state = np.concatenate(([position[0], position[1], orientation], distances))
         return state
+
+    def scan(self, positions, orientations):
+        """
+        Casts the lidar beams of many bird robots at once. Requires "lidar" mode.
+
+        Args:
+            positions (np.ndarray): Positions of the bird robots with shape (N, 2).
+            orientations (np.ndarray): Orientations of the bird robots in degrees with shape (N,).
+
+        Returns:
+            np.ndarray: Beam ranges with shape (N, num_beams).
+        """
+        if self.lidar is None:
+            raise ValueError(f"scan requires mode='lidar', the sensors are in mode {self.mode!r}")
+        return self.lidar.scan(positions, orientations)
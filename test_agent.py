@@ -3,8 +3,9 @@ import numpy as np
 from tf_agents.environments import tf_py_environment
 from tf_agents.policies import policy_saver, SavedModelPyTFEagerPolicy
 from tf_agents.trajectories import time_step as ts
-from src.environment import BirdRobotEnvironment
+from src.batched_environment import BatchedBirdRobotEnvironment
 from config.config import POLICY_DIR
+from agents.evaluation import evaluate_episodes
 
 def load_policy(policy_dir, time_step_spec, action_spec):
     """
@@ -35,28 +36,22 @@ def evaluate_policy(policy, environment, num_episodes=10):
     """
     Evaluate the policy by running it through a series of episodes in the environment.
 
+    The episodes are played at the same time on the batched environment, one per robot of the batch.
+
     Args:
         policy: The trained policy to be evaluated.
-        environment: The environment in which to evaluate the policy.
+        environment: The batched environment in which to evaluate the policy.
         num_episodes (int): The number of episodes to run for evaluation.
 
     Returns:
-        List[float]: A list of total rewards for each episode.
+        Tuple[np.ndarray, np.ndarray]: The total reward and the length of each episode.
     """
-    total_rewards = []
-    for _ in range(num_episodes):
-        time_step = environment.reset()
-        episode_reward = 0
-        while not time_step.is_last():
-            action_step = policy.action(time_step)
-            time_step = environment.step(action_step.action)
-            episode_reward += time_step.reward
-        total_rewards.append(episode_reward.numpy())
-    return total_rewards
+    return evaluate_episodes(environment, policy, num_episodes)
 
 def main():
-    # Create the environment
-    env = BirdRobotEnvironment()
+    # Create the environment, with one robot per evaluation episode
+    num_episodes = 10
+    env = BatchedBirdRobotEnvironment(num_episodes)
     tf_env = tf_py_environment.TFPyEnvironment(env)
 
     # Load the trained policy
@@ -66,8 +61,9 @@ def main():
         return
 
     # Evaluate the policy
-    rewards = evaluate_policy(policy, tf_env)
+    rewards, lengths = evaluate_policy(policy, tf_env, num_episodes)
     print(f"Total rewards for each episode: {rewards}")
+    print(f"Episode lengths: {lengths}")
     print(f"Average reward: {np.mean(rewards)}")
 
 
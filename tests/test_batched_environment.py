@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+from tf_agents.trajectories import time_step as ts
+
+from src.environment import BirdRobotEnvironment
+from src.batched_environment import BatchedBirdRobotEnvironment
+
+
+class TestBatchedBirdRobotEnvironment(unittest.TestCase):
+    def setUp(self):
+        self.batch_size = 4
+        self.env = BatchedBirdRobotEnvironment(self.batch_size)
+
+    def test_reset(self):
+        time_step = self.env.reset()
+        self.assertTrue(self.env.batched)
+        self.assertEqual(time_step.observation.shape, (self.batch_size, 15))
+        self.assertTrue(np.all(time_step.step_type == ts.StepType.FIRST))
+
+    def test_matches_single_environment(self):
+        rng = np.random.default_rng(0)
+        envs = [BirdRobotEnvironment() for _ in range(self.batch_size)]
+        self.env.reset()
+        for env in envs:
+            env.reset()
+        for _ in range(500):
+            action = rng.integers(0, 6, self.batch_size).astype(np.int32)
+            batched_step = self.env.step(action)
+            for i, env in enumerate(envs):
+                time_step = env.step(action[i])
+                self.assertEqual(time_step.step_type, batched_step.step_type[i])
+                self.assertEqual(time_step.reward, batched_step.reward[i])
+                np.testing.assert_allclose(time_step.observation, batched_step.observation[i], atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
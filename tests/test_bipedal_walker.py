@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from environments.bipedal_walker import PHYSICS_PROFILES, BipedalWalkerV2, PhysicsProfile, TerrainCache
+
+
+class TestBipedalWalkerLidar(unittest.TestCase):
+    def run_episode(self, lidar_mode, hardcore, actions):
+        env = BipedalWalkerV2(hardcore=hardcore, terrain_cache=False, lidar_mode=lidar_mode)
+        observations = [env.reset(seed=0)[0]]
+        for action in actions:
+            observation, _, terminated, truncated, _ = env.step(action)
+            observations.append(observation)
+            if terminated or truncated:
+                break
+        env.close()
+        return np.array(observations)
+
+    def test_vectorized_matches_box2d(self):
+        actions = np.random.default_rng(0).uniform(-1, 1, size=(300, 4))
+        for hardcore in (False, True):
+            box2d = self.run_episode("box2d", hardcore, actions)
+            vectorized = self.run_episode("vectorized", hardcore, actions)
+            self.assertEqual(box2d.shape, vectorized.shape)
+            np.testing.assert_array_equal(box2d[:, :14], vectorized[:, :14])
+            np.testing.assert_allclose(box2d[:, 14:], vectorized[:, 14:], atol=1e-5)
+
+    def test_invalid_lidar_mode(self):
+        with self.assertRaises(ValueError):
+            BipedalWalkerV2(lidar_mode="raymarch")
+
+
+class TestBipedalWalkerPhysics(unittest.TestCase):
+    def test_headless_matches_rendered(self):
+        actions = np.random.default_rng(0).uniform(-1, 1, size=(100, 4))
+        observations = []
+        for render_mode in (None, "rgb_array"):
+            env = BipedalWalkerV2(render_mode=render_mode, terrain_cache=False)
+            observations.append([env.reset(seed=3)[0]] + [env.step(action)[0] for action in actions])
+        np.testing.assert_array_equal(observations[0], observations[1])
+
+    def test_physics_profiles(self):
+        for physics in PHYSICS_PROFILES:
+            env = BipedalWalkerV2(physics=physics)
+            env.reset(seed=0)
+            observation = env.step(np.zeros(4))[0]
+            self.assertEqual(observation.shape, (24,))
+        with self.assertRaises(ValueError):
+            BipedalWalkerV2(physics="instant")
+        with self.assertRaises(ValueError):
+            BipedalWalkerV2(physics=PhysicsProfile(8, 3, 0))
+
+    def test_action_repeat_matches_repeated_steps(self):
+        repeated = BipedalWalkerV2(action_repeat=4)
+        single = BipedalWalkerV2()
+        np.testing.assert_array_equal(repeated.reset(seed=1)[0], single.reset(seed=1)[0])
+        for action in np.random.default_rng(1).uniform(-1, 1, size=(50, 4)):
+            observation, reward, terminated, _, _ = repeated.step(action)
+            total_reward = 0.0
+            for _ in range(4):
+                single_observation, single_reward, single_terminated, _, _ = single.step(action)
+                total_reward += single_reward
+                if single_terminated:
+                    break
+            np.testing.assert_array_equal(observation, single_observation)
+            self.assertEqual(terminated, single_terminated)
+            self.assertAlmostEqual(reward, total_reward)
+            if terminated:
+                break
+        # The last step ends in a fall, after the ticks before it were rewarded as usual
+        self.assertTrue(terminated)
+        self.assertNotEqual(reward, -100)
+
+
+class TestTerrainCache(unittest.TestCase):
+    def terrain(self, env):
+        """Returns the ground profile and the vertices of every static terrain fixture."""
+        vertices = [tuple(fixture.shape.vertices) for body in env.terrain for fixture in body.fixtures]
+        return env.terrain_x, env.terrain_y, vertices
+
+    def test_cached_resets_match_uncached(self):
+        # 3 keeps its terrain, 4 is evicted by 5 while the more recently used 3 stays cached, None continues the
+        # random stream
+        seeds = [3, 3, 3, 4, 3, 5, 3, 4, None]
+        actions = np.random.default_rng(2).uniform(-1, 1, size=(30, 4))
+        for hardcore in (False, True):
+            cache = TerrainCache(max_entries=2)
+            cached = BipedalWalkerV2(hardcore=hardcore, terrain_cache=cache)
+            uncached = BipedalWalkerV2(hardcore=hardcore, terrain_cache=False)
+            with mock.patch.object(cached, "_generate_terrain_data", wraps=cached._generate_terrain_data) as generate:
+                for seed in seeds:
+                    np.testing.assert_array_equal(cached.reset(seed=seed)[0], uncached.reset(seed=seed)[0])
+                    cached_terrain, uncached_terrain = self.terrain(cached), self.terrain(uncached)
+                    np.testing.assert_array_equal(cached_terrain[0], uncached_terrain[0])
+                    np.testing.assert_array_equal(cached_terrain[1], uncached_terrain[1])
+                    self.assertEqual(cached_terrain[2], uncached_terrain[2])
+                    self.assertEqual(cached.np_random.bit_generator.state, uncached.np_random.bit_generator.state)
+                    for action in actions:
+                        cached_step, uncached_step = cached.step(action), uncached.step(action)
+                        np.testing.assert_array_equal(cached_step[0], uncached_step[0])
+                        self.assertEqual(cached_step[1:3], uncached_step[1:3])
+                        if cached_step[2]:
+                            break
+            # Generated for the first 3, 4 and 5, for 4 again after its eviction, and for the unseeded reset
+            self.assertEqual(generate.call_count, 5)
+            self.assertEqual(len(cache), 2)
+            cached.close()
+            uncached.close()
+
+
+class TestBipedalWalkerObservationBuffer(unittest.TestCase):
+    def test_external_buffer(self):
+        env = BipedalWalkerV2()
+        reference = BipedalWalkerV2()
+        buffer = np.zeros((2, 24), dtype=np.float32)
+        env.set_observation_buffer(buffer[1])
+        observation, _ = env.reset(seed=0)
+        np.testing.assert_array_equal(observation, reference.reset(seed=0)[0])
+        self.assertTrue(np.shares_memory(observation, buffer))
+        env.step(np.ones(4))
+        np.testing.assert_array_equal(buffer[1], reference.step(np.ones(4))[0])
+        self.assertFalse(buffer[0].any())
+
+    def test_invalid_buffer(self):
+        env = BipedalWalkerV2()
+        with self.assertRaises(ValueError):
+            env.set_observation_buffer(np.zeros(24))
+        with self.assertRaises(ValueError):
+            env.set_observation_buffer(np.zeros(25, dtype=np.float32))
+
+
+if __name__ == '__main__':
+    unittest.main()
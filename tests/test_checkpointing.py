@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from agents.checkpointing import AsyncCheckpointer
+
+
+class TestAsyncCheckpointer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.variables = [tf.Variable(np.arange(6, dtype=np.float32).reshape(2, 3)),
+                          tf.Variable(0, dtype=tf.int64)]
+
+    def test_restores_snapshot(self):
+        checkpointer = AsyncCheckpointer(self.directory, {'variables': self.variables})
+        self.assertIsNone(checkpointer.restore())
+        self.assertTrue(checkpointer.save(10))
+        # Updates made after the snapshot are not part of the checkpoint
+        self.variables[0].assign_add(tf.ones((2, 3)))
+        self.variables[1].assign(5)
+        checkpointer.close()
+
+        results = checkpointer.results()
+        self.assertEqual([result.step for result in results], [10])
+        self.assertEqual(results[0].path, checkpointer.latest_checkpoint)
+        self.assertGreaterEqual(results[0].write_seconds, 0.0)
+
+        restorer = AsyncCheckpointer(self.directory, {'variables': self.variables})
+        self.assertEqual(restorer.restore(), 10)
+        np.testing.assert_array_equal(self.variables[0].numpy(), np.arange(6).reshape(2, 3))
+        self.assertEqual(self.variables[1].numpy(), 0)
+        restorer.close()
+
+    def test_keeps_last_checkpoints(self):
+        checkpointer = AsyncCheckpointer(self.directory, {'variables': self.variables}, max_to_keep=2)
+        for step in range(1, 5):
+            checkpointer.wait()
+            self.assertTrue(checkpointer.save(step))
+        checkpointer.close()
+        self.assertEqual([result.step for result in checkpointer.results()], [1, 2, 3, 4])
+        indices = sorted(name for name in os.listdir(self.directory) if name.endswith('.index'))
+        self.assertEqual(indices, ['ckpt-3.index', 'ckpt-4.index'])
+
+    def test_restores_optimizer_slots(self):
+        def train(variable, optimizer, steps):
+            for _ in range(steps):
+                with tf.GradientTape() as tape:
+                    loss = tf.reduce_sum(tf.square(variable - 10.0))
+                optimizer.apply_gradients([(tape.gradient(loss, variable), variable)])
+
+        optimizer = tf.compat.v1.train.AdamOptimizer(learning_rate=0.1)
+        train(self.variables[0], optimizer, 3)
+        checkpointer = AsyncCheckpointer(self.directory, {'variables': self.variables, 'optimizer': optimizer})
+        self.assertTrue(checkpointer.save(3))
+        checkpointer.close()
+        train(self.variables[0], optimizer, 1)
+        expected = [variable.numpy() for variable in [self.variables[0]] + optimizer.variables()]
+
+        variables = [tf.Variable(tf.zeros((2, 3))), tf.Variable(0, dtype=tf.int64)]
+        resumed_optimizer = tf.compat.v1.train.AdamOptimizer(learning_rate=0.1)
+        restorer = AsyncCheckpointer(self.directory, {'variables': variables, 'optimizer': resumed_optimizer})
+        self.assertEqual(restorer.restore(), 3)
+        restorer.close()
+        # The slots and beta powers are created, and restored, by the first step after the restore
+        train(variables[0], resumed_optimizer, 1)
+        actual = [variable.numpy() for variable in [variables[0]] + resumed_optimizer.variables()]
+        self.assertEqual(len(actual), 5)
+        for value, expected_value in zip(actual, expected):
+            np.testing.assert_allclose(value, expected_value, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
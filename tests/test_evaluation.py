@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+from tf_agents.environments import tf_py_environment
+from tf_agents.networks import q_network
+from tf_agents.policies import greedy_policy, q_policy, random_tf_policy
+from tf_agents.trajectories import time_step as ts
+
+from agents.evaluation import AsyncEvaluator, evaluate_episodes
+from src.batched_environment import BatchedBirdRobotEnvironment
+from src.environment import BirdRobotEnvironment
+
+
+class TestEvaluateEpisodes(unittest.TestCase):
+    def play_episode(self, env, actions):
+        time_step = env.reset()
+        episode_return, length = 0.0, 0
+        while time_step.step_type != ts.StepType.LAST:
+            time_step = env.step(actions[length])
+            episode_return += time_step.reward
+            length += 1
+        return episode_return, length
+
+    def test_matches_sequential_episodes(self):
+        num_episodes = 6
+        env = tf_py_environment.TFPyEnvironment(BatchedBirdRobotEnvironment(4))
+        policy = random_tf_policy.RandomTFPolicy(env.time_step_spec(), env.action_spec())
+        actions = []
+        action = policy.action
+
+        def recording_action(time_step, policy_state=()):
+            action_step = action(time_step, policy_state)
+            actions.append(action_step.action.numpy())
+            return action_step
+        policy.action = recording_action
+
+        returns, lengths = evaluate_episodes(env, policy, num_episodes)
+        self.assertEqual(returns.shape, (num_episodes,))
+        self.assertEqual(lengths.shape, (num_episodes,))
+
+        # Replay the recorded actions of every episode on a single environment
+        rounds = [np.array(actions[:lengths[:4].max()]), np.array(actions[lengths[:4].max():])]
+        for episode in range(num_episodes):
+            round_actions = rounds[episode // 4][:, episode % 4]
+            expected_return, expected_length = self.play_episode(BirdRobotEnvironment(), round_actions)
+            self.assertEqual(lengths[episode], expected_length)
+            self.assertAlmostEqual(returns[episode], expected_return, places=4)
+
+
+class TestAsyncEvaluator(unittest.TestCase):
+    def make_policy(self, env, q_net):
+        return greedy_policy.GreedyPolicy(q_policy.QPolicy(env.time_step_spec(), env.action_spec(), q_network=q_net))
+
+    def test_evaluates_snapshot(self):
+        env = tf_py_environment.TFPyEnvironment(BatchedBirdRobotEnvironment(3))
+        q_net = q_network.QNetwork(env.observation_spec(), env.action_spec(), fc_layer_params=(16,))
+        q_net.create_variables()
+        policy = self.make_policy(env, q_net)
+        eval_q_net = q_net.copy(name='EvalQNetwork')
+        eval_q_net.create_variables()
+        evaluator = AsyncEvaluator(
+            tf_py_environment.TFPyEnvironment(BatchedBirdRobotEnvironment(3)), self.make_policy(env, eval_q_net),
+            policy.variables(), num_episodes=3, max_steps=50)
+
+        expected_returns, expected_lengths = evaluate_episodes(env, policy, 3, max_steps=50)
+        self.assertTrue(evaluator.evaluate(7))
+        # Training the source network after the snapshot does not change the evaluation
+        for variable in q_net.variables:
+            variable.assign(variable + 1.0)
+        evaluator.close()
+
+        results = evaluator.results()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].step, 7)
+        np.testing.assert_allclose(results[0].returns, expected_returns)
+        np.testing.assert_array_equal(results[0].lengths, expected_lengths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from config.config import SENSOR_ANGLE, SENSOR_RANGE
+from src.batched_environment import BatchedBirdRobotEnvironment
+from src.environment import BirdRobotEnvironment
+from src.heading import HeadingTable, in_field_of_view
+
+
+class TestHeadingTable(unittest.TestCase):
+    def test_matches_direct_computation(self):
+        table = HeadingTable(turn_rate=45.0, initial_orientation=0.0)
+        self.assertEqual(table.size, 8)
+        # On the grid, off the grid, and in float32 like the environment state
+        orientations = np.array([0.0, 45.0, 315.0, 90.0, 12.5], dtype=np.float32)
+        heading = np.deg2rad(orientations.astype(np.float64))
+        expected = np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+        np.testing.assert_allclose(table.unit_vectors(orientations), expected, atol=1e-12)
+        np.testing.assert_allclose(table.unit_vectors(orientations[:4]), expected[:4], atol=1e-12)
+        for orientation, vector in zip(orientations, expected):
+            np.testing.assert_allclose(table.unit_vector(orientation), vector, atol=1e-12)
+
+    def test_falls_back_for_non_divisor_turn_rate(self):
+        table = HeadingTable(turn_rate=35.0, initial_orientation=0.0)
+        self.assertFalse(table.enabled)
+        np.testing.assert_allclose(table.unit_vector(70.0), [np.cos(np.deg2rad(70.0)), np.sin(np.deg2rad(70.0))])
+        self.assertTrue(HeadingTable(turn_rate=45.0, initial_orientation=10.0).enabled)
+
+    def test_field_of_view(self):
+        rng = np.random.default_rng(0)
+        offset = rng.uniform(-2 * SENSOR_RANGE, 2 * SENSOR_RANGE, size=(1000, 2))
+        orientation = rng.choice(np.arange(8) * 45.0, size=1000)
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        bearing = np.rad2deg(np.arctan2(offset[:, 1], offset[:, 0])) - orientation
+        bearing = (bearing + 180) % 360 - 180
+        expected = (distance <= SENSOR_RANGE) & (np.abs(bearing) <= SENSOR_ANGLE / 2)
+        visible = in_field_of_view(offset, distance, HeadingTable().unit_vectors(orientation))
+        np.testing.assert_array_equal(visible, expected)
+
+    def test_environments_match_direct_computation(self):
+        rng = np.random.default_rng(1)
+        obstacles = rng.uniform(0, 200, size=(50, 2))
+        actions = rng.choice(6, size=(300, 4), p=[0.1, 0.05, 0.1, 0.1, 0.6, 0.05]).astype(np.int32)
+        for make in (lambda **kwargs: BirdRobotEnvironment(obstacles, **kwargs),
+                     lambda **kwargs: BatchedBirdRobotEnvironment(4, obstacles, **kwargs)):
+            table, direct = make(use_heading_table=True), make(use_heading_table=False)
+            table.reset()
+            direct.reset()
+            for action in actions:
+                if not table.batched:
+                    action = action[0]
+                table_step, direct_step = table.step(action), direct.step(action)
+                np.testing.assert_array_equal(table_step.step_type, direct_step.step_type)
+                np.testing.assert_allclose(table_step.observation, direct_step.observation, atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
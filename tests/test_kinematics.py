@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from config.config import ACCELERATION, SIMULATION_TIME_STEP, TURN_RATE
+from src.control import BirdRobotControl
+from src.environment import BirdRobotEnvironment
+from src.kinematics import KinematicsState, _integrate_arrays, _integrate_loop, commands_from_actions, integrate
+from src.movement import BirdRobotMovement
+
+
+class TestKinematics(unittest.TestCase):
+    def test_array_and_loop_kernels_match(self):
+        rng = np.random.default_rng(0)
+        arrays, loop = KinematicsState(64), KinematicsState(64)
+        for _ in range(200):
+            commands = rng.random((64, 6)) < 0.3
+            _integrate_arrays(arrays.position, arrays.orientation, arrays.velocity, commands)
+            _integrate_loop(loop.position, loop.orientation, loop.velocity, commands)
+        np.testing.assert_array_equal(arrays.position, loop.position)
+        np.testing.assert_array_equal(arrays.orientation, loop.orientation)
+        np.testing.assert_array_equal(arrays.velocity, loop.velocity)
+
+    def test_matches_environment(self):
+        rng = np.random.default_rng(1)
+        env = BirdRobotEnvironment()
+        time_step = env.reset()
+        state = KinematicsState(1, use_numba=False)
+        for _ in range(300):
+            state.position[0] = time_step.observation[:2]
+            state.orientation[0] = time_step.observation[2]
+            state.velocity[0] = time_step.observation[3]
+            action = rng.integers(0, 6)
+            integrate(state.position, state.orientation, state.velocity, commands_from_actions([action]), use_numba=False)
+            time_step = env.step(np.int32(action))
+            if time_step.is_last():
+                time_step = env.reset()
+                continue
+            np.testing.assert_allclose(state.position[0], time_step.observation[:2], atol=1e-4)
+            np.testing.assert_allclose(state.orientation[0], time_step.observation[2], atol=1e-4)
+            np.testing.assert_allclose(state.velocity[0], time_step.observation[3], atol=1e-4)
+
+    def test_views_share_state(self):
+        state = KinematicsState(3)
+        movement = BirdRobotMovement(state, index=1)
+        control = BirdRobotControl(state, index=2)
+        control.accelerate()
+        control.turn_left()
+        self.assertEqual(state.velocity[2], ACCELERATION)
+        self.assertEqual(control.orientation, 360 - TURN_RATE)
+
+        movement.velocity = 2.0
+        position = movement.update_position({'move_forward': True})
+        np.testing.assert_allclose(position, [2.0 * SIMULATION_TIME_STEP, 0.0])
+        np.testing.assert_allclose(state.position[1], position)
+        np.testing.assert_array_equal(state.position[[0, 2]], 0.0)
+
+        position = np.array([1.0, 1.0])
+        self.assertIs(control.move_backward(position), position)
+        self.assertTrue(np.all(position != 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
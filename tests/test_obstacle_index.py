@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from config.config import COLLISION_DISTANCE, SENSOR_RANGE
+from src.batched_environment import BatchedBirdRobotEnvironment
+from src.environment import BirdRobotEnvironment
+from src.obstacle_index import ObstacleGrid
+from src.sensors import BirdRobotSensors
+
+
+def random_map(seed):
+    """
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Obstacles clustered in the middle of the map, and robot
+        positions and orientations that lie inside, around and outside the extent of the obstacles. Some robots
+        sit within COLLISION_DISTANCE of an obstacle, and one has obstacles exactly SENSOR_RANGE ahead of it.
+    """
+    rng = np.random.default_rng(seed)
+    obstacles = rng.uniform(60, 140, size=(80, 2))
+    # Straight ahead and at a bearing of 53 degrees, both exactly SENSOR_RANGE from the robot at (-20, 30)
+    obstacles = np.concatenate([obstacles, [[-20 + SENSOR_RANGE, 30.0], [-20 + 0.6 * SENSOR_RANGE, 30 + 0.8 * SENSOR_RANGE]]])
+    positions = np.concatenate([
+        rng.uniform(-150, 350, size=(200, 2)),
+        obstacles[:20] + rng.uniform(-COLLISION_DISTANCE, COLLISION_DISTANCE, size=(20, 2)),
+        [[-20.0, 30.0]],
+    ])
+    orientations = rng.choice(np.arange(8) * 45.0, size=len(positions))
+    orientations[-1] = 0.0
+    return obstacles, positions.astype(np.float32), orientations.astype(np.float32)
+
+
+class TestObstacleGrid(unittest.TestCase):
+    def test_queries_include_every_obstacle_in_range(self):
+        obstacles, positions, _ = random_map(0)
+        for cell_size in (SENSOR_RANGE, 7.0):
+            grid = ObstacleGrid(obstacles, cell_size)
+            distance = np.hypot(*(obstacles[np.newaxis, :, :] - positions[:, np.newaxis, :].astype(np.float64)).transpose(2, 0, 1))
+            robot, obstacle = grid.query_pairs(positions, SENSOR_RANGE)
+            self.assertEqual(len(set(zip(robot, obstacle))), len(robot))
+            for i, position in enumerate(positions):
+                expected = set(np.flatnonzero(distance[i] <= SENSOR_RANGE))
+                self.assertLessEqual(expected, set(grid.query(position, SENSOR_RANGE)))
+                self.assertLessEqual(expected, set(obstacle[robot == i]))
+            # Both obstacles exactly SENSOR_RANGE from the last robot are candidates
+            self.assertLessEqual({len(obstacles) - 2, len(obstacles) - 1}, set(grid.query(positions[-1], SENSOR_RANGE)))
+
+    def test_empty_map(self):
+        grid = ObstacleGrid(np.zeros((0, 2)), SENSOR_RANGE)
+        self.assertEqual(len(grid.query([5.0, 5.0], SENSOR_RANGE)), 0)
+        self.assertEqual(len(grid.query_pairs(np.zeros((3, 2)), SENSOR_RANGE)[0]), 0)
+
+
+class TestIndexMatchesLinearScan(unittest.TestCase):
+    def test_environment(self):
+        obstacles, positions, orientations = random_map(1)
+        indexed, linear = BirdRobotEnvironment(obstacles, use_index=True), BirdRobotEnvironment(obstacles, use_index=False)
+        indexed.reset()
+        linear.reset()
+        collisions, sensed = 0, 0
+        for position, orientation in zip(positions, orientations):
+            for env in (indexed, linear):
+                env._state[:2] = position
+                env._state[2] = orientation
+            collided = indexed._update_obstacles()
+            self.assertEqual(collided, linear._update_obstacles())
+            np.testing.assert_array_equal(indexed._state, linear._state)
+            collisions += collided
+            sensed += np.count_nonzero(indexed._state[8::3] < SENSOR_RANGE)
+        self.assertGreater(collisions, 0)
+        self.assertGreater(sensed, 0)
+
+    def test_batched_environment(self):
+        obstacles, positions, orientations = random_map(2)
+        indexed = BatchedBirdRobotEnvironment(len(positions), obstacles, use_index=True)
+        linear = BatchedBirdRobotEnvironment(len(positions), obstacles, use_index=False)
+        for env in (indexed, linear):
+            env.reset()
+            env._state[:, :2] = positions
+            env._state[:, 2] = orientations
+        unit_vectors = indexed._headings.unit_vectors(orientations)
+        collided = indexed._update_obstacles(unit_vectors)
+        np.testing.assert_array_equal(collided, linear._update_obstacles(unit_vectors))
+        np.testing.assert_array_equal(indexed._state, linear._state)
+        self.assertTrue(collided.any())
+        self.assertLess(indexed._state[:, 8::3].min(), SENSOR_RANGE)
+
+    def test_sensors(self):
+        obstacles, positions, orientations = random_map(3)
+        indexed = BirdRobotSensors(obstacles, use_index=True)
+        linear = BirdRobotSensors(obstacles, use_index=False)
+        for position, orientation in zip(positions.astype(np.float64), orientations):
+            indexed_distances = np.array(indexed.detect_obstacles(position, orientation))
+            linear_distances = np.array(linear.detect_obstacles(position, orientation))
+            # np.linalg.norm of one offset and of a stack of offsets can round differently in the last bit
+            np.testing.assert_array_equal(indexed_distances < SENSOR_RANGE, linear_distances < SENSOR_RANGE)
+            np.testing.assert_allclose(indexed_distances, linear_distances, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
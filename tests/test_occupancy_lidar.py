@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from config.config import BOUNDARY_MAX, BOUNDARY_MIN, COLLISION_DISTANCE, SENSOR_RANGE
+from src.occupancy_lidar import OccupancyLidar, rasterize_obstacles
+from src.sensors import BirdRobotSensors
+
+
+def exact_ranges(origins, directions, obstacles, radius):
+    """Distances along the rays to the first obstacle disc or boundary, by ray-circle intersection."""
+    offset = obstacles[np.newaxis, :, :] - origins[:, np.newaxis, :]
+    along = np.einsum('rkd,rd->rk', offset, directions)
+    miss = np.sum(offset ** 2, axis=-1) - along ** 2
+    with np.errstate(invalid='ignore'):
+        entry = along - np.sqrt(radius ** 2 - miss)
+    inside = np.sum(offset ** 2, axis=-1) <= radius ** 2
+    entry = np.where(inside, 0.0, np.where((miss <= radius ** 2) & (entry >= 0), entry, np.inf))
+    with np.errstate(divide='ignore'):
+        walls = np.where(directions > 0, (BOUNDARY_MAX - origins) / directions, (BOUNDARY_MIN - origins) / directions)
+    walls = np.where(directions == 0, np.inf, walls).min(axis=1)
+    return np.minimum(np.minimum(entry.min(axis=1), walls), SENSOR_RANGE)
+
+
+class TestOccupancyLidar(unittest.TestCase):
+    def test_rasterizes_discs_and_walls(self):
+        occupancy = rasterize_obstacles([[10.5, 20.5]], cell_size=1.0, radius=1.0)
+        self.assertEqual(occupancy.shape, (BOUNDARY_MAX - BOUNDARY_MIN + 2,) * 2)
+        self.assertTrue(occupancy[0].all() and occupancy[-1].all() and occupancy[:, 0].all() and occupancy[:, -1].all())
+        # The 3x3 cells around the obstacle, offset by the wall border
+        np.testing.assert_array_equal(np.argwhere(occupancy[1:-1, 1:-1]), [[i, j] for i in (9, 10, 11) for j in (19, 20, 21)])
+
+    def test_ranges_bracket_exact_ranges(self):
+        rng = np.random.default_rng(0)
+        obstacles = rng.uniform(BOUNDARY_MIN, BOUNDARY_MAX, size=(200, 2))
+        positions = rng.uniform(BOUNDARY_MIN + 5, BOUNDARY_MAX - 5, size=(64, 2))
+        orientations = rng.choice(np.arange(8) * 45.0, size=64)
+        for cell_size in (1.0, 0.5):
+            lidar = OccupancyLidar(obstacles, num_beams=9, cell_size=cell_size)
+            ranges = lidar.scan(positions, orientations)
+            self.assertEqual(ranges.shape, (64, 9))
+
+            angles = np.deg2rad(orientations[:, np.newaxis] + lidar.beam_angles).ravel()
+            directions = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+            origins = np.repeat(positions, 9, axis=0)
+            upper = exact_ranges(origins, directions, obstacles, COLLISION_DISTANCE)
+            lower = exact_ranges(origins, directions, obstacles, COLLISION_DISTANCE + np.sqrt(2) * cell_size)
+            self.assertTrue(np.all(ranges.ravel() <= upper + 1e-9))
+            self.assertTrue(np.all(ranges.ravel() >= lower - 1e-9))
+
+    def test_sensor_modes(self):
+        sensors = BirdRobotSensors([[50.0, 50.0]], mode='lidar', num_beams=5)
+        ranges = sensors.detect_obstacles(np.array([40.0, 50.0]), 0.0)
+        self.assertEqual(len(ranges), 5)
+        self.assertAlmostEqual(ranges[2], 10.0 - COLLISION_DISTANCE)
+        self.assertEqual(sensors.scan(np.zeros((3, 2)) + 40.0, np.zeros(3)).shape, (3, 5))
+
+        with self.assertRaises(ValueError):
+            BirdRobotSensors([[50.0, 50.0]]).scan(np.zeros((1, 2)), np.zeros(1))
+        with self.assertRaises(ValueError):
+            BirdRobotSensors([[50.0, 50.0]], mode='sonar')
+
+
+if __name__ == '__main__':
+    unittest.main()
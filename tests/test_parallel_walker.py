@@ -0,0 +1,109 @@
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+from tf_agents.trajectories import time_step as ts
+
+from environments import parallel_walker
+from environments.bipedal_walker import BipedalWalkerV2
+from environments.parallel_walker import ParallelBipedalWalker
+
+
+def serial_rollout(env_kwargs, seed, max_episode_steps, actions):
+    """
+    Plays one row of a ParallelBipedalWalker with a BipedalWalkerV2 in this process.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Step types, rewards, discounts and observations
+        of the reset followed by one step per action.
+    """
+    env = BipedalWalkerV2(**env_kwargs)
+    rows = [(ts.StepType.FIRST, 0.0, 1.0, env.reset(seed=seed)[0])]
+    needs_reset, episode_steps = False, 0
+    for action in actions:
+        if needs_reset:
+            # Only the first episode is seeded, later ones continue the environment's generator
+            rows.append((ts.StepType.FIRST, 0.0, 1.0, env.reset()[0]))
+            needs_reset, episode_steps = False, 0
+            continue
+        observation, reward, terminated, truncated, _ = env.step(action)
+        episode_steps += 1
+        needs_reset = terminated or truncated or episode_steps >= max_episode_steps
+        rows.append((ts.StepType.LAST if needs_reset else ts.StepType.MID, reward, 0.0 if terminated else 1.0, observation))
+    env.close()
+    step_types, rewards, discounts, observations = zip(*rows)
+    return np.array(step_types), np.array(rewards, np.float32), np.array(discounts, np.float32), np.array(observations)
+
+
+class FailingWalker(BipedalWalkerV2):
+    """BipedalWalkerV2 whose step raises, as a crashing worker would."""
+
+    def step(self, action):
+        raise RuntimeError("simulated worker failure")
+
+
+class TestParallelBipedalWalker(unittest.TestCase):
+    def test_rows_match_serial_environments(self):
+        num_workers, seed, max_episode_steps = 3, 5, 12
+        actions = np.random.default_rng(0).uniform(-1, 1, size=(40, num_workers, 4)).astype(np.float32)
+        env = ParallelBipedalWalker(num_workers, max_episode_steps=max_episode_steps, seed=seed)
+        try:
+            steps = [env.reset()] + [env.step(action) for action in actions]
+        finally:
+            env.close()
+        step_types = np.array([step.step_type for step in steps])
+        rewards = np.array([step.reward for step in steps])
+        discounts = np.array([step.discount for step in steps])
+        observations = np.array([step.observation for step in steps])
+
+        for row in range(num_workers):
+            expected = serial_rollout({}, seed + row, max_episode_steps, actions[:, row])
+            np.testing.assert_array_equal(step_types[:, row], expected[0])
+            np.testing.assert_array_equal(rewards[:, row], expected[1])
+            np.testing.assert_array_equal(discounts[:, row], expected[2])
+            np.testing.assert_array_equal(observations[:, row], expected[3])
+            # Episodes end within max_episode_steps, are truncated at that limit and restart with a FIRST step
+            first = np.flatnonzero(step_types[:, row] == ts.StepType.FIRST)
+            last = np.flatnonzero(step_types[:, row] == ts.StepType.LAST)
+            self.assertGreaterEqual(len(last), 2)
+            np.testing.assert_array_equal(step_types[last + 1, row], ts.StepType.FIRST)
+            lengths = last - first[np.searchsorted(first, last) - 1]
+            self.assertTrue(np.all(lengths <= max_episode_steps))
+            np.testing.assert_array_equal(lengths[discounts[last, row] == 1.0], max_episode_steps)
+
+    def test_time_limit_counts_repeated_actions(self):
+        env = ParallelBipedalWalker(1, env_kwargs={"action_repeat": 3})
+        try:
+            self.assertEqual(env._max_episode_steps, 534)
+        finally:
+            env.close()
+        env = ParallelBipedalWalker(1, env_kwargs={"hardcore": True})
+        try:
+            self.assertEqual(env._max_episode_steps, parallel_walker.MAX_EPISODE_STEPS_HARDCORE)
+        finally:
+            env.close()
+
+    def test_close_joins_every_worker(self):
+        env = ParallelBipedalWalker(3, seed=0)
+        env.reset()
+        env.step(np.zeros((3, 4), np.float32))
+        workers = list(env._workers)
+        env.close()
+        self.assertEqual([worker.exitcode for worker in workers], [0, 0, 0])
+        env.close()  # Closing twice is a no-op
+
+    def test_worker_failure_breaks_the_barrier(self):
+        # Forked workers inherit the patched class
+        with mock.patch.object(parallel_walker, "BipedalWalkerV2", FailingWalker):
+            env = ParallelBipedalWalker(3, seed=0, start_method="fork")
+        workers = list(env._workers)
+        env.reset()
+        with self.assertRaises(threading.BrokenBarrierError):
+            env.step(np.zeros((3, 4), np.float32))
+        env.close()
+        self.assertTrue(all(worker.exitcode is not None and worker.exitcode != 0 for worker in workers))
+
+
+if __name__ == '__main__':
+    unittest.main()
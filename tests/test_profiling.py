@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from agents.profiling import HISTOGRAM_EDGES, TrainingProfiler
+
+
+class TestTrainingProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'profile.jsonl')
+
+    def test_exports_histograms(self):
+        profiler = TrainingProfiler(self.path, window=3, export_interval=2)
+        for step in range(1, 5):
+            with profiler.section('train'):
+                time.sleep(0.002)
+            profiler.record('sample', 0.001 * step)
+            profiler.step(step)
+
+        with open(self.path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records[0]['histogram_edges_ms']), len(HISTOGRAM_EDGES))
+        self.assertEqual([record['step'] for record in records[1:]], [2, 4])
+        sample = records[-1]['sections']['sample']
+        # Only the last 3 durations are kept
+        self.assertEqual(sample['count'], 3)
+        self.assertAlmostEqual(sample['mean_ms'], 3.0)
+        self.assertEqual(sum(sample['histogram']), 3)
+        self.assertGreaterEqual(records[-1]['sections']['train']['p50_ms'], 2.0)
+
+    def test_times_calls_inside_tf_function(self):
+        profiler = TrainingProfiler(self.path)
+
+        def slow_add(x):
+            y = tf.numpy_function(lambda x: (time.sleep(0.01), x + 1)[1], [x], tf.int64)
+            return tf.ensure_shape(y, [])
+
+        @tf.function
+        def run(x):
+            for _ in tf.range(3):
+                x = profiler.timed('add', slow_add)(x)
+            return x
+
+        self.assertEqual(run(tf.constant(0, tf.int64)).numpy(), 3)
+        stats = profiler.summary()['add']
+        self.assertEqual(stats['count'], 3)
+        self.assertGreaterEqual(stats['p50_ms'], 10.0)
+
+    def test_disabled_profiler_changes_nothing(self):
+        profiler = TrainingProfiler()
+        self.assertFalse(profiler.enabled)
+        self.assertIs(profiler.timed('add', np.add), np.add)
+        env = object()
+        self.assertIs(profiler.wrap_environment(env), env)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
+
+from agents.replay_buffers import (
+    BipedalWalkerObservationCodec, MemmapReplayBuffer, PrioritizedReplayBuffer, SumTree, TDErrorRecorder,
+    UniformReplayBuffer, compact_bipedal_walker_codecs
+)
+
+
+class TestSumTree(unittest.TestCase):
+    def test_samples_proportionally_to_priority(self):
+        rng = np.random.default_rng(0)
+        priorities = rng.random(1000) * (rng.random(1000) < 0.3)
+        tree = SumTree(1000)
+        tree.update(np.arange(1000), priorities)
+        self.assertAlmostEqual(tree.total, priorities.sum())
+
+        frequencies = np.bincount(tree.sample(1000000, rng), minlength=1000) / 1000000
+        np.testing.assert_allclose(frequencies, priorities / priorities.sum(), atol=2e-4)
+        self.assertEqual(frequencies[priorities == 0].sum(), 0)
+
+
+class TestPrioritizedReplayBuffer(unittest.TestCase):
+    def setUp(self):
+        spec = (tf.TensorSpec([3], tf.float32), tf.TensorSpec([], tf.int32))
+        self.replay_buffer = PrioritizedReplayBuffer(spec, batch_size=2, max_length=4, seed=0)
+        for step in range(6):
+            self.replay_buffer.add_batch((tf.fill([2, 3], float(step)), tf.constant([step, 10 + step])))
+
+    def test_samples_consecutive_steps(self):
+        items, info = next(iter(self.replay_buffer.as_dataset(sample_batch_size=64, num_steps=2)))
+        self.assertEqual(items[0].shape, (64, 2, 3))
+        steps = items[1].numpy() % 10
+        # Steps 2 to 5 are stored, so sequences start at step 2, 3 or 4
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+        self.assertEqual(set(steps[:, 0]), {2, 3, 4})
+        np.testing.assert_allclose(info.probabilities.numpy(), 1 / 6)
+
+    def test_update_priorities(self):
+        _, ids, _ = self.replay_buffer.sample(6)
+        td_errors = np.where(ids == ids[0], 1.0, 0.0)
+        self.replay_buffer.update_priorities(ids, td_errors)
+        items, new_ids, probabilities = self.replay_buffer.sample(1000)
+        self.assertGreater(np.mean(new_ids == ids[0]), 0.99)
+        weights = self.replay_buffer.importance_weights(probabilities).numpy()
+        self.assertAlmostEqual(weights.max(), 1.0)
+
+    def test_update_skips_overwritten_sequences(self):
+        spec = tf.TensorSpec([], tf.int32)
+        replay_buffer = PrioritizedReplayBuffer(spec, batch_size=1, max_length=4, seed=0)
+        for step in range(2):
+            replay_buffer.add_batch(tf.constant([step]))
+        items, ids, _ = replay_buffer.sample(1)
+        np.testing.assert_array_equal(items[0], [[0, 1]])
+        # The sampled sequence is overwritten by step 4, which starts a new sequence at the same slot
+        for step in range(2, 6):
+            replay_buffer.add_batch(tf.constant([step]))
+        replay_buffer.update_priorities(ids, [1e-6])
+        np.testing.assert_allclose(replay_buffer._tree.get(np.arange(4)), [1.0, 0.0, 1.0, 1.0])
+
+        items, ids, _ = replay_buffer.sample(1)
+        replay_buffer.update_priorities(ids, [0.5])
+        leaf = items[0][0, 0] % 4
+        self.assertAlmostEqual(replay_buffer._tree.get(np.array([leaf]))[0], (0.5 + 1e-6) ** 0.6)
+
+    def test_td_error_recorder_keeps_largest_critic_error(self):
+        recorder = TDErrorRecorder(3)
+        targets = tf.constant([1.0, 2.0, 3.0])
+
+        @tf.function
+        def train_step(predictions1, predictions2):
+            # Like SacAgent.critic_loss, one call per critic
+            return recorder(targets, predictions1) + recorder(targets, predictions2)
+
+        train_step(tf.constant([0.0, 2.5, 3.0]), tf.constant([1.5, 0.0, 3.0]))
+        np.testing.assert_allclose(recorder.td_errors.numpy(), [1.0, 2.0, 0.0])
+        # The next step replaces the errors instead of growing them
+        np.testing.assert_allclose(train_step(targets, tf.constant([1.0, 2.0, 2.0])).numpy(), [0.0, 0.0, 1.0])
+        np.testing.assert_allclose(recorder.td_errors.numpy(), [0.0, 0.0, 1.0])
+
+
+class TestMemmapReplayBuffer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = (tf.TensorSpec([3], tf.float32), tf.TensorSpec([], tf.int32))
+
+    def add_steps(self, replay_buffer, steps):
+        for step in steps:
+            replay_buffer.add_batch((tf.fill([2, 3], float(step)), tf.constant([step, 10 + step])))
+
+    def test_samples_consecutive_steps(self):
+        replay_buffer = MemmapReplayBuffer(self.spec, batch_size=2, max_length=4, directory=self.directory, seed=0)
+        self.add_steps(replay_buffer, range(6))
+        items, info = next(iter(replay_buffer.as_dataset(sample_batch_size=64, num_steps=2)))
+        steps = items[1].numpy() % 10
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+        self.assertEqual(set(steps[:, 0]), {2, 3, 4})
+        np.testing.assert_array_equal(items[0].numpy()[..., 0], steps)
+        np.testing.assert_allclose(info.probabilities.numpy(), 1 / 6)
+
+    def test_resumes_after_flush(self):
+        replay_buffer = MemmapReplayBuffer(self.spec, batch_size=2, max_length=4, directory=self.directory)
+        self.add_steps(replay_buffer, range(3))
+        replay_buffer.flush()
+        del replay_buffer
+
+        resumed = MemmapReplayBuffer(self.spec, batch_size=2, max_length=4, directory=self.directory, seed=0)
+        self.assertEqual(resumed.num_frames(), 6)
+        self.add_steps(resumed, range(3, 6))
+        steps = resumed.sample(64)[0][1] % 10
+        self.assertEqual(set(steps[:, 0]), {2, 3, 4})
+
+        with self.assertRaises(ValueError):
+            MemmapReplayBuffer(self.spec, batch_size=2, max_length=8, directory=self.directory)
+
+    def test_resumes_after_unflushed_writes(self):
+        replay_buffer = MemmapReplayBuffer(self.spec, batch_size=2, max_length=8, directory=self.directory)
+        self.add_steps(replay_buffer, range(10))
+        replay_buffer.flush()
+        # Steps 10 to 12 reach the shared files in the rows of steps 2 to 4, but are never flushed
+        self.add_steps(replay_buffer, range(10, 13))
+        del replay_buffer
+
+        resumed = MemmapReplayBuffer(self.spec, batch_size=2, max_length=8, directory=self.directory, seed=0)
+        self.assertEqual(resumed.num_frames(), 10)
+        steps = resumed.sample(256)[0][0][..., 0]
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+        self.assertEqual(set(steps[:, 0]), {5, 6, 7, 8})
+
+        # The left out rows are sampled again once they are overwritten, also after another restart
+        self.add_steps(resumed, range(10, 12))
+        resumed.flush()
+        del resumed
+        resumed = MemmapReplayBuffer(self.spec, batch_size=2, max_length=8, directory=self.directory, seed=0)
+        self.assertEqual(resumed.num_frames(), 14)
+        self.add_steps(resumed, [12])
+        steps = resumed.sample(256)[0][0][..., 0]
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+        self.assertEqual(set(steps[:, 0]), set(range(5, 12)))
+
+
+class TestCompactStorage(unittest.TestCase):
+    def setUp(self):
+        observation_spec = tf.TensorSpec([24], tf.float32, name='observation')
+        time_step_spec = ts.time_step_spec(observation_spec)
+        self.spec = trajectory.Trajectory(
+            step_type=time_step_spec.step_type, observation=observation_spec,
+            action=tensor_spec.BoundedTensorSpec([4], tf.float32, minimum=-1.0, maximum=1.0),
+            policy_info=(), next_step_type=time_step_spec.step_type,
+            reward=time_step_spec.reward, discount=time_step_spec.discount)
+        rng = np.random.default_rng(0)
+        self.observations = rng.uniform(-2.0, 2.0, size=(1000, 24)).astype(np.float32)
+        self.observations[:, [8, 13]] = rng.integers(2, size=(1000, 2))
+        self.observations[:, 14:] = rng.random((1000, 10))
+
+    def test_observation_round_trip(self):
+        codec = BipedalWalkerObservationCodec()
+        decoded = codec.decode(codec.encode(self.observations), self.spec.observation)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded[:, [8, 13]], self.observations[:, [8, 13]])
+        np.testing.assert_allclose(decoded[:, 14:], self.observations[:, 14:], atol=0.5 / 255 + 1e-6)
+        np.testing.assert_allclose(decoded[:, :8], self.observations[:, :8], rtol=2**-11)
+
+    def test_samples_decoded_transitions(self):
+        replay_buffer = UniformReplayBuffer(
+            self.spec, batch_size=2, max_length=8, codecs=compact_bipedal_walker_codecs(self.spec), seed=0)
+        self.assertEqual(replay_buffer.bytes_per_item(), 51)
+        for step in range(8):
+            observations = self.observations[2 * step:2 * step + 2]
+            replay_buffer.add_batch(trajectory.Trajectory(
+                step_type=tf.constant([1, 1]), observation=tf.constant(observations),
+                action=tf.fill([2, 4], 0.5), policy_info=(), next_step_type=tf.constant([2, 2]),
+                reward=tf.constant([-100.0, 0.123456]), discount=tf.ones([2])))
+        experience, _ = next(iter(replay_buffer.as_dataset(sample_batch_size=16, num_steps=2)))
+        self.assertEqual(experience.observation.shape, (16, 2, 24))
+        self.assertEqual(experience.observation.dtype, tf.float32)
+        self.assertEqual(experience.step_type.dtype, tf.int32)
+        np.testing.assert_array_equal(experience.next_step_type.numpy(), 2)
+        np.testing.assert_array_equal(experience.action.numpy(), 0.5)
+        self.assertTrue(set(experience.reward.numpy().ravel()) <= {np.float32(-100.0), np.float32(0.123456)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 import unittest
-from behaviors.squats import SquatEnv
+
+import numpy as np
+
+from behaviors.squats import BatchedSquatEnv, SquatEnv
 
 
 class TestSquatEnv(unittest.TestCase):
@@ -20,5 +23,37 @@ class TestSquatEnv(unittest.TestCase):
         self.assertIsInstance(done, bool)
 
 
+class TestBatchedSquatEnv(unittest.TestCase):
+    def setUp(self):
+        self.num_envs = 8
+        self.env = BatchedSquatEnv(self.num_envs)
+
+    def test_reset(self):
+        observations = self.env.reset()
+        self.assertEqual(observations.shape, (self.num_envs, 4))
+        self.assertTrue(self.env.observation_space.contains(observations))
+        self.assertEqual(self.env.action_space.shape, (self.num_envs, 2))
+
+    def test_matches_single_environment(self):
+        rng = np.random.default_rng(0)
+        envs = [SquatEnv() for _ in range(self.num_envs)]
+        self.env.reset()
+        num_dones = 0
+        for _ in range(200):
+            # Leaning one way makes trainees fall over and get reset
+            actions = rng.uniform(-0.5, 1.0, (self.num_envs, 2)).astype(np.float32)
+            observations, rewards, dones, infos = self.env.step(actions)
+            for i, env in enumerate(envs):
+                state, reward, done, _ = env.step(actions[i])
+                self.assertEqual(done, dones[i])
+                self.assertAlmostEqual(reward, rewards[i], places=5)
+                if done:
+                    np.testing.assert_allclose(infos[i]['terminal_observation'], state, atol=1e-5)
+                    state = env.reset()
+                    num_dones += 1
+                np.testing.assert_allclose(observations[i], state, atol=1e-5)
+        self.assertGreater(num_dones, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
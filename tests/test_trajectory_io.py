@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from agents.replay_buffers import UniformReplayBuffer
+from agents.trajectory_io import TrajectoryWriter, fill_replay_buffer, read_shard, shard_paths, trajectory_dataset
+
+
+class TestTrajectoryIO(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spec = (tf.TensorSpec([3], tf.float32), tf.TensorSpec([], tf.int32))
+        writer = TrajectoryWriter(self.directory, self.spec, steps_per_shard=4)
+        for step in range(10):
+            writer((tf.fill([2, 3], float(step)), tf.constant([step, 10 + step])))
+        writer.close()
+
+    def test_writes_shards(self):
+        paths = shard_paths(self.directory)
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ['shard-000000.npz', 'shard-000001.npz', 'shard-000002.npz'])
+        observations, steps = read_shard(paths[1], self.spec)
+        self.assertEqual(observations.shape, (4, 2, 3))
+        np.testing.assert_array_equal(steps, [[4, 14], [5, 15], [6, 16], [7, 17]])
+
+        # A new writer continues the numbering
+        writer = TrajectoryWriter(self.directory, self.spec)
+        writer((tf.zeros([2, 3]), tf.constant([0, 0])))
+        writer.close()
+        self.assertEqual(os.path.basename(shard_paths(self.directory)[-1]), 'shard-000003.npz')
+
+    def test_streams_sequences(self):
+        dataset = trajectory_dataset(self.directory, self.spec, sample_batch_size=4, repeat=False, seed=0)
+        batches = list(dataset)
+        # 3 + 3 + 1 sequences of each of the 2 environments
+        self.assertEqual(len(batches), 14 // 4)
+        observations, steps = batches[0]
+        self.assertEqual(observations.shape, (4, 2, 3))
+        steps = np.concatenate([batch[1].numpy() for batch in batches])
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+        # Sequences do not cross the shard boundaries after steps 3 and 7
+        self.assertFalse(set(steps[:, 0] % 10) & {3, 7})
+
+        with self.assertRaises(ValueError):
+            trajectory_dataset(self.directory, (self.spec[0], tf.TensorSpec([], tf.int64)), sample_batch_size=4)
+
+    def test_fills_replay_buffer(self):
+        replay_buffer = UniformReplayBuffer(self.spec, batch_size=2, max_length=16)
+        self.assertEqual(fill_replay_buffer(replay_buffer, self.directory, self.spec), 10)
+        self.assertEqual(replay_buffer.num_frames(), 20)
+        steps = replay_buffer.sample(64)[0][1]
+        np.testing.assert_array_equal(steps[:, 1], steps[:, 0] + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
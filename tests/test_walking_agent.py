@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import tensorflow as tf
+
+from walking_agents.walking_agent import DQNAgent, ReplayBuffer
+
+
+def fill(memory, count, state_size, seed=0):
+    """
+    Adds `count` random transitions to `memory`.
+
+    Returns:
+        Tuple[np.ndarray, ...]: The states, actions, rewards, next states and dones that were added, in order.
+    """
+    rng = np.random.default_rng(seed)
+    states = rng.normal(size=(count, state_size)).astype(np.float32)
+    actions = rng.integers(0, 2, size=count)
+    rewards = rng.normal(size=count).astype(np.float32)
+    next_states = rng.normal(size=(count, state_size)).astype(np.float32)
+    dones = np.arange(count) % 3 == 2
+    for transition in zip(states, actions, rewards, next_states, dones):
+        # States arrive with a batch dimension, as in the training loop
+        memory.add(transition[0][np.newaxis], *transition[1:3], transition[3][np.newaxis], transition[4])
+    return states, actions, rewards, next_states, dones
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def test_overwrites_oldest_transitions(self):
+        memory = ReplayBuffer(5, 4)
+        added = fill(memory, 12, 4)
+        self.assertEqual(len(memory), 5)
+        self.assertEqual(memory.index, 2)
+        # Slots 0 and 1 hold the 11th and 12th transitions, slots 2 to 4 the 8th to 10th
+        order = [10, 11, 7, 8, 9]
+        for stored, expected in zip((memory.states, memory.actions, memory.rewards, memory.next_states, memory.dones), added):
+            np.testing.assert_array_equal(stored, expected[order])
+
+        np.random.seed(0)
+        states, actions, rewards, next_states, dones = memory.sample(64)
+        self.assertEqual(states.shape, (64, 4))
+        rows = [order[np.flatnonzero((memory.states == state).all(axis=1))[0]] for state in states]
+        self.assertEqual(set(rows), set(order))
+        np.testing.assert_array_equal(actions, added[1][rows])
+        np.testing.assert_array_equal(rewards, added[2][rows])
+        np.testing.assert_array_equal(next_states, added[3][rows])
+        np.testing.assert_array_equal(dones, added[4][rows])
+
+    def test_partial_fill_and_nbytes(self):
+        memory = ReplayBuffer(10, 4)
+        added = fill(memory, 3, 4)
+        self.assertEqual(len(memory), 3)
+        np.random.seed(1)
+        self.assertTrue(np.isin(memory.sample(32)[0], added[0]).all())
+        # Two float32 states, a float32 reward, an int32 action and a bool per transition
+        self.assertEqual(memory.nbytes, 10 * (2 * 4 * 4 + 4 + 4 + 1))
+
+
+class TestDQNAgent(unittest.TestCase):
+    def setUp(self):
+        tf.random.set_seed(0)
+        np.random.seed(0)
+        self.agent = DQNAgent(4, 2, memory_size=100)
+        fill(self.agent.memory, 50, 4)
+
+    def test_q_values_match_model(self):
+        states = np.random.default_rng(2).normal(size=(8, 4)).astype(np.float32)
+        before = self.agent.q_values(states)
+        np.testing.assert_allclose(before, self.agent.model(states).numpy(), rtol=1e-5, atol=1e-6)
+        self.agent.replay(16)
+        self.assertTrue(self.agent.policy_weights_stale)
+        after = self.agent.q_values(states)
+        self.assertFalse(self.agent.policy_weights_stale)
+        np.testing.assert_allclose(after, self.agent.model(states).numpy(), rtol=1e-5, atol=1e-6)
+        self.assertFalse(np.allclose(before, after))
+        # A single state with a batch dimension, as act passes it
+        np.testing.assert_allclose(self.agent.q_values(states[:1]), self.agent.model(states[:1]).numpy(), rtol=1e-5, atol=1e-6)
+
+    def test_replay_targets_match_per_sample_reference(self):
+        agent = self.agent
+        minibatch = tuple(array[:16] for array in (agent.memory.states, agent.memory.actions, agent.memory.rewards,
+                                                   agent.memory.next_states, agent.memory.dones))
+        states, actions, rewards, next_states, dones = minibatch
+        self.assertTrue(dones.any() and not dones.all())
+        expected = []
+        for i in range(16):
+            target = rewards[i]
+            if not dones[i]:
+                target = rewards[i] + agent.gamma * np.amax(agent.model(next_states[i:i + 1]).numpy()[0])
+            target_f = agent.model(states[i:i + 1]).numpy()[0]
+            target_f[actions[i]] = target
+            expected.append(target_f)
+
+        epsilon = agent.epsilon
+        with mock.patch.object(agent.memory, "sample", return_value=minibatch), \
+                mock.patch.object(agent.model, "train_on_batch") as train_on_batch:
+            agent.replay(16)
+        trained_states, targets = train_on_batch.call_args[0]
+        np.testing.assert_array_equal(trained_states, states)
+        np.testing.assert_allclose(targets, expected, rtol=1e-5, atol=1e-5)
+        self.assertAlmostEqual(agent.epsilon, epsilon * agent.epsilon_decay)
+
+
+if __name__ == '__main__':
+    unittest.main()
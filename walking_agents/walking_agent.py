@@ -19,64 +19,125 @@ def create_model(input_shape, action_space):
     return model
 
 
+# Define the replay memory: a fixed-capacity circular buffer that stores
+# each field of the transitions in its own preallocated array
+class ReplayBuffer:
+    def __init__(self, capacity, state_size):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.index = 0  # Slot written by the next add
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return (self.states.nbytes + self.actions.nbytes +
+                self.rewards.nbytes + self.next_states.nbytes +
+                self.dones.nbytes)
+
+    def add(self, state, action, reward, next_state, done):
+        # Overwrites the oldest transition once the buffer is full
+        i = self.index
+        self.states[i] = np.reshape(state, -1)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = np.reshape(next_state, -1)
+        self.dones[i] = done
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        indices = np.random.randint(0, self.size, size=batch_size)
+        return (self.states[indices], self.actions[indices],
+                self.rewards[indices], self.next_states[indices],
+                self.dones[indices])
+
+
 # Define the agent
 class DQNAgent:
-    def __init__(self, state_size, action_size):
+    def __init__(self, state_size, action_size, memory_size=2000):
         self.state_size = state_size
         self.action_size = action_size
-        self.memory = []
+        self.memory = ReplayBuffer(memory_size, state_size)
         self.gamma = 0.95    # discount rate
         self.epsilon = 1.0   # exploration rate
         self.epsilon_min = 0.01
         self.epsilon_decay = 0.995
         self.model = create_model((state_size,), action_size)
+        # NumPy copy of the model weights used by act, refreshed lazily
+        # after replay has trained the model
+        self.policy_weights = self.model.get_weights()
+        self.policy_weights_stale = False
 
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
 
     def act(self, state):
         if np.random.rand() <= self.epsilon:
             return np.random.choice(self.action_size)
-        act_values = self.model.predict(state)
+        act_values = self.q_values(state)
         return np.argmax(act_values[0])
 
+    def q_values(self, state):
+        # Forward pass of the Dense ReLU layers in NumPy, which for a single
+        # state is much faster than model.predict
+        if self.policy_weights_stale:
+            self.policy_weights = self.model.get_weights()
+            self.policy_weights_stale = False
+        x = np.asarray(state, dtype=np.float32)
+        *hidden, (kernel, bias) = zip(self.policy_weights[::2],
+                                      self.policy_weights[1::2])
+        for hidden_kernel, hidden_bias in hidden:
+            x = np.maximum(x @ hidden_kernel + hidden_bias, 0)
+        return x @ kernel + bias
+
     def replay(self, batch_size):
-        minibatch = np.random.choice(self.memory, batch_size)
-        for state, action, reward, next_state, done in minibatch:
-            target = reward
-            if not done:
-                target = (reward + self.gamma *
-                          np.amax(self.model.predict(next_state)[0]))
-            target_f = self.model.predict(state)
-            target_f[0][action] = target
-            self.model.fit(state, target_f, epochs=1, verbose=0)
+        states, actions, rewards, next_states, dones = self.memory.sample(
+            batch_size)
+        # One forward pass for each of the next and current states, then a
+        # single gradient step on the whole minibatch
+        next_q_values = self.model.predict_on_batch(next_states)
+        targets = rewards + (self.gamma * np.amax(next_q_values, axis=1) *
+                             ~dones)
+        target_f = self.model.predict_on_batch(states)
+        target_f[np.arange(batch_size), actions] = targets
+        self.model.train_on_batch(states, target_f)
+        self.policy_weights_stale = True
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
 
-# Initialize the agent
-state_size = env.observation_space.shape[0]
-action_size = env.action_space.n
-agent = DQNAgent(state_size, action_size)
-
-
-# Train the agent
-episodes = 1000
-batch_size = 32
-
-for e in range(episodes):
-    state = env.reset()
-    state = np.reshape(state, [1, state_size])
-    for time in range(500):
-        action = agent.act(state)
-        next_state, reward, done, _ = env.step(action)
-        reward = reward if not done else -10
-        next_state = np.reshape(next_state, [1, state_size])
-        agent.remember(state, action, reward, next_state, done)
-        state = next_state
-        if done:
-            print(f"episode: {e}/{episodes}, score: {time}, "
-                  f"e: {agent.epsilon:.2}")
-            break
-        if len(agent.memory) > batch_size:
-            agent.replay(batch_size)
+if __name__ == '__main__':
+    # Initialize the agent
+    state_size = env.observation_space.shape[0]
+    action_size = env.action_space.n
+    agent = DQNAgent(state_size, action_size)
+    print(f"Replay memory: {agent.memory.capacity} transitions, "
+          f"{agent.memory.nbytes / 1024:.1f} KiB")
+
+    # Train the agent
+    episodes = 1000
+    batch_size = 32
+
+    for e in range(episodes):
+        state = env.reset()
+        state = np.reshape(state, [1, state_size])
+        for time in range(500):
+            action = agent.act(state)
+            next_state, reward, done, _ = env.step(action)
+            reward = reward if not done else -10
+            next_state = np.reshape(next_state, [1, state_size])
+            agent.remember(state, action, reward, next_state, done)
+            state = next_state
+            if done:
+                print(f"episode: {e}/{episodes}, score: {time}, "
+                      f"e: {agent.epsilon:.2}")
+                break
+            if len(agent.memory) > batch_size:
+                agent.replay(batch_size)